@@ -0,0 +1,133 @@
+"""Vectorized column type inference for columnar (Arrow/Parquet) export.
+
+OCR produces every cell as text. Before writing columnar files each column is
+checked as a whole with Arrow compute kernels and converted to the narrowest
+type that fits all of its non-empty cells: int64, decimal, date, or text.
+Number parsing understands the formats found in Korean statements: thousands
+separators, currency marks (₩, 원, $), accounting parentheses and the
+△/▲ negative markers. Dates may use -, . or / separators or the
+"2024년 1월 5일" form. A column with a value that does not convert cleanly
+(an impossible date, a code with leading zeros, more than 38 digits) stays
+text.
+
+pyarrow is an optional dependency and is imported by the callers only when
+a columnar format is requested.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ..structure.sparse import iter_table_rows
+
+_NEGATIVE = r'^(\(.*\)|[△▲\-−].*)$'
+_NUMBER_NOISE = r'[,\s₩$원]'
+_SIGN = r'^[(△▲\-−+]|\)$'
+_INTEGER = r'^\d+$'
+_DECIMAL = r'^(\d+\.?\d*|\.\d+)$'
+_LEADING_ZERO = r'^0\d'
+_DATE = r'^\d{4}-\d{2}-\d{2}$'
+_MAX_INT64_DIGITS = 18
+_MAX_DECIMAL_DIGITS = 38
+
+
+def _all_match(values: pa.Array, pattern: str) -> bool:
+    return pc.all(pc.match_substring_regex(values, pattern)).as_py() is not False
+
+
+def _as_number(text: pa.Array, present: pa.Array) -> Optional[pa.Array]:
+    negative = pc.match_substring_regex(text, _NEGATIVE)
+    core = pc.replace_substring_regex(text, _NUMBER_NOISE, '')
+    core = pc.replace_substring_regex(core, _SIGN, '')
+    core_present = pc.filter(core, present)
+    if len(core_present) == 0 or not _all_match(core_present, _DECIMAL):
+        return None
+
+    # Codes with leading zeros (account numbers, '0012') are not quantities
+    if pc.any(pc.match_substring_regex(core_present, _LEADING_ZERO)).as_py():
+        return None
+
+    # Integer digits and scale are measured separately: the longest integer
+    # part and the longest fraction may come from different cells
+    integer = pc.utf8_length(pc.replace_substring_regex(core_present, r'\..*$', ''))
+    fraction = pc.utf8_length(pc.replace_substring_regex(core_present, r'^\d*\.?', ''))
+    digits = pc.max(integer).as_py() or 0
+    scale = pc.max(fraction).as_py() or 0
+    if _all_match(core_present, _INTEGER) and digits <= _MAX_INT64_DIGITS:
+        number = pc.cast(core, pa.int64())
+    else:
+        if digits + scale > _MAX_DECIMAL_DIGITS:
+            return None
+        number = pc.cast(core, pa.decimal128(_MAX_DECIMAL_DIGITS, scale))
+    return pc.if_else(negative, pc.negate(number), number)
+
+
+def _as_date(text: pa.Array, present: pa.Array) -> Optional[pa.Array]:
+    normalized = pc.replace_substring_regex(
+        text, r'^(\d{4})\s*년\s*(\d{1,2})\s*월\s*(\d{1,2})\s*일$', r'\1-\2-\3')
+    normalized = pc.replace_substring_regex(
+        normalized, r'^(\d{4})[./-](\d{1,2})[./-](\d{1,2})\.?$', r'\1-\2-\3')
+    # Zero-pad month and day so the text compares with its round trip below
+    normalized = pc.replace_substring_regex(normalized, r'-(\d)-', r'-0\1-')
+    normalized = pc.replace_substring_regex(normalized, r'-(\d)$', r'-0\1')
+    if not _all_match(pc.filter(normalized, present), _DATE):
+        return None
+    parsed = pc.strptime(normalized, format='%Y-%m-%d', unit='s', error_is_null=True)
+    # strptime rolls impossible days forward (2024-04-31 -> 2024-05-01), so a
+    # date must format back to its own text; OCR misreads keep the column text
+    formatted = pc.strftime(parsed, format='%Y-%m-%d')
+    same = pc.equal(pc.filter(formatted, present), pc.filter(normalized, present))
+    if pc.all(same, skip_nulls=False).as_py() is not True:
+        return None
+    return pc.cast(parsed, pa.date32())
+
+
+def infer_column(values: Sequence[str]) -> pa.Array:
+    """Convert one column of cell texts to a typed Arrow array; empty cells
+    become nulls."""
+    raw = pa.array([v if v is not None else '' for v in values], type=pa.string())
+    text = pc.utf8_trim_whitespace(raw)
+    present = pc.not_equal(text, '')
+    text = pc.if_else(present, text, pa.scalar(None, pa.string()))
+    present = pc.fill_null(present, False)
+    if not pc.any(present).as_py():
+        return text
+
+    for convert in (_as_date, _as_number):
+        typed = convert(text, present)
+        if typed is not None:
+            return typed
+    return text
+
+
+def _unique_names(names: List[str]) -> List[str]:
+    seen: Dict[str, int] = {}
+    unique = []
+    for i, name in enumerate(names):
+        name = str(name).strip() or f"col_{i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        unique.append(name)
+    return unique
+
+
+def table_to_arrow(table_data: Dict, header: bool = True) -> pa.Table:
+    """Build a typed Arrow table from a (dense or sparse) table structure.
+
+    With `header` the first row supplies the column names; otherwise the
+    generic col_N names used by the CSV/Excel exports are used.
+    """
+    rows = list(iter_table_rows(table_data))
+    n_cols = max((len(r) for r in rows), default=table_data.get('columns', 0) or 0)
+    rows = [list(r) + [''] * (n_cols - len(r)) for r in rows]
+
+    if header and rows:
+        names, rows = _unique_names(rows[0]), rows[1:]
+    else:
+        names = [f"col_{i}" for i in range(n_cols)]
+
+    columns = list(zip(*rows)) if rows else [() for _ in range(n_cols)]
+    return pa.table([infer_column(col) for col in columns], names=names)
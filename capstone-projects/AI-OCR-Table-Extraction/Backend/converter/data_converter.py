@@ -1,7 +1,59 @@
-import pandas as pd
-from typing import List, Dict
-import json
+from typing import (AsyncIterator, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence,
+                    Set, TextIO, Union)
+import asyncio
+import csv
+import io
 import os
+import re
+
+from ..structure.sparse import iter_table_rows
+from ..utils import serialization
+
+# openpyxl and pyarrow are only imported inside the methods that need them;
+# importing them here would slow down every process that touches the converter.
+
+
+# Media types of the formats write_stream and aiter_bytes can produce
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def document_tables(results: Optional[List]) -> List[Dict]:
+    """The table structures of a document's stored results. Entries are
+    either structures or {'data': structure, ...} wrappers."""
+    tables = []
+    for entry in results or []:
+        if isinstance(entry, dict) and isinstance(entry.get('data'), dict):
+            entry = entry['data']
+        if isinstance(entry, dict):
+            tables.append(entry)
+    return tables
+
+
+def _column_names(table_data: Dict) -> List[str]:
+    # Generic header so readers treat every row of the table as data
+    n_cols = table_data.get('columns')
+    if n_cols is None:
+        n_cols = max((len(row) for row in iter_table_rows(table_data)), default=0)
+    return [f"col_{i}" for i in range(n_cols)]
+
+
+def _sheet_title(name: str, used: Set[str]) -> str:
+    # Excel sheet names: at most 31 characters, none of []:*?/\ and unique
+    base = re.sub(r'[\[\]:*?/\\]', '_', str(name)).strip("'")[:31] or "Table"
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
 
 class DataConverter:
     @staticmethod
@@ -9,33 +61,223 @@ class DataConverter:
         """
         Convert table data to CSV format
         """
-        # Write a generic header so pandas will read all rows as data
-        df = pd.DataFrame(table_data['cells'])
-        # Create generic column names if they don't exist
-        cols = [f"col_{i}" for i in range(df.shape[1])]
-        df.columns = cols
         csv_path = f"{output_path}.csv"
-        df.to_csv(csv_path, index=False, header=True)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            DataConverter.write_csv(iter_table_rows(table_data), f,
+                                    header=_column_names(table_data))
         return csv_path
-    
+
+    @staticmethod
+    def write_csv(rows: Iterable[List[str]], stream: TextIO,
+                  header: Optional[List[str]] = None) -> int:
+        """
+        Write rows to a text stream one at a time, so any row iterator (for
+        example IncrementalTableAnalyzer.iter_rows) can be exported without
+        holding the table in memory. Returns the number of data rows written.
+        """
+        writer = csv.writer(stream, lineterminator='\n')
+        if header is not None:
+            writer.writerow(header)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+
+    @staticmethod
+    def iter_csv(rows: Iterable[List[str]], header: Optional[List[str]] = None,
+                 chunk_rows: int = 500) -> Iterator[str]:
+        """
+        Yield CSV text in chunks of `chunk_rows` rows, for response streams
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if header is not None:
+            writer.writerow(header)
+        pending = 0
+        for row in rows:
+            writer.writerow(row)
+            pending += 1
+            if pending >= chunk_rows:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if buffer.tell():
+            yield buffer.getvalue()
+
     @staticmethod
     def to_excel(table_data: Dict, output_path: str) -> str:
         """
         Convert table data to Excel format
         """
-        df = pd.DataFrame(table_data['cells'])
-        cols = [f"col_{i}" for i in range(df.shape[1])]
-        df.columns = cols
+        return DataConverter.to_excel_workbook([table_data], output_path)
+
+    @staticmethod
+    def to_excel_workbook(tables: Iterable[Union[Dict, Iterable[List[str]]]], output_path: str,
+                          sheet_names: Optional[Sequence[str]] = None) -> str:
+        """
+        Write all tables of a document to one Excel file, one sheet per table
+        """
         excel_path = f"{output_path}.xlsx"
-        df.to_excel(excel_path, index=False, header=True)
+        DataConverter.write_excel(tables, excel_path, sheet_names)
         return excel_path
-    
+
+    @staticmethod
+    def write_excel(tables: Iterable[Union[Dict, Iterable[List[str]]]],
+                    target: Union[str, BinaryIO],
+                    sheet_names: Optional[Sequence[str]] = None) -> int:
+        """
+        Write tables to a workbook in a single pass with openpyxl's write-only
+        mode, so memory stays flat however many rows the tables have. Each
+        table is a structure (dense or sparse) or any iterable of rows, e.g.
+        IncrementalTableAnalyzer.iter_rows. `target` is a path or a binary
+        stream. Returns the number of sheets written.
+        """
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        names = list(sheet_names or [])
+        used: Set[str] = set()
+        count = 0
+        for i, table in enumerate(tables):
+            title = _sheet_title(names[i] if i < len(names) else f"Table {i + 1}", used)
+            sheet = workbook.create_sheet(title=title)
+            if isinstance(table, dict):
+                sheet.append(_column_names(table))
+                table = iter_table_rows(table)
+            for row in table:
+                sheet.append(row)
+            count += 1
+        if count == 0:
+            # A workbook needs at least one sheet to open in Excel
+            workbook.create_sheet(title="Table 1")
+        workbook.save(target)
+        return count
+
+    @staticmethod
+    def to_arrow(table_data: Dict, header: bool = True):
+        """
+        Convert table data to a typed pyarrow.Table. Numeric, date and text
+        columns are inferred per column (see column_types). The result can be
+        handed to Polars, DuckDB or pandas without copying the buffers, e.g.
+        polars.from_arrow(table) or through its __arrow_c_stream__ interface.
+        """
+        from .column_types import table_to_arrow
+
+        return table_to_arrow(table_data, header=header)
+
+    @staticmethod
+    def to_parquet(table_data: Dict, output_path: str, header: bool = True,
+                   compression: str = 'zstd') -> str:
+        """
+        Convert table data to a compressed Parquet file with inferred column types
+        """
+        import pyarrow.parquet as pq
+
+        parquet_path = f"{output_path}.parquet"
+        pq.write_table(DataConverter.to_arrow(table_data, header=header), parquet_path,
+                       compression=compression)
+        return parquet_path
+
     @staticmethod
     def to_json(table_data: Dict, output_path: str) -> str:
         """
-        Convert table data to JSON format
+        Convert table data to JSON format. Sparse structures are written as
+        they are, without expanding them to a dense matrix.
         """
         json_path = f"{output_path}.json"
-        with open(json_path, 'w') as f:
-            json.dump(table_data, f)
-        return json_path
\ No newline at end of file
+        with open(json_path, 'wb') as f:
+            serialization.dump(table_data, f)
+        return json_path
+
+    @staticmethod
+    def to_ndjson(table_data: Dict, output_path: str) -> str:
+        """
+        Convert table data to newline-delimited JSON, one row array per line
+        """
+        ndjson_path = f"{output_path}.ndjson"
+        with open(ndjson_path, 'wb') as f:
+            serialization.write_ndjson(iter_table_rows(table_data), f)
+        return ndjson_path
+
+    @staticmethod
+    def write_stream(tables: List[Dict], fmt: str, stream: BinaryIO) -> None:
+        """
+        Write one or more tables to a binary stream (a file, io.BytesIO, a
+        socket wrapper...) without touching the disk. CSV and NDJSON put
+        the tables one after another, xlsx gives each table its own sheet
+        and json writes the list of structures. Parquet holds one table.
+        """
+        if fmt == 'csv':
+            text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+            for i, table in enumerate(tables):
+                if i:
+                    text.write('\n')
+                DataConverter.write_csv(iter_table_rows(table), text, header=_column_names(table))
+            text.flush()
+            text.detach()
+        elif fmt == 'ndjson':
+            serialization.write_ndjson(
+                (row for table in tables for row in iter_table_rows(table)), stream)
+        elif fmt == 'json':
+            serialization.dump(tables, stream)
+        elif fmt == 'xlsx':
+            DataConverter.write_excel(tables, stream)
+        elif fmt == 'parquet':
+            if len(tables) != 1:
+                raise ValueError("Parquet export needs exactly one table")
+            import pyarrow.parquet as pq
+            pq.write_table(DataConverter.to_arrow(tables[0]), stream, compression='zstd')
+        else:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+    @staticmethod
+    async def aiter_bytes(tables: List[Dict], fmt: str,
+                          chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """
+        Async byte iterator for StreamingResponse. CSV and NDJSON are
+        encoded row by row as the client reads; the other formats need the
+        whole file (zip or footer), which is built in memory off the event
+        loop and then sent in chunks.
+        """
+        if fmt not in EXPORT_MEDIA_TYPES:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+        if fmt in ('csv', 'ndjson'):
+            pending: List[bytes] = []
+            size = 0
+            for piece in DataConverter._iter_text_export(tables, fmt):
+                pending.append(piece)
+                size += len(piece)
+                if size >= chunk_size:
+                    yield b''.join(pending)
+                    pending, size = [], 0
+                    # Let other requests run between chunks
+                    await asyncio.sleep(0)
+            if pending:
+                yield b''.join(pending)
+            return
+
+        buffer = io.BytesIO()
+        await asyncio.get_running_loop().run_in_executor(
+            None, DataConverter.write_stream, tables, fmt, buffer)
+        data = buffer.getbuffer()
+        try:
+            for start in range(0, len(data), chunk_size):
+                yield bytes(data[start:start + chunk_size])
+        finally:
+            data.release()
+
+    @staticmethod
+    def _iter_text_export(tables: List[Dict], fmt: str) -> Iterator[bytes]:
+        if fmt == 'ndjson':
+            yield from serialization.iter_ndjson(
+                row for table in tables for row in iter_table_rows(table))
+            return
+        for i, table in enumerate(tables):
+            if i:
+                yield b'\n'
+            for chunk in DataConverter.iter_csv(iter_table_rows(table),
+                                                header=_column_names(table)):
+                yield chunk.encode('utf-8')
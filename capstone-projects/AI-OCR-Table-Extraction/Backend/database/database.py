@@ -18,9 +18,15 @@ async def init_db(db) -> None:
     try:
         # Users: unique email
         await db.users.create_index("email", unique=True)
-        # Documents: index by user and created time
-        await db.documents.create_index("user_id")
+        # Documents: keyset pagination per user, newest first, optionally
+        # filtered by status (see database.pagination)
+        await db.documents.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        await db.documents.create_index([("user_id", 1), ("status", 1),
+                                         ("created_at", -1), ("_id", -1)])
         await db.documents.create_index("created_at")
+        # Jobs: claim order and expired-lease lookups (see pipeline.lease_queue)
+        await db.jobs.create_index([("status", 1), ("available_at", 1)])
+        await db.jobs.create_index([("status", 1), ("lease_expires", 1)])
     except Exception:
         # If indexes already exist or an index creation fails, continue.
         pass
@@ -31,4 +37,14 @@ async def get_db(request: Request):
 
     Usage: db = Depends(get_db)  -> db.documents, db.users, etc.
     """
-    return request.app.mongodb
\ No newline at end of file
+    return request.app.mongodb
+
+
+def document_query(document_id: str) -> dict:
+    """Filter matching a document by id, given as an ObjectId string or a
+    plain string _id."""
+    from bson import ObjectId
+
+    if ObjectId.is_valid(document_id):
+        return {"_id": ObjectId(document_id)}
+    return {"_id": document_id}
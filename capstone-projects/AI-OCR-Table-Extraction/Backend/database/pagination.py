@@ -0,0 +1,101 @@
+"""Keyset pagination over the documents collection.
+
+Documents are listed newest first, ordered by (created_at, _id) within one
+user_id. That order is covered by the compound indexes created in init_db.
+A page does not skip over earlier rows. It resumes strictly after the last
+(created_at, _id) pair of the previous page, which the client passes back
+as an opaque cursor. Every page is one index range scan of `limit + 1`
+entries, so response time does not grow with the size of the collection,
+and rows inserted while a client pages through do not shift its pages.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+# Fields a listing may return; heavy ones (results) are opt-in
+LIST_FIELDS = ("filename", "status", "stage", "progress", "user_id", "sha256", "size",
+               "error", "created_at", "completed_at", "results")
+DEFAULT_FIELDS = ("filename", "status", "user_id", "created_at", "completed_at")
+MAX_PAGE_SIZE = 200
+SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(document: Dict) -> str:
+    _id = document["_id"]
+    created_at = document.get("created_at")
+    payload = {
+        "t": created_at.isoformat() if created_at else None,
+        "id": str(_id),
+        "oid": isinstance(_id, ObjectId)
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        created_at = datetime.fromisoformat(payload["t"]) if payload["t"] else None
+        _id = ObjectId(payload["id"]) if payload["oid"] else payload["id"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return {"created_at": created_at, "_id": _id}
+
+
+def projection(fields: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Mongo projection for the requested fields; raises ValueError on
+    unknown ones."""
+    fields = list(fields) if fields else list(DEFAULT_FIELDS)
+    unknown = [f for f in fields if f not in LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} - "
+                         f"use any of {', '.join(LIST_FIELDS)}")
+    # created_at is needed to build the next cursor
+    return {**{f: 1 for f in fields}, "created_at": 1}
+
+
+def page_query(user_id: Optional[str], statuses: Optional[List[str]] = None,
+               after: Optional[Dict] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"user_id": user_id}
+    if statuses:
+        query["status"] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+    if after is not None:
+        # Strictly after (created_at, _id) in descending order; documents
+        # without created_at sort last and are only ordered by _id
+        if after["created_at"] is None:
+            query["created_at"] = None
+            query["_id"] = {"$lt": after["_id"]}
+        else:
+            query["$or"] = [
+                {"created_at": {"$lt": after["created_at"]}},
+                {"created_at": after["created_at"], "_id": {"$lt": after["_id"]}},
+                {"created_at": None}
+            ]
+    return query
+
+
+async def list_documents(collection, user_id: Optional[str] = None,
+                         statuses: Optional[List[str]] = None, limit: int = 50,
+                         cursor: Optional[str] = None,
+                         fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """One page of a user's documents: {'documents': [...], 'next_cursor'}.
+
+    `next_cursor` is None on the last page. Raises ValueError for a bad
+    cursor, limit or field name.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    after = decode_cursor(cursor) if cursor else None
+    query = page_query(user_id, statuses, after)
+    documents = await collection.find(query, projection(fields)) \
+        .sort(SORT).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1])
+    return {"documents": documents, "next_cursor": next_cursor}
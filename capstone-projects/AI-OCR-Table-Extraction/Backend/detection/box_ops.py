@@ -0,0 +1,94 @@
+"""Vectorized operations on (x1, y1, x2, y2) boxes.
+
+Detectors tend to report the same table several times: the contour fallback
+returns the outer border and every large rectangle inside it, and YOLO can
+emit overlapping candidates. Each surviving box is cropped and OCR'd, so
+duplicates are collapsed here, on NumPy arrays, before any cropping.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+
+def _as_array(boxes: Sequence[Sequence[float]]) -> np.ndarray:
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, 2] - boxes[:, 0]).clip(min=0) * (boxes[:, 3] - boxes[:, 1]).clip(min=0)
+
+
+def pairwise_intersection(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(len(a), len(b)) matrix of intersection areas."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    return (x2 - x1).clip(min=0) * (y2 - y1).clip(min=0)
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    inter = pairwise_intersection(a, b)
+    union = box_areas(a)[:, None] + box_areas(b)[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def nms(boxes: Sequence[Sequence[float]], scores: Optional[Sequence[float]] = None,
+        iou_threshold: float = 0.5) -> np.ndarray:
+    """Greedy non-maximum suppression; returns indices of kept boxes in
+    descending score order. Without scores, larger boxes win.
+
+    IoU is computed one kept box at a time against the candidates still
+    standing, so memory stays linear in the number of boxes (a YOLO head
+    has thousands of anchors; a full IoU matrix would take hundreds of MB).
+    """
+    arr = _as_array(boxes)
+    if arr.shape[0] == 0:
+        return np.empty(0, dtype=int)
+    score_arr = box_areas(arr) if scores is None else np.asarray(scores, dtype=np.float64)
+
+    order = np.argsort(-score_arr, kind="stable")
+    arr = arr[order]
+    areas = box_areas(arr)
+    remaining = np.arange(len(order))
+    keep = []
+    while remaining.size:
+        best, rest = remaining[0], remaining[1:]
+        keep.append(order[best])
+        inter = pairwise_intersection(arr[best:best + 1], arr[rest])[0]
+        union = areas[best] + areas[rest] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        remaining = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=int)
+
+
+def contained_mask(boxes: Sequence[Sequence[float]], containment: float = 0.9) -> np.ndarray:
+    """True for every box that lies (at least `containment` of its area)
+    inside another box that is at least as large. Of identical boxes, the
+    first one is kept."""
+    arr = _as_array(boxes)
+    n = arr.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    areas = box_areas(arr)
+    inter = pairwise_intersection(arr, arr)
+    idx = np.arange(n)
+    # j can absorb i when j is larger, or equally large and earlier
+    bigger = (areas[None, :] > areas[:, None]) | \
+        ((areas[None, :] == areas[:, None]) & (idx[None, :] < idx[:, None]))
+    covered = inter >= containment * areas[:, None]
+    return np.any(covered & bigger, axis=1)
+
+
+def dedupe_boxes(boxes: Sequence[Sequence[float]], iou_threshold: float = 0.5,
+                 containment: float = 0.9) -> List[Box]:
+    """Drop nested boxes, then suppress overlapping ones. Returns integer
+    boxes sorted by area, largest first."""
+    arr = _as_array(boxes)
+    if arr.shape[0] == 0:
+        return []
+    arr = arr[~contained_mask(arr, containment)]
+    arr = arr[nms(arr, iou_threshold=iou_threshold)]
+    return [tuple(int(v) for v in box) for box in arr]
@@ -0,0 +1,123 @@
+"""Ruling-line (grid) based table detection.
+
+Tables in scanned statements and forms are drawn with horizontal and vertical
+rules. Opening a binarized page with long thin kernels keeps only those rules;
+connected groups of rules that cross each other enough times are tables, and
+the positions of the rules inside each group are the table's cell grid.
+
+Everything runs on a downscaled copy of the page with morphology, connected
+components and projections, so the cost is linear in the number of pixels of
+that copy. Results are mapped back to full-resolution coordinates.
+"""
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+DEFAULT_WORKING_SIZE = 1024
+
+
+def _binarize(gray: np.ndarray) -> np.ndarray:
+    """Ink as 255 on a 0 background."""
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV,
+                                 15, 10)
+
+
+def line_masks(gray: np.ndarray, min_line_fraction: float = 1 / 30):
+    """Return (horizontal, vertical) masks holding only long straight rules."""
+    binary = _binarize(gray)
+    h, w = gray.shape[:2]
+    h_len = max(10, int(w * min_line_fraction))
+    v_len = max(10, int(h * min_line_fraction))
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN,
+                                  cv2.getStructuringElement(cv2.MORPH_RECT, (h_len, 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN,
+                                cv2.getStructuringElement(cv2.MORPH_RECT, (1, v_len)))
+    return horizontal, vertical
+
+
+def line_runs(profile: np.ndarray):
+    """First and last index of each run of non-zero entries in a 1-D projection."""
+    idx = np.flatnonzero(profile)
+    if idx.size == 0:
+        return idx, idx
+    breaks = np.flatnonzero(np.diff(idx) > 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [idx.size]))
+    return idx[starts], idx[ends - 1]
+
+
+def _boundaries(profile: np.ndarray, offset: int, length: int, tolerance: int = 3) -> np.ndarray:
+    """Rule centers along one axis of a table, plus the table's outer edges
+    when no rule is drawn there (tables without an outer border)."""
+    starts, ends = line_runs(profile)
+    positions = (starts + ends) / 2.0
+    if starts.size == 0 or starts[0] > tolerance:
+        positions = np.concatenate(([0], positions))
+    if ends.size == 0 or length - 1 - ends[-1] > tolerance:
+        positions = np.concatenate((positions, [length - 1]))
+    return positions + offset
+
+
+def detect_grid_tables(image: np.ndarray, working_size: int = DEFAULT_WORKING_SIZE,
+                       min_intersections: int = 4, min_area_ratio: float = 0.005) -> List[Dict]:
+    """Find ruled tables and their cell grids.
+
+    Args:
+        image: BGR or grayscale page.
+        working_size: Longest side of the downscaled copy used for detection.
+        min_intersections: Minimum number of rule crossings for a group of
+            lines to count as a table.
+        min_area_ratio: Ignore candidate tables smaller than this fraction
+            of the page.
+    Returns:
+        List of dicts sorted top to bottom, each with
+        'bbox': (x1, y1, x2, y2), 'row_boundaries' and 'col_boundaries'
+        (sorted integer positions of the row/column separators, outer edges
+        included), all in full-resolution page coordinates.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    full_h, full_w = gray.shape[:2]
+    scale = min(1.0, working_size / max(full_h, full_w))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) \
+        if scale < 1.0 else gray
+
+    horizontal, vertical = line_masks(small)
+    # Slight dilation so rules that stop a pixel short of each other still cross
+    kernel = np.ones((3, 3), np.uint8)
+    h_thick = cv2.dilate(horizontal, kernel)
+    v_thick = cv2.dilate(vertical, kernel)
+    grid = cv2.bitwise_or(h_thick, v_thick)
+    crossings = cv2.bitwise_and(h_thick, v_thick)
+
+    n_groups, labels, stats, _ = cv2.connectedComponentsWithStats(grid, connectivity=8)
+    n_cross, _, _, cross_centroids = cv2.connectedComponentsWithStats(crossings, connectivity=8)
+    if n_groups <= 1 or n_cross <= 1:
+        return []
+
+    # Count crossings per line group with one histogram instead of a loop
+    cx = cross_centroids[1:, 0].round().astype(int).clip(0, small.shape[1] - 1)
+    cy = cross_centroids[1:, 1].round().astype(int).clip(0, small.shape[0] - 1)
+    cross_counts = np.bincount(labels[cy, cx], minlength=n_groups)
+
+    min_area = min_area_ratio * small.shape[0] * small.shape[1]
+    tables = []
+    for label in range(1, n_groups):
+        x, y, w, h, _ = stats[label]
+        if cross_counts[label] < min_intersections or w * h < min_area:
+            continue
+
+        group = labels[y:y + h, x:x + w] == label
+        rows = _boundaries(((horizontal[y:y + h, x:x + w] > 0) & group).any(axis=1), y, h)
+        cols = _boundaries(((vertical[y:y + h, x:x + w] > 0) & group).any(axis=0), x, w)
+
+        tables.append({
+            'bbox': (int(x / scale), int(y / scale),
+                     min(full_w, int(np.ceil((x + w) / scale))),
+                     min(full_h, int(np.ceil((y + h) / scale)))),
+            'row_boundaries': [int(round(v / scale)) for v in rows],
+            'col_boundaries': [int(round(v / scale)) for v in cols],
+        })
+
+    tables.sort(key=lambda t: (t['bbox'][1], t['bbox'][0]))
+    return tables
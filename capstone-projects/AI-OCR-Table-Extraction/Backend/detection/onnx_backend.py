@@ -0,0 +1,141 @@
+"""ONNX Runtime CPU backend for the YOLO table detector.
+
+Exporting the ultralytics model to ONNX once lets the API load the detector
+with onnxruntime only, which avoids importing torch at startup and runs
+noticeably faster on CPU. `export_onnx` produces the model (optionally with
+dynamic INT8 weight quantization) and `OnnxTableDetector` runs it on fixed
+letterboxed inputs.
+"""
+import os
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .box_ops import nms
+
+try:
+    import onnxruntime as ort  # type: ignore
+    _HAS_ORT = True
+except Exception:
+    ort = None
+    _HAS_ORT = False
+
+DEFAULT_INPUT_SIZE = 640
+LETTERBOX_COLOR = (114, 114, 114)
+
+
+def letterbox(image: np.ndarray,
+              size: int = DEFAULT_INPUT_SIZE) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to a fixed `size` x `size` square.
+
+    Returns the padded BGR image, the scale factor and the (x, y) padding so
+    boxes can be mapped back to the original image.
+    """
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR) \
+        if (new_w, new_h) != (w, h) else image
+
+    pad_x = (size - new_w) // 2
+    pad_y = (size - new_h) // 2
+    padded = cv2.copyMakeBorder(resized, pad_y, size - new_h - pad_y, pad_x, size - new_w - pad_x,
+                                cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return padded, scale, (pad_x, pad_y)
+
+
+def decode_yolo_output(output: np.ndarray, scale: float, pad: Tuple[int, int],
+                       image_shape: Tuple[int, int], conf_threshold: float = 0.25,
+                       iou_threshold: float = 0.45) -> List[Tuple[int, int, int, int]]:
+    """Convert a raw YOLOv8 head output of shape (1, 4 + classes, anchors)
+    into (x1, y1, x2, y2) boxes in original image coordinates."""
+    preds = output[0].T  # (anchors, 4 + classes)
+    if preds.shape[1] <= 4:
+        return []
+    scores = preds[:, 4:].max(axis=1)
+    keep = scores >= conf_threshold
+    if not np.any(keep):
+        return []
+    preds, scores = preds[keep], scores[keep]
+
+    cx, cy, bw, bh = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+    xyxy = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+    xyxy -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=xyxy.dtype)
+    xyxy /= scale
+
+    h, w = image_shape
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+
+    return [tuple(int(v) for v in xyxy[i]) for i in nms(xyxy, scores, iou_threshold)]
+
+
+def export_onnx(model_path: str, output_path: Optional[str] = None, imgsz: int = DEFAULT_INPUT_SIZE,
+                quantize: bool = False) -> str:
+    """Export an ultralytics .pt model to ONNX with a fixed input size.
+
+    With `quantize=True` the exported graph is additionally converted with
+    dynamic INT8 weight quantization and the path of the quantized model
+    is returned. Requires ultralytics (and onnxruntime for quantization);
+    this is an offline step, not something the API does at startup.
+    """
+    from ultralytics import YOLO  # type: ignore
+
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+    onnx_path = output_path or os.path.splitext(model_path)[0] + ".onnx"
+    if os.path.abspath(str(exported)) != os.path.abspath(onnx_path):
+        os.replace(str(exported), onnx_path)
+
+    if not quantize:
+        return onnx_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+    int8_path = os.path.splitext(onnx_path)[0] + ".int8.onnx"
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxTableDetector:
+    def __init__(self, model_path: str, input_size: Optional[int] = None,
+                 conf_threshold: float = 0.25, iou_threshold: float = 0.45,
+                 num_threads: Optional[int] = None):
+        if not _HAS_ORT:
+            raise RuntimeError("onnxruntime is not installed")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Exported models have a fixed (1, 3, S, S) input; fall back to the
+        # default when the size is symbolic.
+        declared = model_input.shape[-1]
+        if not isinstance(declared, int):
+            declared = DEFAULT_INPUT_SIZE
+        self.input_size = input_size or declared
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    def _to_tensor(self, image: np.ndarray) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+        padded, scale, pad = letterbox(image, self.input_size)
+        rgb = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB)
+        tensor = np.ascontiguousarray(rgb.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+        return tensor, scale, pad
+
+    def predict(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        tensor, scale, pad = self._to_tensor(image)
+        output = self.session.run(None, {self.input_name: tensor})[0]
+        return decode_yolo_output(output, scale, pad, image.shape[:2],
+                                  self.conf_threshold, self.iou_threshold)
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[List[Tuple[int, int, int, int]]]:
+        # The exported graph has a fixed batch dimension of 1
+        return [self.predict(image) for image in images]
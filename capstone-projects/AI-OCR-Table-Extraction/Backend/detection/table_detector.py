@@ -1,62 +1,220 @@
 """Table detection with a safe fallback when heavy dependencies are missing.
 
-This module prefers to use ultralytics.YOLO if available, but falls back to a
-lightweight contour-based or full-image detector when the package/model is not
-installed. This keeps the app runnable on systems without GPU/YOLO installed.
+This module prefers a YOLO model when one is available, but falls back to a
+lightweight ruling-line (grid) detector, then a contour-based or full-image
+detector when the package/model is not installed. This keeps the app runnable
+on systems without GPU/YOLO installed.
+
+The YOLO model can run through two backends: "torch" (ultralytics + PyTorch,
+loading the .pt file) or "onnx" (onnxruntime, loading an exported .onnx file,
+see `onnx_backend.export_onnx`). The backend is chosen with the `backend`
+argument or the TABLE_DETECTOR_BACKEND environment variable; "auto" prefers
+ONNX when an exported model is present and "none" disables the model.
 """
+import logging
+import os
 import cv2
 import numpy as np
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from .box_ops import dedupe_boxes
+from .grid_detector import DEFAULT_WORKING_SIZE, detect_grid_tables
+from .onnx_backend import OnnxTableDetector, _HAS_ORT
 
-try:
-    from ultralytics import YOLO  # type: ignore
-    _HAS_YOLO = True
-except Exception:
-    YOLO = None
-    _HAS_YOLO = False
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("auto", "torch", "onnx", "none")
 
 
 class TableDetector:
-    def __init__(self, model_path: str = "models/table_detection.pt"):
-        """Initialize detector. If YOLO is available it will be used; otherwise
-        a lightweight fallback is used.
+    def __init__(self, model_path: str = "models/table_detection.pt", backend: Optional[str] = None,
+                 onnx_path: Optional[str] = None, pyramid_levels: int = 0,
+                 refine_edges: bool = True):
+        """Initialize detector. If a YOLO backend can be loaded it will be
+        used; otherwise a lightweight fallback is used.
+
+        Args:
+            model_path: Path to the ultralytics .pt weights (torch backend).
+            backend: One of "auto", "torch", "onnx" or "none".
+            onnx_path: Path to the exported ONNX model; defaults to
+                TABLE_DETECTOR_ONNX_PATH or `model_path` with an .onnx suffix.
+            pyramid_levels: Coarse-to-fine mode for the fallback detector.
+                With N > 0 tables are found on the page halved N times
+                (2 = 1/4 scale) and the boxes are mapped back to full
+                resolution.
+            refine_edges: In coarse-to-fine mode, snap each box edge to the
+                ruling line found in a narrow full-resolution band around it.
         """
-        self.use_yolo = _HAS_YOLO
-        if self.use_yolo:
-            try:
-                self.model = YOLO(model_path)
-            except Exception:
-                # If model file isn't present or fails to load, disable YOLO
-                self.use_yolo = False
-                self.model = None
-        else:
-            self.model = None
+        backend = (backend or os.getenv("TABLE_DETECTOR_BACKEND", "auto")).lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown detector backend '{backend}', expected one of {BACKENDS}")
+        onnx_path = onnx_path or os.getenv("TABLE_DETECTOR_ONNX_PATH") \
+            or os.path.splitext(model_path)[0] + ".onnx"
+
+        auto = backend == "auto"
+        if auto:
+            backend = "onnx" if _HAS_ORT and os.path.exists(onnx_path) else "torch"
+
+        self.backend = None
+        self.model = None
+        if backend == "onnx":
+            self.model = self._load_onnx(onnx_path)
+            if self.model is None and auto:
+                # A broken or incompatible .onnx file: try the torch weights
+                backend = "torch"
+        if backend == "torch":
+            self.model = self._load_torch(model_path)
+        if self.model is not None:
+            self.backend = backend
+        self.use_yolo = self.backend is not None
+        self.pyramid_levels = pyramid_levels
+        self.refine_edges = refine_edges
+
+    @staticmethod
+    def _load_torch(model_path: str):
+        try:
+            # Imported lazily: ultralytics pulls in torch, which is slow to import
+            from ultralytics import YOLO  # type: ignore
+            return YOLO(model_path)
+        except Exception:
+            # If the package or model file isn't present, disable YOLO
+            return None
+
+    @staticmethod
+    def _load_onnx(onnx_path: str):
+        try:
+            return OnnxTableDetector(onnx_path)
+        except Exception as e:
+            logger.warning(f"ONNX table detector unavailable ({e}); using fallback detector")
+            return None
 
     def detect_tables(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """Return list of bounding boxes (x1,y1,x2,y2).
 
-        If YOLO is available it will be used; otherwise, perform a simple
+        If YOLO is available it will be used; otherwise, look for ruled
+        tables with the grid detector, then fall back to a simple
         contour-based detection for large rectangular areas, and if that
         fails, return one box covering the whole image.
         """
-        h, w = image.shape[:2]
-
-        if self.use_yolo and self.model is not None:
+        if self.use_yolo:
             try:
-                results = self.model(image)
-                boxes = []
-                for r in results:
-                    for box in r.boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        boxes.append((int(x1), int(y1), int(x2), int(y2)))
+                boxes = self._model_detect_batch([image])[0]
                 if boxes:
                     return boxes
             except Exception:
                 # Fall through to fallback detector
                 pass
 
-        # Fallback: simple contour detection for large rectangular shapes
+        return self._detect_fallback(image)
+
+    def detect_tables_batch(self,
+                            images: List[np.ndarray]) -> List[List[Tuple[int, int, int, int]]]:
+        """Batched counterpart of `detect_tables`.
+
+        With YOLO the pages go through the model in a single call; pages
+        without YOLO detections (or all pages, when YOLO is unavailable) use
+        the fallback detector.
+        """
+        detections: List[List[Tuple[int, int, int, int]]] = [[] for _ in images]
+        if self.use_yolo and images:
+            try:
+                detections = self._model_detect_batch(list(images))
+            except Exception:
+                pass
+
+        return [boxes or self._detect_fallback(image) for boxes, image in zip(detections, images)]
+
+    def _model_detect_batch(self,
+                            images: List[np.ndarray]) -> List[List[Tuple[int, int, int, int]]]:
+        if self.backend == "onnx":
+            detections = self.model.predict_batch(images)
+        else:
+            detections = [self._yolo_boxes(r) for r in self.model(images)]
+        return [dedupe_boxes(boxes) for boxes in detections]
+
+    @staticmethod
+    def _yolo_boxes(result) -> List[Tuple[int, int, int, int]]:
+        boxes = []
+        for box in result.boxes:
+            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+            boxes.append((int(x1), int(y1), int(x2), int(y2)))
+        return boxes
+
+    def detect_tables_with_grid(self, image: np.ndarray) -> List[Dict]:
+        """Like `detect_tables`, but also return the cell grid of each table.
+
+        Returns dicts with 'bbox', 'row_boundaries' and 'col_boundaries' in
+        page coordinates (see `grid_detector.detect_grid_tables`). Boundaries
+        are empty lists for tables without ruling lines; structure analysis
+        then has to infer rows and columns from the OCR boxes.
+        """
+        if not self.use_yolo:
+            tables = detect_grid_tables(image)
+            if tables:
+                return tables
+            # No ruling lines anywhere on the page, so the fallback boxes have
+            # none either: reuse the empty result instead of searching again
+            return [{'bbox': box, 'row_boundaries': [], 'col_boundaries': []}
+                    for box in self._detect_fallback(image, grid_tables=tables)]
+
+        tables = []
+        for x1, y1, x2, y2 in self.detect_tables(image):
+            grids = detect_grid_tables(image[y1:y2, x1:x2]) if x2 > x1 and y2 > y1 else []
+            if grids:
+                # Keep the detector's box but take the grid of the largest ruled area
+                grid = max(grids, key=lambda t: (t['bbox'][2] - t['bbox'][0])
+                           * (t['bbox'][3] - t['bbox'][1]))
+                rows = [y1 + v for v in grid['row_boundaries']]
+                cols = [x1 + v for v in grid['col_boundaries']]
+            else:
+                rows, cols = [], []
+            tables.append({'bbox': (x1, y1, x2, y2),
+                           'row_boundaries': rows, 'col_boundaries': cols})
+        return tables
+
+    def _detect_fallback(self, image: np.ndarray, grid_tables: Optional[List[Dict]] = None
+                         ) -> List[Tuple[int, int, int, int]]:
+        """`grid_tables` is the grid detector's result for the full-resolution
+        page when the caller already has it."""
+        h, w = image.shape[:2]
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+        if self.pyramid_levels > 0:
+            small = gray
+            for _ in range(self.pyramid_levels):
+                small = cv2.pyrDown(small)
+            factor_y, factor_x = h / small.shape[0], w / small.shape[1]
+
+            working_size = min(DEFAULT_WORKING_SIZE, max(small.shape[:2]))
+            boxes = self._detect_boxes(small, working_size=working_size)
+            boxes = [(int(x1 * factor_x), int(y1 * factor_y),
+                      min(w, int(np.ceil(x2 * factor_x))), min(h, int(np.ceil(y2 * factor_y))))
+                     for x1, y1, x2, y2 in boxes]
+            if boxes and self.refine_edges:
+                # A few coarse pixels either side of each edge, in full-resolution pixels
+                band = int(np.ceil(max(h, w) / working_size)) * 4
+                boxes = [self._refine_box(gray, box, band) for box in boxes]
+        else:
+            boxes = self._detect_boxes(gray, grid_tables=grid_tables)
+
+        if boxes:
+            return boxes
+
+        # Last-resort: return full-image box
+        return [(0, 0, w, h)]
+
+    @staticmethod
+    def _detect_boxes(gray: np.ndarray, working_size: Optional[int] = None,
+                      grid_tables: Optional[List[Dict]] = None) -> List[Tuple[int, int, int, int]]:
+        h, w = gray.shape[:2]
+
+        if grid_tables is None:
+            grid_tables = detect_grid_tables(gray, working_size=working_size) if working_size \
+                else detect_grid_tables(gray)
+        if grid_tables:
+            return [t['bbox'] for t in grid_tables]
+
+        # Fallback: simple contour detection for large rectangular shapes
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)
         edged = cv2.Canny(blurred, 50, 150)
         contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -71,13 +229,36 @@ class TableDetector:
                 if len(approx) >= 4:
                     boxes.append((x, y, x + cw, y + ch))
 
-        if boxes:
-            # Optionally sort by area descending
-            boxes = sorted(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
-            return boxes
+        # Nested and overlapping rectangles describe the same table; collapse
+        # them so each region is cropped and OCR'd once (largest first)
+        return dedupe_boxes(boxes)
 
-        # Last-resort: return full-image box
-        return [(0, 0, w, h)]
+    @staticmethod
+    def _refine_box(gray: np.ndarray, box: Tuple[int, int, int, int], band: int,
+                    min_fill: float = 0.5) -> Tuple[int, int, int, int]:
+        """Move each edge of a coarse box onto the outer side of the ruling
+        line within +/- `band` pixels. Only those narrow strips of the
+        full-resolution page are read; edges without a rule are kept."""
+        h, w = gray.shape[:2]
+        x1, y1, x2, y2 = box
+
+        def snap(strip: np.ndarray, axis: int, lo: int, outer_first: bool, current: int) -> int:
+            if strip.size == 0:
+                return current
+            fill = (strip < 128).mean(axis=axis)
+            hits = np.flatnonzero(fill >= min_fill)
+            if hits.size == 0:
+                return current
+            return lo + int(hits[0] if outer_first else hits[-1])
+
+        top, bottom = max(0, y1 - band), min(h, y2 + band)
+        left, right = max(0, x1 - band), min(w, x2 + band)
+        new_y1 = snap(gray[top:min(h, y1 + band), x1:x2], 1, top, True, y1)
+        new_y2 = snap(gray[max(0, y2 - band):bottom, x1:x2], 1, max(0, y2 - band),
+                      False, y2 - 1) + 1
+        new_x1 = snap(gray[y1:y2, left:min(w, x1 + band)], 0, left, True, x1)
+        new_x2 = snap(gray[y1:y2, max(0, x2 - band):right], 0, max(0, x2 - band), False, x2 - 1) + 1
+        return (new_x1, new_y1, new_x2, new_y2)
 
     def extract_table_regions(self, image: np.ndarray, boxes: List[Tuple[int, int, int, int]]) -> List[np.ndarray]:
         """Crop regions from the image corresponding to boxes."""
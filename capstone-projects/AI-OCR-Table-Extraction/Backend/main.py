@@ -1,28 +1,69 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import (BackgroundTasks, FastAPI, File, UploadFile, HTTPException, Query, Request,
+                     WebSocket, WebSocketDisconnect)
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-from contextlib import asynccontextmanager
-import shutil
+from starlette.background import BackgroundTask
+from contextlib import AsyncExitStack, asynccontextmanager
+import asyncio
+import functools
 import os
 import json
-from typing import Dict
+import shutil
+import tempfile
+from typing import Dict, List, Optional
 import logging
+from datetime import datetime
+from urllib.parse import quote
+from bson import ObjectId
 from dotenv import load_dotenv
 
-from .preprocessing.image_processing import PreprocessingEngine
-import cv2
+from .converter.data_converter import EXPORT_MEDIA_TYPES, DataConverter, document_tables
+from .database.database import DB_NAME, MONGODB_URL, document_query, init_db
+from .database.pagination import SORT as NEWEST_FIRST, list_documents as list_document_page
+from .pipeline.batch import BatchError, open_archive, process_archive
+from .pipeline.jobs import JobQueue
+from .pipeline.lease_queue import submit_async
+from .pipeline.stages import (_HAS_TESSERACT, ocr_artifact, run_extract_page, start_batchers,
+                              stop_batchers)
+from .storage.artifacts import check_digest, store_from_env
+from .utils.executors import Overloaded, PipelineExecutor
+from .utils.file_serving import (CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, file_response,
+                                 stream_response)
 from .utils.logging_config import setup_logger
+from .utils.serialization import FastJSONResponse, NDJSONResponse
+from .utils.uploads import (MAX_BATCH_BYTES, MAX_UPLOAD_BYTES, UploadTooLarge, read_upload,
+                            safe_filename, save_upload)
+from .utils.websocket import ws_manager
 
 # Setup logging
 setup_logger()
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The client connects lazily; a short server selection timeout keeps
+    # startup (and endpoints needing the DB) from hanging when MongoDB is down.
+    timeout_ms = int(os.getenv("MONGODB_TIMEOUT_MS", "2000"))
+    app.mongodb_client = AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=timeout_ms)
+    app.mongodb = app.mongodb_client[DB_NAME]
+    await init_db(app.mongodb)
+    start_batchers()
+    if PIPELINE_QUEUE == "local":
+        job_queue.start()
+    yield
+    await job_queue.stop()
+    stop_batchers()
+    app.mongodb_client.close()
+    pipeline.shutdown(wait=False)
+
+
 app = FastAPI(
     title="AI OCR Table Extraction (preprocessing-only)",
     description="Lightweight server that focuses on image preprocessing and keeps things simple for local testing.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS
@@ -35,138 +76,416 @@ app.add_middleware(
 )
 
 # Initialize components
-preprocessor = PreprocessingEngine()
+pipeline = PipelineExecutor()
+artifacts = store_from_env()
+job_queue = JobQueue(pipeline, ws_manager, store=artifacts)
+# "local" runs jobs in this process; "mongo" leaves them in the jobs
+# collection for `python -m Backend.pipeline.worker` processes
+PIPELINE_QUEUE = os.getenv("PIPELINE_QUEUE", "local")
 
-try:
-    import pytesseract
-    _HAS_OCR = True
-except ImportError:
-    _HAS_OCR = False
+_HAS_OCR = _HAS_TESSERACT
+if not _HAS_OCR:
     logger.warning("pytesseract not installed - OCR will be disabled")
 
-# Create required directories
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+# Create required directories (uploads are only staged here on their way
+# into the artifact store)
 os.makedirs("data/uploads", exist_ok=True)
-os.makedirs("data/processed", exist_ok=True)
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "mode": "preprocessing-only"}
 
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse before the multipart body is read when the client declares
+    # its size. Chunked uploads are read in full by the form parser and
+    # only refused by save_upload/read_upload afterwards.
+    limit = {"/upload/": MAX_UPLOAD_BYTES, "/extract": MAX_UPLOAD_BYTES,
+             "/batch": MAX_BATCH_BYTES}.get(request.url.path)
+    if limit is not None:
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > limit:
+            return JSONResponse({"detail": f"Upload exceeds the {limit} byte limit"},
+                                status_code=413)
+    return await call_next(request)
+
+
+async def _record_upload(db, document_id: ObjectId, saved: Dict):
+    await db.documents.insert_one({
+        "_id": document_id, "filename": saved["filename"], "sha256": saved["sha256"],
+        "size": saved["size"], "status": "uploaded", "user_id": None,
+        "created_at": datetime.utcnow()
+    })
+
+
+async def _find_document(request: Request, filename: str,
+                         document_id: Optional[str] = None) -> Optional[Dict]:
+    """The document `document_id`, else the latest one uploaded as
+    `filename`; raises 503 without a database."""
+    db = getattr(request.app, "mongodb", None)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database is not available")
+    if document_id:
+        return await db.documents.find_one(document_query(document_id))
+    found = await db.documents.find({"filename": filename}).sort(NEWEST_FIRST).limit(1).to_list(1)
+    return found[0] if found else None
+
+
 @app.post("/upload/")
-async def upload_document(file: UploadFile = File(...)):
-    """Save uploaded file to data/uploads and return the filename for processing."""
-    file_path = os.path.join("data", "uploads", file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+async def upload_document(request: Request, file: UploadFile = File(...)):
+    """Store an uploaded file and return its document id for processing.
+
+    The file is copied to a staging directory in chunks without blocking
+    the event loop and hashed on the way, then moved into the artifact
+    store under its SHA-256 (a duplicate is dropped). The document record
+    (when a database is attached) is written before the response, so the
+    upload can be processed at once.
+    """
+    db = getattr(request.app, "mongodb", None)
+    # One staging directory per request: uploads with the same name must
+    # not replace each other before they are hashed into the store
+    staging = tempfile.mkdtemp(dir=os.path.join("data", "uploads"))
+    try:
+        saved = await save_upload(file, staging, max_bytes=MAX_UPLOAD_BYTES)
+        await artifacts.put_file(db, saved["path"], sha256=saved["sha256"],
+                                 content_type=file.content_type, name=saved["filename"],
+                                 keep=False)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    response = {"filename": saved["filename"], "status": "uploaded",
+                "size": saved["size"], "sha256": saved["sha256"]}
+    if db is not None:
+        document_id = ObjectId()
+        await _record_upload(db, document_id, saved)
+        response["document_id"] = str(document_id)
+    return response
 
-    return {"filename": file.filename, "status": "uploaded"}
 
-@app.post("/process/")
-async def process_document(filename: str):
-    """Process a previously uploaded file by filename using the preprocessing engine.
+@app.post("/process/", status_code=202)
+async def process_document(request: Request, filename: str, document_id: Optional[str] = None):
+    """Queue a previously uploaded file for processing and return its job id.
 
-    The endpoint writes a processed image to `data/processed/{filename}` and
-    returns basic metadata so you can verify preprocessing worked.
+    The job id is the document id: `document_id` when given, else the
+    latest upload named `filename`. Follow progress with GET /jobs/{job_id}
+    or the /ws/jobs/{job_id} WebSocket; the processed image goes to the
+    artifact store, as the document's `processed_sha256`.
     """
-    file_path = os.path.join("data", "uploads", filename)
-    if not os.path.exists(file_path):
+    document = await _find_document(request, filename, document_id)
+    if document is None or not document.get("sha256"):
         raise HTTPException(status_code=404, detail="Uploaded file not found")
 
-    img = cv2.imread(file_path)
-    if img is None:
-        raise HTTPException(status_code=400, detail="Could not read image")
+    db = request.app.mongodb
+    filename = document.get("filename") or filename
+    if PIPELINE_QUEUE == "mongo":
+        return await submit_async(db, document["_id"], filename, document["sha256"])
+    return await job_queue.submit(db, document["_id"], filename, document["sha256"])
 
-    processed_image = preprocessor.process(img)
 
-    # Save processed image as PNG
-    processed_path = os.path.join("data", "processed", f"{filename}.png")
-    cv2.imwrite(processed_path, processed_image)
+async def _persist_extraction(db, document_id: ObjectId, filename: str, content_type: Optional[str],
+                              data: bytes, result: Dict):
+    """Store the upload, the processed image and the document record of an
+    /extract call, after its response has been sent."""
+    try:
+        upload = await artifacts.put_bytes(db, data, content_type=content_type, name=filename)
+        processed = await artifacts.put_bytes(db, result["processed_png"], content_type="image/png",
+                                              name=f"{filename}.png")
+        if db is not None:
+            now = datetime.utcnow()
+            await db.documents.insert_one({
+                "_id": document_id,
+                "filename": filename,
+                "status": "completed",
+                "user_id": None,
+                "sha256": upload["sha256"],
+                "size": upload["size"],
+                "processed_sha256": processed["sha256"],
+                "results": result["tables"],
+                "created_at": now,
+                "completed_at": now
+            })
+    except Exception as e:
+        logger.warning(f"Could not persist extraction of {filename}: {e}")
 
-    return {
-        "status": "processed",
-        "filename": filename,
-        "processed_path": processed_path,
-        "shape": processed_image.shape
-    }
 
-@app.get("/documents/")
-async def list_documents():
-    """Return list of uploaded filenames for quick inspection."""
-    files = os.listdir(os.path.join("data", "uploads"))
-    return {"uploads": files}
+@app.post("/extract")
+async def extract_document(request: Request, background_tasks: BackgroundTasks,
+                           file: UploadFile = File(...), format: str = "json",
+                           detect: bool = True, persist: bool = False):
+    """Run preprocess, detection, OCR, structure and conversion on an upload
+    in one call, entirely in memory.
 
-@app.get("/document/{filename}")
-async def get_document(filename: str):
-    """Return processed results (JSON) if available, otherwise raw upload info."""
-    result_path = os.path.join("data", "processed", f"{filename}.png")
-    if os.path.exists(result_path):
-        return {"filename": filename, "processed_path": result_path}
+    The image is decoded once and nothing is written to disk unless
+    `persist` is set; then the upload and the processed image go to the
+    artifact store and a document record is saved, after the response is
+    sent. `format=json` returns the
+    tables inline; csv, xlsx, ndjson and parquet stream the converted file.
+    """
+    if format != "json" and format not in EXPORT_MEDIA_TYPES:
+        formats = ', '.join(EXPORT_MEDIA_TYPES)
+        raise HTTPException(status_code=400,
+                            detail=f"Unsupported format - use json or one of {formats}")
+    try:
+        filename = safe_filename(file.filename)
+        data = await read_upload(file, max_bytes=MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    upload_path = os.path.join("data", "uploads", filename)
-    if os.path.exists(upload_path):
-        return {"filename": filename, "uploaded_path": upload_path}
+    async with pipeline.slot():
+        try:
+            result = await run_extract_page(pipeline, data, detect, persist)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    raise HTTPException(status_code=404, detail="File not found")
+    document_id = None
+    if persist:
+        document_id = ObjectId()
+        background_tasks.add_task(_persist_extraction, getattr(request.app, "mongodb", None),
+                                  document_id, filename, file.content_type, data, result)
+
+    if format == "json":
+        return FastJSONResponse({
+            "filename": filename,
+            "document_id": str(document_id) if document_id else None,
+            "shape": result["shape"],
+            "word_count": result["word_count"],
+            "tables": result["tables"]
+        }, background=background_tasks)
+
+    tables = document_tables(result["tables"])
+    if not tables:
+        raise HTTPException(status_code=422, detail="No tables found")
+    if format == "parquet" and len(tables) > 1:
+        raise HTTPException(status_code=400,
+                            detail="Parquet holds one table - use xlsx or json for several")
+    stem = os.path.splitext(filename)[0]
+    return StreamingResponse(
+        DataConverter.aiter_bytes(tables, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(stem)}.{format}"},
+        background=background_tasks
+    )
+
+
+@app.post("/batch")
+async def process_batch(file: UploadFile = File(...)):
+    """Process every image in a zip archive and stream one NDJSON line per
+    file as it finishes, then a summary line.
+
+    Entries are read from the archive one at a time and never extracted to
+    disk; pages run concurrently on the pipeline's process pool. The whole
+    batch holds one pipeline slot, so a busy server answers 429 up front.
+    """
+    try:
+        archive = open_archive(file.file)
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/ocr/{filename}")
-async def perform_ocr(filename: str):
+    # The archive is closed however the request ends, including when the
+    # server is too busy to give it a slot
+    resources = AsyncExitStack()
+    resources.callback(archive.close)
+    try:
+        await resources.enter_async_context(pipeline.slot())
+    except BaseException:
+        await resources.aclose()
+        raise
+
+    async def results():
+        try:
+            concurrency = max(1, pipeline.processes or pipeline.threads)
+            async for item in process_archive(archive, pipeline, concurrency=concurrency):
+                yield item
+        finally:
+            await resources.aclose()
+
+    # The background task releases the slot and the archive even when the
+    # body is never iterated (the client disconnected first); closing the
+    # stack a second time does nothing
+    return NDJSONResponse(results(), background=BackgroundTask(resources.aclose))
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    """Current status, stage and progress of a processing job."""
+    db = getattr(request.app, "mongodb", None)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database is not available")
+    document = await db.documents.find_one(
+        document_query(job_id),
+        {"filename": 1, "status": 1, "stage": 1, "progress": 1, "error": 1, "completed_at": 1})
+    if document is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    document["job_id"] = str(document.pop("_id"))
+    return document
+
+
+@app.websocket("/ws/jobs/{job_id}")
+async def job_updates(websocket: WebSocket, job_id: str):
+    """Push {status, stage, progress} messages for a job until the client leaves."""
+    await ws_manager.connect(websocket, job_id)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        ws_manager.disconnect(websocket, job_id)
+
+
+@app.get("/documents/", response_class=FastJSONResponse)
+async def list_documents(request: Request, user_id: Optional[str] = None,
+                         status: Optional[List[str]] = Query(None), limit: int = 50,
+                         cursor: Optional[str] = None, fields: Optional[str] = None):
+    """List a user's documents newest first, one page at a time.
+
+    Pass the returned `next_cursor` back as `cursor` for the next page;
+    it is null on the last one. `status` may be repeated to filter on
+    several statuses, and `fields` is a comma-separated projection
+    (`results` is left out unless asked for).
+    """
+    db = getattr(request.app, "mongodb", None)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database is not available")
+    try:
+        page = await list_document_page(db.documents, user_id=user_id, statuses=status, limit=limit,
+                                        cursor=cursor, fields=fields.split(",") if fields else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for document in page["documents"]:
+        document["document_id"] = str(document.pop("_id"))
+    return page
+
+@app.get("/document/{filename}")
+async def get_document(request: Request, filename: str):
+    """Return the latest upload named `filename`: its document id, status
+    and the hashes of the upload and (once processed) the processed image,
+    both served by GET /artifacts/{sha256}."""
+    document = await _find_document(request, filename)
+    if document is None or not document.get("sha256"):
+        raise HTTPException(status_code=404, detail="File not found")
+    return {"filename": filename, "document_id": str(document["_id"]),
+            "status": document.get("status"), "sha256": document["sha256"],
+            "size": document.get("size"), "processed_sha256": document.get("processed_sha256"),
+            "created_at": document.get("created_at")}
+
+
+@app.post("/ocr/{filename}", response_class=FastJSONResponse)
+async def perform_ocr(request: Request, filename: str):
     """Perform OCR on a processed image."""
     if not _HAS_OCR:
         raise HTTPException(status_code=400, detail="OCR is not available - please install pytesseract")
 
     # Get the processed image
-    processed_path = os.path.join("data", "processed", f"{filename}.png")
-    if not os.path.exists(processed_path):
+    document = await _find_document(request, filename)
+    if document is None or not document.get("processed_sha256"):
         raise HTTPException(status_code=404, detail="Processed file not found - process the image first")
 
     try:
-        # Read image
-        img = cv2.imread(processed_path)
-        if img is None:
+        # The image may have to be fetched from the store first, so the
+        # stage runs on a thread; Tesseract itself is a subprocess
+        async with pipeline.slot():
+            text_results = await pipeline.run_thread(ocr_artifact, artifacts,
+                                                     document["processed_sha256"])
+        if text_results is None:
             raise HTTPException(status_code=400, detail="Could not read processed image")
 
-        # Convert to RGB for better OCR
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-        # Perform OCR
-        ocr_result = pytesseract.image_to_data(img_rgb, output_type=pytesseract.Output.DICT)
-        
-        # Format results - collect words with confidence
-        text_results = []
-        n_boxes = len(ocr_result['text'])
-        for i in range(n_boxes):
-            text = ocr_result['text'][i].strip()
-            conf = int(ocr_result['conf'][i])
-            
-            if text and conf > 0:  # Filter empty text and low confidence
-                x, y, w, h = (
-                    ocr_result['left'][i],
-                    ocr_result['top'][i],
-                    ocr_result['width'][i],
-                    ocr_result['height'][i]
-                )
-                text_results.append({
-                    'text': text,
-                    'confidence': conf,
-                    'bbox': [x, y, x + w, y + h]
-                })
-
         return {
             'filename': filename,
             'text_blocks': text_results,
             'word_count': len(text_results)
         }
 
+    except (HTTPException, Overloaded):
+        raise
     except Exception as e:
         logger.error(f"OCR failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
 
 @app.get("/download/{filename}")
-async def download_result(filename: str):
-    """Return the processed image file if present."""
-    result_path = os.path.join("data", "processed", f"{filename}.png")
-    if not os.path.exists(result_path):
+async def download_result(request: Request, filename: str):
+    """Send the processed image of the latest upload named `filename`, with
+    its content hash as ETag for conditional GETs (304) and byte Range
+    support (206). The name may later point at another upload, so unlike
+    /artifacts/ the response must be revalidated."""
+    document = await _find_document(request, filename)
+    if document is None or not document.get("processed_sha256"):
         raise HTTPException(status_code=404, detail="Processed file not found")
+    return await _artifact_response(request, document["processed_sha256"], "image/png",
+                                    CACHE_CONTROL)
+
+
+@app.get("/artifacts/{sha256}")
+async def get_artifact(request: Request, sha256: str):
+    """Send a stored blob by content hash. Blobs never change, so the hash
+    is the ETag and responses may be cached indefinitely."""
+    try:
+        check_digest(sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    info = await artifacts.info(getattr(request.app, "mongodb", None), sha256)
+    media_type = (info or {}).get("content_type") or "application/octet-stream"
+    return await _artifact_response(request, sha256, media_type, IMMUTABLE_CACHE_CONTROL)
+
+
+async def _artifact_response(request: Request, sha256: str, media_type: str,
+                             cache_control: str) -> Response:
+    # Local blobs are sent as files; blobs in a remote backend are streamed
+    # in chunks. Both answer If-None-Match, Range and If-Range alike.
+    etag = f'"{sha256}"'
+    path = artifacts.local_path(sha256)
+    if path is not None:
+        stat = await asyncio.to_thread(os.stat, path)
+        return await file_response(request, path, stat, media_type=media_type, etag=etag,
+                                   cache_control=cache_control)
+    size = await artifacts.size(sha256)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return stream_response(request, size, functools.partial(artifacts.iter_range, sha256),
+                           etag=etag, media_type=media_type, cache_control=cache_control)
+
+
+@app.get("/export/{document_id}")
+async def export_document(request: Request, document_id: str, format: str = "csv",
+                          table: Optional[int] = None):
+    """Stream a document's extracted tables as csv, xlsx, json, ndjson or
+    parquet, built in memory. `table` selects a single table by index."""
+    if format not in EXPORT_MEDIA_TYPES:
+        formats = ', '.join(EXPORT_MEDIA_TYPES)
+        raise HTTPException(status_code=400, detail=f"Unsupported format - use one of {formats}")
+
+    db = getattr(request.app, "mongodb", None)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database is not available")
+    document = await db.documents.find_one(document_query(document_id),
+                                           {"filename": 1, "results": 1})
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    tables = document_tables(document.get("results"))
+    if table is not None:
+        if not 0 <= table < len(tables):
+            raise HTTPException(status_code=404, detail="Table not found")
+        tables = [tables[table]]
+    if not tables:
+        raise HTTPException(status_code=404, detail="Document has no extracted tables")
+    if format == "parquet" and len(tables) > 1:
+        raise HTTPException(status_code=400, detail="Parquet holds one table - pass ?table=<index>")
 
-    return JSONResponse({"processed_path": result_path})
+    stem = os.path.splitext(document.get("filename") or str(document_id))[0]
+    return StreamingResponse(
+        DataConverter.aiter_bytes(tables, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(stem)}.{format}"}
+    )
@@ -0,0 +1,133 @@
+"""Dynamic micro-batching for neural inference shared across requests.
+
+Neural OCR and detection models are much cheaper per image when they are fed
+several images at once, but every request only ever has one page (or a few
+crops) in hand. `MicroBatcher` sits between the request handlers and a model:
+callers submit single items, a background thread gathers whatever arrives
+within `max_wait_ms` (up to `max_batch_size` items), runs one batched call and
+scatters the results back to the waiting callers.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 name: str = "batcher"):
+        """
+        Args:
+            batch_fn: Callable that takes a list of inputs and returns a list
+                of outputs of the same length and order.
+            max_batch_size: Upper bound on the number of items per call.
+            max_wait_ms: How long the first item of a batch may wait for
+                companions before the batch is dispatched anyway.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        # Guards `_closed` so that no item is queued behind the stop marker
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue a single item and return a Future for its result."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Blocking convenience wrapper around `submit`."""
+        return self.submit(item).result(timeout=timeout)
+
+    async def submit_async(self, item: Any) -> Any:
+        """Await the result of a single item without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting items; queued items are still processed."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _collect(self) -> List:
+        """Block for the first item, then gather more until the batch is full
+        or the wait budget of the first item is spent."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [_STOP]
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                # Re-queue so the run loop exits after this batch
+                self._queue.put(_STOP)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch and batch[0] is _STOP:
+                return
+
+            # Skip items whose callers already gave up
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                outputs = self.batch_fn(items)
+                if len(outputs) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(outputs)} results "
+                        f"for {len(items)} inputs"
+                    )
+            except Exception as e:
+                logger.error(f"{self.name}: batched inference failed: {e}")
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut), out in zip(batch, outputs):
+                fut.set_result(out)
+
+
+def ocr_batcher(engine, max_batch_size: int = 8, max_wait_ms: float = 5.0) -> MicroBatcher:
+    """Build a batcher that runs `OCREngine.process_images` over gathered crops."""
+    return MicroBatcher(engine.process_images, max_batch_size, max_wait_ms, name="ocr-batcher")
+
+
+def detection_batcher(detector, max_batch_size: int = 4, max_wait_ms: float = 5.0) -> MicroBatcher:
+    """Build a batcher that runs `TableDetector.detect_tables_batch` over gathered pages."""
+    return MicroBatcher(detector.detect_tables_batch, max_batch_size, max_wait_ms,
+                        name="detection-batcher")
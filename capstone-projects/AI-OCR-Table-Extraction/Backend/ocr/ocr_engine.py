@@ -76,6 +76,12 @@ class OCREngine:
         # Tesseract config: OEM 3 (default) and PSM 6 (assume a block of text)
         self.tesseract_config = r'--oem 3 --psm 6 -l kor+eng'
 
+    @property
+    def batched(self) -> bool:
+        """Whether an engine with real batched inference (EasyOCR) is loaded;
+        without one `process_images` is no faster than one call per image."""
+        return self.easy is not None
+
     def process_image(self, image: np.ndarray) -> List[Dict]:
         """Run available OCR engines and merge results conservatively.
 
@@ -111,17 +117,51 @@ class OCREngine:
             except Exception:
                 pass
 
-        # If no engines produced results, return a placeholder for the whole image
-        if not results:
-            h, w = (image.shape[0], image.shape[1])
-            return [{
-                'bbox': [[0, 0], [w, 0], [w, h], [0, h]],
-                'text': '',
-                'confidence': 0.0,
-                'engine': 'none'
-            }]
+        return results or self._placeholder(image)
 
-        return results
+    def process_images(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        """Batched counterpart of `process_image`.
+
+        Engines that support batched inference (EasyOCR `readtext_batched`)
+        receive all images in as few calls as possible; the others are run
+        image by image. Returns one result list per input image, in order.
+        """
+        results: List[List[Dict]] = [[] for _ in images]
+
+        if self.paddle is not None:
+            for i, image in enumerate(images):
+                try:
+                    results[i].extend(self._paddle_ocr(image))
+                except Exception:
+                    pass
+
+        if self.easy is not None:
+            try:
+                for i, easy_res in enumerate(self._easy_ocr_batch(images)):
+                    results[i].extend(easy_res)
+            except Exception:
+                pass
+
+        if _HAS_TESSERACT and pytesseract is not None:
+            for i, image in enumerate(images):
+                try:
+                    results[i].extend(self._tesseract_ocr(image))
+                except Exception:
+                    pass
+
+        return [res or self._placeholder(image) for res, image in zip(results, images)]
+
+    @staticmethod
+    def _placeholder(image: np.ndarray) -> List[Dict]:
+        """Single empty result covering the whole image, used when no engine
+        produced anything."""
+        h, w = (image.shape[0], image.shape[1])
+        return [{
+            'bbox': [[0, 0], [w, 0], [w, h], [0, h]],
+            'text': '',
+            'confidence': 0.0,
+            'engine': 'none'
+        }]
 
     def _paddle_ocr(self, image: np.ndarray) -> List[Dict]:
         results: List[Dict] = []
@@ -156,6 +196,30 @@ class OCREngine:
 
         return results
 
+    def _easy_ocr_batch(self, images: List[np.ndarray]) -> List[List[Dict]]:
+        results: List[List[Dict]] = [[] for _ in images]
+        if self.easy is None:
+            return results
+
+        # readtext_batched stacks its inputs into one tensor, so images are
+        # grouped by shape and each group is sent as a single batch.
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for i, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(i)
+
+        for indices in groups.values():
+            raw = self.easy.readtext_batched([images[i] for i in indices], batch_size=len(indices))
+            for i, image_res in zip(indices, raw):
+                for bbox, text, conf in image_res:
+                    results[i].append({
+                        'bbox': bbox,
+                        'text': text,
+                        'confidence': float(conf) if conf is not None else 0.0,
+                        'engine': 'easy'
+                    })
+
+        return results
+
     def _tesseract_ocr(self, image: np.ndarray) -> List[Dict]:
         results: List[Dict] = []
         if not _HAS_TESSERACT or pytesseract is None:
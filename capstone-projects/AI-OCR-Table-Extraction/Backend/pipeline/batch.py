@@ -0,0 +1,119 @@
+"""Batch processing of zip archives of scans.
+
+Entries are read from the archive one at a time (nothing is extracted to
+disk) and handed to the pipeline's process pool, with a bounded number of
+pages in flight. Results are yielded as pages finish, so the caller can
+stream them while later pages are still being processed.
+"""
+import asyncio
+import os
+import time
+import zipfile
+from typing import IO, AsyncIterator, Dict, Iterator
+
+from ..utils.executors import PipelineExecutor
+from .stages import run_extract_page
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))
+BATCH_MAX_ENTRY_BYTES = int(os.getenv("BATCH_MAX_ENTRY_BYTES", str(50 * 1024 * 1024)))
+
+
+class BatchError(ValueError):
+    pass
+
+
+def iter_image_entries(archive: zipfile.ZipFile,
+                       max_files: int = BATCH_MAX_FILES) -> Iterator[zipfile.ZipInfo]:
+    """Image entries of an archive in stored order, skipping folders and
+    macOS resource forks."""
+    count = 0
+    for info in archive.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+            continue
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        count += 1
+        if count > max_files:
+            raise BatchError(f"Archive has more than {max_files} images")
+        yield info
+
+
+def open_archive(fileobj: IO[bytes]) -> zipfile.ZipFile:
+    try:
+        return zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise BatchError("Not a zip archive")
+
+
+async def process_archive(archive: zipfile.ZipFile, executor: PipelineExecutor,
+                          concurrency: int = 4, max_entry_bytes: int = BATCH_MAX_ENTRY_BYTES
+                          ) -> AsyncIterator[Dict]:
+    """Yield one result dict per image entry, in completion order.
+
+    At most `concurrency` pages are decoded or processed at once, so memory
+    stays bounded by that many images whatever the archive size. A final
+    {'summary': ...} dict closes the stream.
+    """
+    entries = iter_image_entries(archive)
+    in_flight: Dict[asyncio.Future, Dict] = {}
+    ok = failed = 0
+    exhausted = False
+
+    async def run(index: int, info: zipfile.ZipInfo) -> Dict:
+        started = time.perf_counter()
+        result = {"index": index, "filename": info.filename}
+        try:
+            # file_size is the declared size; the read is capped as well so a
+            # forged header cannot inflate memory (zip bomb)
+            if info.file_size > max_entry_bytes:
+                raise BatchError(f"Entry exceeds the {max_entry_bytes} byte limit")
+            data = await executor.run_thread(_read_entry, archive, info, max_entry_bytes)
+            page = await run_extract_page(executor, data)
+            result.update(status="ok", **page)
+        except Exception as e:
+            result.update(status="error", error=str(e))
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        return result
+
+    index = 0
+    try:
+        while True:
+            while not exhausted and len(in_flight) < max(1, concurrency):
+                try:
+                    info = next(entries)
+                except StopIteration:
+                    exhausted = True
+                    break
+                except BatchError as e:
+                    exhausted = True
+                    yield {"status": "error", "error": str(e)}
+                    break
+                in_flight[asyncio.ensure_future(run(index, info))] = info
+                index += 1
+            if not in_flight:
+                break
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                del in_flight[future]
+                result = future.result()
+                if result["status"] == "ok":
+                    ok += 1
+                else:
+                    failed += 1
+                yield result
+    finally:
+        # The client went away: stop the pages still running
+        for future in in_flight:
+            future.cancel()
+
+    yield {"summary": {"files": ok + failed, "ok": ok, "failed": failed}}
+
+
+def _read_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int) -> bytes:
+    with archive.open(info) as entry:
+        data = entry.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise BatchError(f"Entry exceeds the {max_bytes} byte limit")
+    return data
@@ -0,0 +1,165 @@
+"""In-process job queue for document processing.
+
+`/process/` hands the document to `JobQueue.submit` and returns at once.
+A fixed pool of worker tasks runs the pipeline stages on the
+PipelineExecutor, records each stage in the document's record in the
+`documents` collection (status, stage, progress, results, error) and
+publishes the same progress to WebSocket subscribers through `ws_manager`.
+The upload is read from the artifact store by the document's `sha256`, and
+the processed image is stored there too, as `processed_sha256`.
+"""
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..database.database import document_query
+from ..storage.artifacts import ArtifactStore, store_from_env
+from ..utils.executors import Overloaded, PipelineExecutor
+from ..utils.websocket import WebSocketManager
+from .stages import (analyze_words, ocr_available, preprocess_artifact, stage_runner,
+                     tesseract_words)
+
+logger = logging.getLogger(__name__)
+
+# Progress reported when each stage starts
+STAGES = [("preprocess", 0.1), ("ocr", 0.4), ("structure", 0.8)]
+
+
+class PipelineError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, executor: PipelineExecutor, ws_manager: WebSocketManager,
+                 workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 store: Optional[ArtifactStore] = None):
+        """
+        Args:
+            executor: Runs the blocking stages.
+            ws_manager: Receives a broadcast for every status change.
+            workers: Number of jobs processed concurrently (PIPELINE_WORKERS).
+            max_pending: Queued jobs beyond which submit refuses with 429
+                (PIPELINE_MAX_PENDING).
+            store: Artifact store holding the uploads (store_from_env()).
+        """
+        self.executor = executor
+        self.ws_manager = ws_manager
+        self.workers = workers if workers is not None else int(os.getenv("PIPELINE_WORKERS", "2"))
+        self.max_pending = max_pending if max_pending is not None else \
+            int(os.getenv("PIPELINE_MAX_PENDING", "100"))
+        self.store = store or store_from_env()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Queue slots promised to submits still writing their 'queued' record
+        self._reserved = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop (idempotent)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(max(1, self.workers))]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, db: Any, document_id: Any, filename: str, sha256: str) -> Dict:
+        """Queue a document, whose upload is stored as `sha256`, for
+        processing and mark it 'queued'."""
+        self.start()
+        # Reserve the slot before awaiting, so concurrent submits cannot
+        # all pass the check and then overflow the queue
+        if 0 < self._queue.maxsize <= self._queue.qsize() + self._reserved:
+            raise Overloaded(429, "Processing queue is full - retry later",
+                             self.executor.retry_after)
+        self._reserved += 1
+        try:
+            job = {"db": db, "document_id": document_id, "filename": filename, "sha256": sha256}
+            await self._update(job, {"filename": filename, "status": "queued", "stage": None,
+                                     "progress": 0.0, "error": None,
+                                     "queued_at": datetime.utcnow()},
+                               upsert=True)
+        finally:
+            self._reserved -= 1
+        # Workers only take jobs off the queue, so the reserved slot is free
+        self._queue.put_nowait(job)
+        return {"job_id": str(document_id), "status": "queued"}
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Pipeline worker {index} failed on {job['document_id']}")
+            finally:
+                self._queue.task_done()
+
+    async def run(self, job: Dict) -> None:
+        """Run the pipeline for one job, recording progress and the outcome."""
+        try:
+            results, processed_sha256 = await self._pipeline(job)
+        except Exception as e:
+            await self._update(job, {"status": "failed", "error": str(e),
+                                     "completed_at": datetime.utcnow()})
+            return
+        await self._update(job, {"status": "completed", "stage": None, "progress": 1.0,
+                                 "results": results, "processed_sha256": processed_sha256,
+                                 "completed_at": datetime.utcnow()})
+
+    async def _pipeline(self, job: Dict) -> Tuple[List[Dict], str]:
+        progress = dict(STAGES)
+        # Scratch file for the processed image until it is moved into the store
+        fd, processed_path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+        try:
+            await self._stage(job, "preprocess", progress["preprocess"])
+            shape = await self.executor.run_thread(preprocess_artifact, self.store, job["sha256"],
+                                                   processed_path)
+            if shape is None:
+                raise PipelineError("Could not read image")
+
+            words: List[Dict] = []
+            if ocr_available():
+                await self._stage(job, "ocr", progress["ocr"])
+                words = await stage_runner(self.executor)(tesseract_words, processed_path) or []
+
+            processed = await self.store.put_file(job["db"], processed_path,
+                                                  content_type="image/png",
+                                                  name=f"{job['filename']}.png", keep=False)
+        finally:
+            if os.path.exists(processed_path):
+                os.remove(processed_path)
+
+        await self._stage(job, "structure", progress["structure"])
+        structure = await self.executor.run_process(analyze_words, words)
+        return ([{"data": structure}] if structure["rows"] else []), processed["sha256"]
+
+    async def _stage(self, job: Dict, stage: str, progress: float) -> None:
+        await self._update(job, {"status": "processing", "stage": stage, "progress": progress})
+
+    async def _update(self, job: Dict, fields: Dict, upsert: bool = False) -> None:
+        db = job["db"]
+        if db is not None:
+            update = {"$set": fields}
+            if upsert:
+                # Documents queued without an upload still need the listing keys
+                update["$setOnInsert"] = {"user_id": None, "created_at": datetime.utcnow()}
+            await db.documents.update_one(document_query(str(job["document_id"])), update,
+                                          upsert=upsert)
+        if "status" in fields:
+            await self.ws_manager.broadcast_status(str(job["document_id"]), fields["status"],
+                                                   fields.get("progress"), fields.get("stage"))
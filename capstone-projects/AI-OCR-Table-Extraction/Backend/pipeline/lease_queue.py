@@ -0,0 +1,165 @@
+"""MongoDB-backed job queue shared by worker processes on any host.
+
+Jobs live in the `jobs` collection. A worker claims one with a single
+atomic `find_one_and_update`, which marks it running and gives the worker a
+lease (`lease_owner`, `lease_expires`). While it works it renews the lease
+with heartbeats. If a worker dies, its lease runs out and the job becomes
+claimable again after this visibility timeout. Each claim counts as an
+attempt. Failed jobs are retried with exponential backoff until
+`max_attempts`, then marked failed for good.
+
+Job document:
+    {_id, document_id, filename, sha256, status: queued | running | done | failed,
+     attempts, max_attempts, available_at, lease_owner, lease_expires,
+     error, created_at, updated_at}
+
+The queue uses a synchronous pymongo collection, which suits the
+stand-alone workers. The API enqueues through `submit_async` with Motor.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+DEFAULT_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+DEFAULT_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "5"))
+
+
+def worker_id() -> str:
+    """An id unique to this worker process, readable in the jobs collection."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def new_job(document_id: Any, filename: str, sha256: str,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Dict:
+    now = datetime.utcnow()
+    return {
+        "document_id": document_id,
+        "filename": filename,
+        "sha256": sha256,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "available_at": now,
+        "lease_owner": None,
+        "lease_expires": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+async def submit_async(db, document_id: Any, filename: str, sha256: str) -> Dict:
+    """Enqueue a job from async code (the API) with a Motor database and
+    mark the document queued. As with the in-process JobQueue, the job id
+    handed to clients is the document id, and `sha256` is the stored
+    upload's hash."""
+    await db.documents.update_one(
+        {"_id": document_id},
+        {"$set": {"filename": filename, "status": "queued", "stage": None, "progress": 0.0,
+                  "error": None, "queued_at": datetime.utcnow()},
+         "$setOnInsert": {"user_id": None, "created_at": datetime.utcnow()}},
+        upsert=True)
+    await db.jobs.insert_one(new_job(document_id, filename, sha256))
+    return {"job_id": str(document_id), "status": "queued"}
+
+
+class LeaseQueue:
+    def __init__(self, collection, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 retry_delay: float = DEFAULT_RETRY_DELAY):
+        """
+        Args:
+            collection: pymongo collection holding the jobs.
+            lease_seconds: Visibility timeout; a claimed job without a
+                heartbeat for this long can be claimed by another worker.
+            retry_delay: Delay before the first retry of a failed job,
+                doubled for each further attempt.
+        """
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+        self.collection.create_index([("status", ASCENDING), ("lease_expires", ASCENDING)])
+
+    def enqueue(self, document_id: Any, filename: str, sha256: str,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Any:
+        job = new_job(document_id, filename, sha256, max_attempts)
+        return self.collection.insert_one(job).inserted_id
+
+    def claim(self, owner: str) -> Optional[Dict]:
+        """Atomically take the oldest available job, or None.
+
+        Available means queued and due, or running with an expired lease
+        (its worker stopped heartbeating). A job that has used up its
+        attempts is not run: it is marked failed and returned with status
+        'failed', so the caller can record the outcome on the document.
+        """
+        now = datetime.utcnow()
+        job = self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_expires": {"$lt": now}}
+            ]},
+            {"$set": {"status": "running", "lease_owner": owner,
+                      "lease_expires": now + timedelta(seconds=self.lease_seconds),
+                      "updated_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None or job["attempts"] <= job["max_attempts"]:
+            return job
+        # Only reachable through expired leases: the worker died every time.
+        # The attempt count identifies this claim, so no later claim of the
+        # job can be overwritten.
+        job.update(status="failed", error=job.get("error") or "Lease expired too many times",
+                   lease_expires=None)
+        self.collection.update_one(
+            {"_id": job["_id"], "attempts": job["attempts"]},
+            {"$set": {"status": "failed", "error": job["error"], "lease_expires": None,
+                      "updated_at": datetime.utcnow()}}
+        )
+        return job
+
+    def heartbeat(self, job: Dict, owner: str) -> bool:
+        """Extend the lease; False means the lease was lost to another worker."""
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {"_id": job["_id"], "status": "running", "lease_owner": owner},
+            {"$set": {"lease_expires": now + timedelta(seconds=self.lease_seconds),
+                      "updated_at": now}}
+        )
+        return result.matched_count == 1
+
+    def complete(self, job: Dict, owner: str) -> bool:
+        return self._finish(job, owner, "done")
+
+    def fail(self, job: Dict, owner: str, error: str) -> bool:
+        """Record a failed attempt: requeue with backoff, or fail for good."""
+        if job["attempts"] >= job["max_attempts"]:
+            return self._finish(job, owner, "failed", error=error)
+        now = datetime.utcnow()
+        delay = self.retry_delay * (2 ** (job["attempts"] - 1))
+        result = self.collection.update_one(
+            {"_id": job["_id"], "lease_owner": owner},
+            {"$set": {"status": "queued", "error": error, "lease_owner": None,
+                      "lease_expires": None, "available_at": now + timedelta(seconds=delay),
+                      "updated_at": now}}
+        )
+        return result.matched_count == 1
+
+    def _finish(self, job: Dict, owner: str, status: str, error: Optional[str] = None) -> bool:
+        # Guarded by the owner, so a worker whose lease expired cannot
+        # overwrite the outcome of the worker that took over
+        result = self.collection.update_one(
+            {"_id": job["_id"], "lease_owner": owner},
+            {"$set": {"status": status, "error": error, "lease_expires": None,
+                      "updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count == 1
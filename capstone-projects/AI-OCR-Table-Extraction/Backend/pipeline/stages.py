@@ -0,0 +1,307 @@
+"""Blocking pipeline stages, run through the PipelineExecutor.
+
+Each stage is a module-level function taking and returning plain values
+(paths, lists, dicts) so it can run on a thread or in a worker process.
+The `*_artifact` variants read their input from the artifact store and
+must run on a thread.
+
+The API process starts shared micro-batchers at startup (`start_batchers`)
+for the engines that have real batched inference: neural OCR (EasyOCR,
+through `OCREngine.process_images`) and model-based table detection. While
+they run, those calls from concurrent requests are gathered into batched
+calls, so only the OCR and detection calls themselves run on the API's
+thread pool (`stage_runner`, `run_extract_page`); worker processes do not
+see the batchers. Tesseract and the OpenCV detector have no batched API and
+are never batched: with them every stage stays on the process pool.
+"""
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..ocr.batching import MicroBatcher, detection_batcher, ocr_batcher
+from ..preprocessing.image_processing import PreprocessingEngine
+
+try:
+    import pytesseract
+    _HAS_TESSERACT = True
+except ImportError:
+    _HAS_TESSERACT = False
+
+_preprocessor: Optional[PreprocessingEngine] = None
+_detector = None
+_ocr_batcher: Optional[MicroBatcher] = None
+_detection_batcher: Optional[MicroBatcher] = None
+
+BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "8"))
+BATCH_WAIT_MS = float(os.getenv("PIPELINE_BATCH_WAIT_MS", "5"))
+
+
+def _get_preprocessor() -> PreprocessingEngine:
+    # One engine per thread pool / worker process, created on first use
+    global _preprocessor
+    if _preprocessor is None:
+        _preprocessor = PreprocessingEngine()
+    return _preprocessor
+
+
+def preprocess_file(upload_path: str, processed_path: str) -> Optional[Tuple[int, ...]]:
+    """Read an upload, preprocess it and write the result as PNG.
+
+    Returns the processed image shape, or None if the image is unreadable.
+    """
+    img = cv2.imread(upload_path)
+    if img is None:
+        return None
+    processed_image = _get_preprocessor().process(img)
+    cv2.imwrite(processed_path, processed_image)
+    return tuple(processed_image.shape)
+
+
+def preprocess_artifact(store, sha256: str, processed_path: str) -> Optional[Tuple[int, ...]]:
+    """preprocess_file for an upload held in the artifact store."""
+    with store.local_file(sha256) as upload_path:
+        return preprocess_file(upload_path, processed_path)
+
+
+def tesseract_words(image_path: str) -> Optional[List[Dict]]:
+    """OCR an image file (see `ocr_image`); returns words with confidence
+    and [x1, y1, x2, y2] boxes, or None if the image is unreadable."""
+    img = cv2.imread(image_path)
+    if img is None:
+        return None
+    return ocr_image(img)
+
+
+def ocr_artifact(store, sha256: str) -> Optional[List[Dict]]:
+    """tesseract_words for an image held in the artifact store."""
+    with store.local_file(sha256) as image_path:
+        return tesseract_words(image_path)
+
+
+def ocr_available() -> bool:
+    """Whether `ocr_image` can read text in this process."""
+    return _HAS_TESSERACT or _ocr_batcher is not None
+
+
+def ocr_image(img: np.ndarray) -> List[Dict]:
+    """OCR a decoded image (BGR or grayscale): through the shared neural OCR
+    batcher when one is running, else with Tesseract."""
+    if _ocr_batcher is not None:
+        return _engine_words(_ocr_batcher(img))
+    return _tesseract_image(img)
+
+
+def _engine_words(results: List[Dict]) -> List[Dict]:
+    # OCREngine results have corner boxes and 0-1 confidences; the pipeline
+    # uses Tesseract's [x1, y1, x2, y2] boxes and 0-100 confidences
+    words = []
+    for result in results:
+        text = result['text'].strip()
+        if not text:
+            continue
+        xs, ys = zip(*result['bbox'])
+        words.append({
+            'text': text,
+            'confidence': int(round(result['confidence'] * 100)),
+            'bbox': [int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))]
+        })
+    return words
+
+
+def _tesseract_image(img: np.ndarray) -> List[Dict]:
+    if img.ndim == 3:
+        # Convert to RGB for better OCR
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    ocr_result = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+
+    # Collect words with confidence, dropping empty text and low confidence
+    text_results = []
+    for i in range(len(ocr_result['text'])):
+        text = ocr_result['text'][i].strip()
+        conf = int(float(ocr_result['conf'][i]))
+        if text and conf > 0:
+            x, y, w, h = (
+                ocr_result['left'][i],
+                ocr_result['top'][i],
+                ocr_result['width'][i],
+                ocr_result['height'][i]
+            )
+            text_results.append({
+                'text': text,
+                'confidence': conf,
+                'bbox': [x, y, x + w, y + h]
+            })
+    return text_results
+
+
+def analyze_words(words: List[Dict]) -> Dict:
+    """Table structure of Tesseract words ([x1, y1, x2, y2] boxes)."""
+    from ..structure.table_analyzer import TableStructureAnalyzer
+
+    corner_words = []
+    for word in words:
+        x1, y1, x2, y2 = word['bbox']
+        corner_words.append({**word, 'bbox': [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]})
+    return TableStructureAnalyzer().analyze_structure(corner_words)
+
+
+def run_pipeline(upload_path: str, processed_path: str,
+                 on_stage: Optional[Callable[[str], None]] = None) -> List[Dict]:
+    """All stages in sequence in the calling thread, for stand-alone workers.
+
+    `on_stage` is called with each stage name before it starts. Returns the
+    document results: a list of {'data': structure} entries.
+    """
+    def stage(name: str) -> None:
+        if on_stage is not None:
+            on_stage(name)
+
+    stage("preprocess")
+    if preprocess_file(upload_path, processed_path) is None:
+        raise ValueError("Could not read image")
+    words: List[Dict] = []
+    if _HAS_TESSERACT:
+        stage("ocr")
+        words = tesseract_words(processed_path) or []
+    stage("structure")
+    structure = analyze_words(words)
+    return [{"data": structure}] if structure["rows"] else []
+
+
+def _get_detector():
+    # One detector per thread pool / worker process; the model (if any) is
+    # loaded on first use
+    global _detector
+    if _detector is None:
+        from ..detection.table_detector import TableDetector
+        _detector = TableDetector()
+    return _detector
+
+
+def detect_tables(img: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Table boxes of a page, through the shared detection batcher when one
+    is running."""
+    if _detection_batcher is not None:
+        return _detection_batcher(img)
+    return _get_detector().detect_tables(img)
+
+
+def start_batchers(max_batch_size: int = BATCH_SIZE, max_wait_ms: float = BATCH_WAIT_MS,
+                   ocr_engine=None) -> bool:
+    """Start the shared batchers of this process, for the engines that have
+    batched inference.
+
+    OCR is batched when `ocr_engine` (by default an OCREngine, if EasyOCR is
+    installed) has a batched engine loaded; pipeline OCR then goes through
+    it instead of Tesseract. Detection is batched when a model backend is
+    loaded. Returns whether any batcher runs; `max_batch_size` 0 starts none.
+    """
+    global _ocr_batcher, _detection_batcher
+    if max_batch_size < 1 or batching():
+        return batching()
+    if ocr_engine is None:
+        from ..ocr import ocr_engine as engines
+        if engines._HAS_EASY:
+            ocr_engine = engines.OCREngine()
+    if ocr_engine is not None and ocr_engine.batched:
+        _ocr_batcher = ocr_batcher(ocr_engine, max_batch_size, max_wait_ms)
+    if _get_detector().use_yolo:
+        _detection_batcher = detection_batcher(_get_detector(), max_batch_size, max_wait_ms)
+    return batching()
+
+
+def stop_batchers() -> None:
+    global _ocr_batcher, _detection_batcher
+    for batcher in (_ocr_batcher, _detection_batcher):
+        if batcher is not None:
+            batcher.close()
+    _ocr_batcher = _detection_batcher = None
+
+
+def batching() -> bool:
+    """Whether any shared batcher runs in this process."""
+    return _ocr_batcher is not None or _detection_batcher is not None
+
+
+def stage_runner(executor, stage: str = "ocr") -> Callable:
+    """The executor method to run the OCR or detection call itself with: the
+    thread pool while that stage's batcher runs in this process, else the
+    process pool."""
+    batcher = _ocr_batcher if stage == "ocr" else _detection_batcher
+    return executor.run_thread if batcher is not None else executor.run_process
+
+
+def prepare_page(data: bytes) -> np.ndarray:
+    """Decode and preprocess one encoded image; raises ValueError if the
+    bytes are not a readable image."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    return _get_preprocessor().process(img)
+
+
+def page_boxes(processed: np.ndarray, detect: bool = True) -> List[Tuple[int, int, int, int]]:
+    """Table boxes of a processed page, or the whole page without `detect`."""
+    h, w = processed.shape[:2]
+    return detect_tables(processed) if detect else [(0, 0, w, h)]
+
+
+def page_tables(processed: np.ndarray, boxes: List[Tuple[int, int, int, int]],
+                words: Optional[List[List[Dict]]] = None,
+                encode_processed: bool = False) -> Dict:
+    """OCR (unless the `words` of each box are given) and analyze the table
+    boxes of a processed page; the result format of `extract_page`."""
+    tables = []
+    word_count = 0
+    for i, (x1, y1, x2, y2) in enumerate(boxes):
+        if words is not None:
+            box_words = words[i]
+        else:
+            box_words = ocr_image(processed[y1:y2, x1:x2]) if ocr_available() else []
+        word_count += len(box_words)
+        structure = analyze_words(box_words)
+        if structure["rows"]:
+            tables.append({"bbox": [int(x1), int(y1), int(x2), int(y2)], "data": structure})
+
+    result = {"shape": list(processed.shape), "word_count": word_count, "tables": tables}
+    if encode_processed:
+        result["processed_png"] = cv2.imencode(".png", processed)[1].tobytes()
+    return result
+
+
+def extract_page(data: bytes, detect: bool = True, encode_processed: bool = False) -> Dict:
+    """Decode, preprocess, detect, OCR and analyze one encoded image in memory.
+
+    The image is decoded once; table regions are views into the processed
+    array and go to OCR without being copied or re-encoded. Returns the
+    processed shape, the word count and one {'bbox', 'data'} entry per
+    non-empty table (the stored results format). With `encode_processed`
+    the processed image is also returned as PNG bytes, for persisting.
+    Raises ValueError if the bytes are not a readable image.
+    """
+    processed = prepare_page(data)
+    return page_tables(processed, page_boxes(processed, detect),
+                       encode_processed=encode_processed)
+
+
+async def run_extract_page(executor, data: bytes, detect: bool = True,
+                           encode_processed: bool = False) -> Dict:
+    """`extract_page` through a PipelineExecutor.
+
+    Without batchers the page is one process-pool call. With them, only the
+    detection and OCR calls go to the thread pool (and the batchers); the
+    OCR calls of all table boxes are submitted at once so they can share a
+    batch, and the other stages stay on the process pool.
+    """
+    if not batching():
+        return await executor.run_process(extract_page, data, detect, encode_processed)
+    processed = await executor.run_process(prepare_page, data)
+    boxes = await stage_runner(executor, "detection")(page_boxes, processed, detect)
+    words = None
+    if _ocr_batcher is not None:
+        words = await asyncio.gather(*[executor.run_thread(ocr_image, processed[y1:y2, x1:x2])
+                                       for x1, y1, x2, y2 in boxes])
+    return await executor.run_process(page_tables, processed, boxes, words, encode_processed)
@@ -0,0 +1,153 @@
+"""Stand-alone pipeline worker for the MongoDB job queue.
+
+Run any number of these, on any host that reaches MongoDB and the artifact
+store (a shared ARTIFACT_ROOT, or S3); throughput grows with the number of
+workers.
+Each worker claims one job at a time from the `jobs` collection, keeps its
+lease alive from a heartbeat thread while the stages run, and writes the
+stage, progress and outcome into the `documents` collection, where
+GET /jobs/{job_id} reads them.
+
+Usage (from AI-OCR-Table-Extraction/):
+    PIPELINE_QUEUE=mongo uvicorn Backend.main:app     # API enqueues jobs
+    python -m Backend.pipeline.worker                  # one or more workers
+"""
+import argparse
+import logging
+import os
+import signal
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from pymongo import MongoClient
+
+from ..database.database import DB_NAME, MONGODB_URL
+from ..storage.artifacts import ArtifactStore, store_from_env
+from .jobs import STAGES
+from .lease_queue import LeaseQueue, worker_id
+from .stages import run_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class Heartbeat(threading.Thread):
+    """Renews a job's lease every third of the lease period until stopped."""
+
+    def __init__(self, queue: LeaseQueue, job: Dict, owner: str):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.owner = owner
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.queue.lease_seconds / 3.0):
+            if not self.queue.heartbeat(self.job, self.owner):
+                logger.warning(f"Lost the lease on job {self.job['_id']}")
+                self.lost = True
+                return
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class Worker:
+    def __init__(self, db, owner: Optional[str] = None, store: Optional[ArtifactStore] = None,
+                 **queue_options):
+        self.db = db
+        self.queue = LeaseQueue(db.jobs, **queue_options)
+        self.owner = owner or worker_id()
+        self.store = store or store_from_env()
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        """Finish the current job, then exit the loop."""
+        self._stopping.set()
+
+    def run_forever(self, poll_interval: float = 1.0) -> None:
+        self.queue.ensure_indexes()
+        logger.info(f"Worker {self.owner} waiting for jobs")
+        while not self._stopping.is_set():
+            if not self.run_once():
+                self._stopping.wait(poll_interval)
+
+    def run_once(self) -> bool:
+        """Claim and process one job; False if there was none."""
+        job = self.queue.claim(self.owner)
+        if job is None:
+            return False
+        if job["status"] == "failed":
+            # Its workers kept dying; the queue gave up on it
+            self._update(job, {"status": "failed", "error": job["error"],
+                               "completed_at": datetime.utcnow()})
+            return True
+        self.process(job)
+        return True
+
+    def process(self, job: Dict) -> None:
+        progress = dict(STAGES)
+
+        def on_stage(stage: str) -> None:
+            self._update(job, {"status": "processing", "stage": stage, "progress": progress[stage]})
+
+        heartbeat = Heartbeat(self.queue, job, self.owner)
+        heartbeat.start()
+        # Scratch file for the processed image until it is moved into the store
+        fd, processed_path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+        try:
+            with self.store.local_file(job["sha256"]) as upload_path:
+                results = run_pipeline(upload_path, processed_path, on_stage)
+            processed = self.store.ingest_file(processed_path, content_type="image/png",
+                                               keep=False)
+        except Exception as e:
+            heartbeat.stop()
+            logger.warning(f"Job {job['_id']} attempt {job['attempts']} failed: {e}")
+            if self.queue.fail(job, self.owner, str(e)):
+                retrying = job["attempts"] < job["max_attempts"]
+                self._update(job, {"status": "queued" if retrying else "failed", "error": str(e)})
+            return
+        finally:
+            if os.path.exists(processed_path):
+                os.remove(processed_path)
+        heartbeat.stop()
+        self.db.artifacts.update_one(
+            {"_id": processed["sha256"]},
+            self.store.record_update(processed, f"{job['filename']}.png"), upsert=True)
+
+        if heartbeat.lost:
+            # Another worker owns the job now and will record its own result
+            return
+        self._update(job, {"status": "completed", "stage": None, "progress": 1.0, "error": None,
+                           "results": results, "processed_sha256": processed["sha256"],
+                           "completed_at": datetime.utcnow()})
+        self.queue.complete(job, self.owner)
+
+    def _update(self, job: Dict, fields: Dict) -> None:
+        self.db.documents.update_one({"_id": job["document_id"]}, {"$set": fields})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    client = MongoClient(MONGODB_URL)
+    worker = Worker(client[DB_NAME])
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    try:
+        worker.run_forever(args.poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Content-addressed store for uploads and processed images.
+
+Blobs are addressed by the SHA-256 of their content, so identical files are
+stored once whatever their names. Blob I/O goes to a pluggable backend (see
+`backends`), run in a worker thread. Metadata lives in the `artifacts`
+collection, keyed by the hash:
+
+    {_id: sha256, key, backend, size, content_type, names: [...],
+     created_at, last_used_at}
+
+Documents refer to their blobs by hash (`sha256` for the upload,
+`processed_sha256`), and GET /artifacts/{sha256} serves them. The pipeline
+reads uploads and writes processed images through the store as well, so
+nothing is kept under a flat per-filename path.
+
+The backend is chosen by ARTIFACT_BACKEND: `local` (default, under
+ARTIFACT_ROOT) or `s3` (ARTIFACT_S3_BUCKET, ARTIFACT_S3_PREFIX and, for
+MinIO or another stand-in, ARTIFACT_S3_ENDPOINT_URL).
+"""
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from .backends import LocalBackend, S3Backend, shard_key
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_digest(sha256: str) -> str:
+    """Validate a hex SHA-256 taken from a request; raises ValueError."""
+    if not _DIGEST.match(sha256 or ""):
+        raise ValueError("Invalid artifact id - expected a hex SHA-256")
+    return sha256
+
+
+class ArtifactStore:
+    def __init__(self, backend=None):
+        self.backend = backend or LocalBackend()
+
+    async def put_bytes(self, db: Any, data: bytes, content_type: Optional[str] = None,
+                        name: Optional[str] = None) -> Dict:
+        """Store `data` (once) and record it; returns its metadata."""
+        digest = hashlib.sha256(data).hexdigest()
+        key = shard_key(digest)
+        created = await asyncio.to_thread(self.backend.put_bytes, key, data, content_type)
+        blob = _blob(digest, key, len(data), content_type, created)
+        await self._record(db, blob, name)
+        return blob
+
+    async def put_file(self, db: Any, path: str, sha256: Optional[str] = None,
+                       content_type: Optional[str] = None, name: Optional[str] = None,
+                       keep: bool = True) -> Dict:
+        """Ingest a file already on disk. Pass `sha256` when it is known
+        (e.g. from save_upload) to skip re-reading the file."""
+        blob = await asyncio.to_thread(self.ingest_file, path, sha256, content_type, keep)
+        await self._record(db, blob, name)
+        return blob
+
+    def ingest_file(self, path: str, sha256: Optional[str] = None,
+                    content_type: Optional[str] = None, keep: bool = True) -> Dict:
+        """Blocking part of put_file, for callers already on a worker
+        thread; record the result with `record_update`."""
+        digest = sha256 or file_sha256(path)
+        key = shard_key(digest)
+        size = os.path.getsize(path)
+        created = self.backend.put_file(key, path, content_type, keep)
+        return _blob(digest, key, size, content_type, created)
+
+    def record_update(self, blob: Dict, name: Optional[str] = None) -> Dict:
+        """Upsert of a blob's `artifacts` record (for Motor or pymongo)."""
+        now = datetime.utcnow()
+        update: Dict[str, Any] = {
+            "$setOnInsert": {"key": blob["key"], "backend": self.backend.name,
+                             "size": blob["size"], "content_type": blob["content_type"],
+                             "created_at": now},
+            "$set": {"last_used_at": now}
+        }
+        if name:
+            update["$addToSet"] = {"names": name}
+        return update
+
+    async def _record(self, db: Any, blob: Dict, name: Optional[str]) -> None:
+        if db is not None:
+            await db.artifacts.update_one({"_id": blob["sha256"]}, self.record_update(blob, name),
+                                          upsert=True)
+
+    @contextmanager
+    def local_file(self, sha256: str) -> Iterator[str]:
+        """Path of the blob on local disk for the duration of the block: the
+        blob itself with the local backend, else a temporary download.
+        Blocking; the file must not be modified."""
+        key = shard_key(check_digest(sha256))
+        path = self.backend.local_path(key)
+        if path is not None:
+            yield path
+            return
+        fd, temp = tempfile.mkstemp(prefix="artifact-")
+        os.close(fd)
+        try:
+            self.backend.download(key, temp)
+            yield temp
+        finally:
+            os.remove(temp)
+
+    async def info(self, db: Any, sha256: str) -> Optional[Dict]:
+        if db is None:
+            return None
+        return await db.artifacts.find_one({"_id": check_digest(sha256)})
+
+    def local_path(self, sha256: str) -> Optional[str]:
+        """Path of the blob on local disk, or None (missing, or not local)."""
+        return self.backend.local_path(shard_key(check_digest(sha256)))
+
+    async def exists(self, sha256: str) -> bool:
+        return await asyncio.to_thread(self.backend.exists, shard_key(check_digest(sha256)))
+
+    async def get_bytes(self, sha256: str) -> bytes:
+        return await asyncio.to_thread(self.backend.get_bytes, shard_key(check_digest(sha256)))
+
+    async def size(self, sha256: str) -> Optional[int]:
+        """Size of the blob in bytes, or None if it is not stored."""
+        return await asyncio.to_thread(self.backend.size, shard_key(check_digest(sha256)))
+
+    async def iter_range(self, sha256: str, start: int, end: int,
+                         chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """The bytes `start` to `end` (inclusive) of a blob, in chunks, read
+        in a worker thread."""
+        body = await asyncio.to_thread(self.backend.open_range,
+                                       shard_key(check_digest(sha256)), start, end)
+        try:
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(body.read, min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            body.close()
+
+
+def _blob(digest: str, key: str, size: int, content_type: Optional[str], created: bool) -> Dict:
+    return {"sha256": digest, "key": key, "size": size, "content_type": content_type,
+            "deduplicated": not created}
+
+
+def store_from_env() -> ArtifactStore:
+    if os.getenv("ARTIFACT_BACKEND", "local") == "s3":
+        options = {}
+        if os.getenv("ARTIFACT_S3_ENDPOINT_URL"):
+            options["endpoint_url"] = os.getenv("ARTIFACT_S3_ENDPOINT_URL")
+        return ArtifactStore(S3Backend(os.environ["ARTIFACT_S3_BUCKET"],
+                                       prefix=os.getenv("ARTIFACT_S3_PREFIX", ""), **options))
+    root = os.getenv("ARTIFACT_ROOT", os.path.join("data", "artifacts"))
+    return ArtifactStore(LocalBackend(root))
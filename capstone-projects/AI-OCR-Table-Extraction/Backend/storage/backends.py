@@ -0,0 +1,191 @@
+"""Blob backends for the artifact store.
+
+A backend stores immutable blobs under keys built by `shard_key`:
+`ab/cd/abcd...` for a SHA-256 of `abcd...`. Two levels of 256 directories
+keep every local directory small, even with millions of blobs. Writing a key
+that already exists is a no-op, which is where deduplication happens.
+
+`LocalBackend` (the default) keeps blobs under a root directory. It
+hard-links files in where it can, so ingesting an upload copies nothing.
+`S3Backend` talks to any S3-compatible API (AWS, MinIO, localstack) through
+boto3, which is optional.
+
+Blobs must never be modified in place. Writers here always replace files,
+since a local blob may share its inode with the file it was ingested from.
+"""
+import os
+import shutil
+import uuid
+from typing import BinaryIO, Optional
+
+try:
+    import boto3  # type: ignore
+    from botocore.exceptions import ClientError  # type: ignore
+    _HAS_BOTO3 = True
+except Exception:
+    boto3 = None
+    ClientError = Exception
+    _HAS_BOTO3 = False
+
+
+def shard_key(digest: str, levels: int = 2, width: int = 2) -> str:
+    return "/".join([digest[i * width:(i + 1) * width] for i in range(levels)] + [digest])
+
+
+class LocalBackend:
+    name = "local"
+
+    def __init__(self, root: str = os.path.join("data", "artifacts")):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def _temp_path(self, target: str) -> str:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        return os.path.join(os.path.dirname(target), f".{uuid.uuid4().hex}.part")
+
+    def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> bool:
+        """Store `data` under `key`; False if the blob was already there."""
+        target = self.path(key)
+        if os.path.exists(target):
+            return False
+        temp = self._temp_path(target)
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, target)
+        return True
+
+    def put_file(self, key: str, source: str, content_type: Optional[str] = None,
+                 keep: bool = True) -> bool:
+        """Ingest the file at `source`; False if the blob was already there.
+
+        With `keep`, `source` stays in place, sharing the blob's storage: a
+        new blob is hard-linked from it, and a duplicate `source` is itself
+        replaced by a link to the existing blob. Without `keep` the file is
+        moved in, or removed when it is a duplicate.
+        """
+        target = self.path(key)
+        if os.path.exists(target):
+            if not keep:
+                os.remove(source)
+            elif not os.path.samefile(source, target):
+                self._link_or_copy(target, source)
+            return False
+        if keep:
+            self._link_or_copy(source, target)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+        return True
+
+    def _link_or_copy(self, source: str, target: str) -> None:
+        temp = self._temp_path(target)
+        try:
+            os.link(source, temp)
+        except OSError:
+            # Different filesystem, or no hard links (e.g. some mounts)
+            shutil.copyfile(source, temp)
+        os.replace(temp, target)
+
+    def size(self, key: str) -> Optional[int]:
+        """Size of the blob in bytes, or None if it does not exist."""
+        try:
+            return os.path.getsize(self.path(key))
+        except FileNotFoundError:
+            return None
+
+    def open_range(self, key: str, start: int, end: int) -> BinaryIO:
+        """A file object positioned at `start`; read no further than `end`."""
+        f = open(self.path(key), "rb")
+        f.seek(start)
+        return f
+
+    def get_bytes(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def download(self, key: str, target: str) -> None:
+        shutil.copyfile(self.path(key), target)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Backend:
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, **client_options):
+        """
+        Args:
+            bucket: Existing bucket to store blobs in.
+            prefix: Key prefix, e.g. 'artifacts/'.
+            client: A boto3 S3 client; created from `client_options`
+                (endpoint_url, region_name, credentials) if omitted.
+        """
+        if client is None:
+            if not _HAS_BOTO3:
+                raise RuntimeError("S3 storage is not available - please install boto3")
+            client = boto3.client("s3", **client_options)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+
+    def open_range(self, key: str, start: int, end: int) -> BinaryIO:
+        # One ranged GET whose body is read as it arrives
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key),
+                                      Range=f"bytes={start}-{end}")["Body"]
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> bool:
+        if self.exists(key):
+            return False
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, **extra)
+        return True
+
+    def put_file(self, key: str, source: str, content_type: Optional[str] = None,
+                 keep: bool = True) -> bool:
+        created = not self.exists(key)
+        if created:
+            extra = {"ExtraArgs": {"ContentType": content_type}} if content_type else {}
+            self.client.upload_file(source, self.bucket, self._key(key), **extra)
+        if not keep:
+            os.remove(source)
+        return created
+
+    def get_bytes(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+
+    def download(self, key: str, target: str) -> None:
+        self.client.download_file(self.bucket, self._key(key), target)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
@@ -0,0 +1,162 @@
+"""Cell grids from ruling lines.
+
+Given the row and column separators of a ruled table (see
+`detection.grid_detector`), every slot between two adjacent separators is a
+candidate cell. Where a separator is not actually drawn between two
+neighbouring slots, the slots belong to the same merged (spanning) cell; the
+slots are grouped with union-find over those missing separators.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from ..detection.grid_detector import line_masks
+
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = np.arange(size)
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the smaller index (top-left slot) as the root
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _segment_fill(mask_1d: np.ndarray, bounds: np.ndarray, margin: int) -> np.ndarray:
+    """Fraction of set pixels of a 1-D line profile inside each interval
+    [bounds[k], bounds[k + 1]], ignoring `margin` pixels at both ends
+    (where the crossing rules are)."""
+    csum = np.concatenate(([0], np.cumsum(mask_1d, dtype=np.int64)))
+    lo = np.minimum(bounds[:-1] + margin, len(mask_1d))
+    hi = np.maximum(bounds[1:] - margin, lo)
+    length = np.maximum(hi - lo, 1)
+    return (csum[hi] - csum[lo]) / length
+
+
+def build_cell_grid(image: np.ndarray, row_boundaries: Sequence[int], col_boundaries: Sequence[int],
+                    tolerance: int = 0, min_fill: float = 0.5) -> List[Dict]:
+    """Explicit cell rectangles of a ruled table, merged cells included.
+
+    Args:
+        image: The table image (BGR or grayscale), in the same coordinates
+            as the boundaries.
+        row_boundaries: Sorted y positions of the horizontal separators,
+            outer edges included.
+        col_boundaries: Sorted x positions of the vertical separators.
+        tolerance: Half-width of the band searched for a separator; 0 picks
+            one from the image size.
+        min_fill: Fraction of a separator segment that must be drawn for
+            the two slots it divides to count as separate cells.
+    Returns:
+        Cells in reading order, each a dict with 'row', 'col', 'row_span',
+        'col_span' and 'bbox' (x1, y1, x2, y2).
+    """
+    rows = np.asarray(row_boundaries, dtype=np.int64)
+    cols = np.asarray(col_boundaries, dtype=np.int64)
+    n_rows, n_cols = len(rows) - 1, len(cols) - 1
+    if n_rows < 1 or n_cols < 1:
+        return []
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h, w = gray.shape[:2]
+    horizontal, vertical = line_masks(gray)
+    t = tolerance or max(3, int(np.ceil(max(h, w) / 512)))
+
+    uf = UnionFind(n_rows * n_cols)
+
+    # Internal vertical separators: slot (i, j - 1) | (i, j)
+    for j in range(1, n_cols):
+        x = int(cols[j])
+        band = vertical[:, max(0, x - t):min(w, x + t + 1)].any(axis=1)
+        fill = _segment_fill(band, rows, t)
+        for i in np.flatnonzero(fill < min_fill):
+            uf.union(i * n_cols + j - 1, i * n_cols + j)
+
+    # Internal horizontal separators: slot (i - 1, j) over (i, j)
+    for i in range(1, n_rows):
+        y = int(rows[i])
+        band = horizontal[max(0, y - t):min(h, y + t + 1), :].any(axis=0)
+        fill = _segment_fill(band, cols, t)
+        for j in np.flatnonzero(fill < min_fill):
+            uf.union((i - 1) * n_cols + j, i * n_cols + j)
+
+    # Group slots by root; each group becomes one cell spanning its slots
+    roots = np.array([uf.find(k) for k in range(n_rows * n_cols)]).reshape(n_rows, n_cols)
+    cells = []
+    for root in np.unique(roots):
+        for r0, c0, r1, c1 in _rectangles(roots == root):
+            cells.append({
+                'row': int(r0),
+                'col': int(c0),
+                'row_span': int(r1 - r0 + 1),
+                'col_span': int(c1 - c0 + 1),
+                'bbox': (int(cols[c0]), int(rows[r0]), int(cols[c1 + 1]), int(rows[r1 + 1])),
+            })
+    cells.sort(key=lambda c: (c['row'], c['col']))
+    return cells
+
+
+def _rectangles(members: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Split a group of slots (boolean slot mask) into rectangles
+    (r0, c0, r1, c1), inclusive.
+
+    A real merged cell is a rectangle and comes back whole. A group with any
+    other shape (an L where a rule is broken at a corner, say) would span
+    neighbouring cells if it were taken as its bounding rectangle; instead it
+    is split greedily into rectangles, each grown right, then down, from its
+    top-left free slot.
+    """
+    slots = np.argwhere(members)
+    r0, c0 = slots.min(axis=0)
+    r1, c1 = slots.max(axis=0)
+    if len(slots) == (r1 - r0 + 1) * (c1 - c0 + 1):
+        return [(r0, c0, r1, c1)]
+
+    free = members.copy()
+    rectangles = []
+    for r, c in slots:
+        if not free[r, c]:
+            continue
+        right = c
+        while right + 1 < free.shape[1] and free[r, right + 1]:
+            right += 1
+        bottom = r
+        while bottom + 1 < free.shape[0] and free[bottom + 1, c:right + 1].all():
+            bottom += 1
+        free[r:bottom + 1, c:right + 1] = False
+        rectangles.append((r, c, bottom, right))
+    return rectangles
+
+
+def cell_lookup(cells: List[Dict], n_rows: int, n_cols: int) -> np.ndarray:
+    """(n_rows, n_cols) array mapping every grid slot to the index of the
+    (possibly spanning) cell that covers it."""
+    lookup = np.full((n_rows, n_cols), -1, dtype=np.int64)
+    for k, cell in enumerate(cells):
+        rows = slice(cell['row'], cell['row'] + cell['row_span'])
+        cols = slice(cell['col'], cell['col'] + cell['col_span'])
+        lookup[rows, cols] = k
+    return lookup
+
+
+def locate_points(xs: np.ndarray, ys: np.ndarray, row_boundaries: Sequence[int],
+                  col_boundaries: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Grid slot (row, col) of every point by interval lookup; -1 outside."""
+    rows = np.asarray(row_boundaries, dtype=np.float64)
+    cols = np.asarray(col_boundaries, dtype=np.float64)
+    r = np.searchsorted(rows, ys, side='right') - 1
+    c = np.searchsorted(cols, xs, side='right') - 1
+    outside = (r < 0) | (r >= len(rows) - 1) | (c < 0) | (c >= len(cols) - 1)
+    return np.where(outside, -1, r), np.where(outside, -1, c)
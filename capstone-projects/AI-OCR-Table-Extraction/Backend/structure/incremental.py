@@ -0,0 +1,116 @@
+"""Incremental structure analysis for very long tables.
+
+`TableStructureAnalyzer.analyze_structure` needs every OCR word of a table at
+once and returns a dense cell matrix. Statements and ledgers spanning many
+pages have tens of thousands of rows, so this analyzer instead takes the OCR
+words band by band, top to bottom, and yields each row as soon as it can no
+longer grow. Column boundaries are learned from the first rows (the header
+and a few body rows) and then frozen, so only the calibration rows and the
+still-open last row are ever held in memory.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .table_analyzer import TableStructureAnalyzer
+
+
+class IncrementalTableAnalyzer:
+    def __init__(self, calibration_rows: int = 10, row_threshold: Optional[float] = None,
+                 col_threshold: Optional[float] = None):
+        """
+        Args:
+            calibration_rows: Number of leading rows (header included) used to
+                learn the column boundaries before rows start streaming out.
+            row_threshold: Pixel gap that separates rows; None derives it from
+                the median word height.
+            col_threshold: Pixel gap that separates columns while
+                calibrating; None derives it from the median word width.
+        """
+        self.calibration_rows = max(1, calibration_rows)
+        self._analyzer = TableStructureAnalyzer(row_threshold, col_threshold)
+        self._pending: List[Dict] = []        # words of rows that may still grow
+        self._calibration: List[List[Dict]] = []  # finished rows held until columns freeze
+        self._col_edges: Optional[np.ndarray] = None
+        self.columns = 0
+        self.rows_emitted = 0
+
+    @property
+    def buffered_words(self) -> int:
+        """Words currently held in memory."""
+        return len(self._pending) + sum(len(row) for row in self._calibration)
+
+    def feed(self, words: List[Dict]) -> List[List[str]]:
+        """Add the OCR words of the next band; return the rows that are now
+        complete (often none while the columns are being learned).
+
+        A plain method rather than a generator, so the words are buffered
+        even when the caller ignores the result.
+        """
+        self._pending.extend(w for w in words if w.get('text'))
+        if not self._pending:
+            return []
+
+        pending_rows = self._split_rows(self._pending)
+        # The last row may continue in the next band
+        self._pending = pending_rows.pop()
+        rows: List[List[str]] = []
+        for row in pending_rows:
+            rows.extend(self._finish_row(row))
+        return rows
+
+    def close(self) -> List[List[str]]:
+        """Flush the last open row (and calibration rows of short tables)."""
+        rows: List[List[str]] = []
+        if self._pending:
+            row, self._pending = self._pending, []
+            rows.extend(self._finish_row(row))
+        if self._col_edges is None and self._calibration:
+            rows.extend(self._freeze_columns())
+        return rows
+
+    def iter_rows(self, bands: Iterable[List[Dict]]) -> Iterator[List[str]]:
+        """Stream rows for an iterable of OCR word bands, top to bottom."""
+        for band in bands:
+            yield from self.feed(band)
+        yield from self.close()
+
+    def _split_rows(self, words: List[Dict]) -> List[List[Dict]]:
+        """Group words into rows by gaps in their top y coordinate."""
+        boxes = np.array([w['bbox'] for w in words], dtype=np.float64).reshape(-1, 4, 2)
+        row_threshold, _ = self._analyzer._thresholds(boxes)
+        ys = boxes[:, 0, 1]
+        order = np.argsort(ys, kind='stable')
+        breaks = np.flatnonzero(np.diff(ys[order]) > row_threshold) + 1
+        return [[words[i] for i in group] for group in np.split(order, breaks)]
+
+    def _finish_row(self, row: List[Dict]) -> List[List[str]]:
+        if self._col_edges is None:
+            self._calibration.append(row)
+            if len(self._calibration) >= self.calibration_rows:
+                return self._freeze_columns()
+            return []
+        return [self._row_cells(row)]
+
+    def _freeze_columns(self) -> List[List[str]]:
+        """Learn column boundaries from the calibration rows, then emit them."""
+        words = [w for row in self._calibration for w in row]
+        boxes = np.array([w['bbox'] for w in words], dtype=np.float64).reshape(-1, 4, 2)
+        _, col_threshold = self._analyzer._thresholds(boxes)
+        starts, ends = self._analyzer._cluster_coordinates(boxes[:, 0, 0], col_threshold)
+        # From here on every word goes to the nearest learned column: split
+        # halfway between one column's end and the next column's start
+        self._col_edges = (ends[:-1] + starts[1:]) / 2.0
+        self.columns = len(starts)
+
+        rows, self._calibration = self._calibration, []
+        return [self._row_cells(row) for row in rows]
+
+    def _row_cells(self, row: List[Dict]) -> List[str]:
+        xs = np.array([w['bbox'][0][0] for w in row], dtype=np.float64)
+        cols = np.searchsorted(self._col_edges, xs)
+        cells: List[List[str]] = [[] for _ in range(self.columns)]
+        for i in np.argsort(xs, kind='stable'):
+            cells[cols[i]].append(row[i]['text'])
+        self.rows_emitted += 1
+        return [' '.join(parts) for parts in cells]
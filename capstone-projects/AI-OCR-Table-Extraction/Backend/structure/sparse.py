@@ -0,0 +1,71 @@
+"""Sparse (coordinate list) cell storage for table structures.
+
+With noisy clustering a table can come out as thousands of rows by hundreds
+of columns with only a few cells filled. Instead of a dense `cells` matrix of
+empty strings, a structure can carry `sparse_cells`: parallel 'row', 'col'
+and 'text' lists of the non-empty cells in row-major order. It stays
+JSON-friendly, and the helpers below let consumers read either form.
+"""
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+
+def to_sparse(row_idx: np.ndarray, col_idx: np.ndarray, texts: List[str],
+              n_cols: int) -> Dict[str, List]:
+    """Build a coordinate list from per-word cell indices.
+
+    Words with a negative index are ignored; of several words in one cell
+    the last one wins, matching the dense assignment.
+    """
+    row_idx = np.asarray(row_idx, dtype=np.int64)
+    col_idx = np.asarray(col_idx, dtype=np.int64)
+    valid = np.flatnonzero((row_idx >= 0) & (col_idx >= 0))
+    keys = row_idx[valid] * max(n_cols, 1) + col_idx[valid]
+
+    # np.unique keeps the first occurrence, so look at the words in reverse
+    _, first_in_reversed = np.unique(keys[::-1], return_index=True)
+    chosen = valid[::-1][first_in_reversed]  # sorted by key = row-major
+    chosen = [i for i in chosen if texts[i]]
+    return {
+        'row': row_idx[chosen].tolist(),
+        'col': col_idx[chosen].tolist(),
+        'text': [texts[i] for i in chosen]
+    }
+
+
+def dense_to_sparse(cells: List[List[str]]) -> Dict[str, List]:
+    rows, cols, texts = [], [], []
+    for r, row in enumerate(cells):
+        for c, text in enumerate(row):
+            if text:
+                rows.append(r)
+                cols.append(c)
+                texts.append(text)
+    return {'row': rows, 'col': cols, 'text': texts}
+
+
+def iter_table_rows(table_data: Dict) -> Iterator[List[str]]:
+    """Yield the rows of a structure as lists of strings, one at a time,
+    whether it stores dense `cells` or `sparse_cells`."""
+    if 'sparse_cells' not in table_data:
+        yield from table_data.get('cells', [])
+        return
+
+    sparse = table_data['sparse_cells']
+    n_rows, n_cols = table_data['rows'], table_data['columns']
+    rows, cols, texts = sparse['row'], sparse['col'], sparse['text']
+    k = 0
+    for r in range(n_rows):
+        row = [''] * n_cols
+        while k < len(rows) and rows[k] == r:
+            row[cols[k]] = texts[k]
+            k += 1
+        yield row
+
+
+def dense_cells(table_data: Dict) -> List[List[str]]:
+    """The compatibility `cells` matrix, built on demand for sparse structures."""
+    if 'sparse_cells' not in table_data:
+        return table_data.get('cells', [])
+    return list(iter_table_rows(table_data))
@@ -0,0 +1,107 @@
+"""Cross-page table stitching.
+
+A table that runs over several pages is detected and analyzed once per page,
+each time with its header repeated. `TableStitcher` walks the per-page
+structures in order, continues the current table when a page's column layout
+matches the previous page's (by similarity of the column boundary vectors),
+drops the repeated header rows and streams the merged rows out. Only the
+current layout and header are remembered, never the earlier pages.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .sparse import dense_cells
+from .table_analyzer import TableStructureAnalyzer
+
+
+def layout_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    """Similarity in [0, 1] of two column boundary vectors (left edges).
+
+    The score averages three kinds of error, each relative to the wider
+    table's span: where the interior boundaries sit within the span, how
+    much the spans differ, and how far the tables are offset. A page scanned
+    with a small shift still matches. Tables with the same column count but
+    another width or position (every pair of 2-column tables has the same
+    normalized edges) do not. Different column counts never match, and a
+    single column has no layout to compare, so it never matches either.
+    """
+    if len(a) != len(b) or len(a) < 2:
+        return 0.0
+    va, vb = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    span_a, span_b = va[-1] - va[0], vb[-1] - vb[0]
+    if span_a <= 0 or span_b <= 0:
+        return 0.0
+    span = max(span_a, span_b)
+    interior = np.abs((va[1:-1] - va[0]) / span_a - (vb[1:-1] - vb[0]) / span_b)
+    errors = np.concatenate((interior, [abs(span_a - span_b) / span, abs(va[0] - vb[0]) / span]))
+    return float(max(0.0, 1.0 - errors.mean()))
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+class TableStitcher:
+    def __init__(self, analyzer: Optional[TableStructureAnalyzer] = None,
+                 similarity_threshold: float = 0.95, header_rows: int = 1,
+                 header_match: float = 0.8):
+        """
+        Args:
+            analyzer: Used for pages given as raw OCR words.
+            similarity_threshold: Minimum layout_similarity for a page to
+                continue the previous page's table.
+            header_rows: Number of header rows at the top of each table.
+            header_match: Fraction of non-empty header cells a row must
+                repeat to be dropped as a duplicated header.
+        """
+        self.analyzer = analyzer or TableStructureAnalyzer()
+        self.similarity_threshold = similarity_threshold
+        self.header_rows = header_rows
+        self.header_match = header_match
+
+    def stitch(self, pages: Iterable[Union[Dict, List[Dict]]]) -> Iterator[Tuple[int, List[str]]]:
+        """Yield (table_index, row) for the rows of all pages, in order.
+
+        Each page is a structure from TableStructureAnalyzer (dense or
+        sparse cells, plus 'column_boundaries') or a list of OCR words,
+        which is analyzed when its turn comes. Pages are consumed lazily.
+        """
+        table_index = -1
+        layout: Optional[List[float]] = None
+        header: List[List[str]] = []
+
+        for page in pages:
+            structure = self.analyzer.analyze_structure(page) if isinstance(page, list) else page
+            rows = dense_cells(structure)
+            boundaries = structure.get('column_boundaries', [])
+            if not rows:
+                continue
+
+            continued = layout is not None and \
+                layout_similarity(layout, boundaries) >= self.similarity_threshold
+            if continued:
+                rows = self._drop_repeated_header(rows, header)
+            else:
+                table_index += 1
+                header = [list(r) for r in rows[:self.header_rows]]
+            layout = boundaries
+
+            for row in rows:
+                yield table_index, row
+
+    def _drop_repeated_header(self, rows: List[List[str]],
+                              header: List[List[str]]) -> List[List[str]]:
+        skip = 0
+        while skip < len(header) and skip < len(rows) and self._same_row(rows[skip], header[skip]):
+            skip += 1
+        return rows[skip:]
+
+    def _same_row(self, row: Sequence[str], header_row: Sequence[str]) -> bool:
+        expected = [_normalize(c) for c in header_row]
+        filled = [i for i, c in enumerate(expected) if c]
+        if not filled or len(row) != len(header_row):
+            return False
+        hits = sum(1 for i in filled if _normalize(row[i]) == expected[i])
+        return hits / len(filled) >= self.header_match
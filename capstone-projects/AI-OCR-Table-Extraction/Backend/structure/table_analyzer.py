@@ -1,88 +1,250 @@
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional
 
+from ..detection.grid_detector import detect_grid_tables
+from .grid import build_cell_grid, cell_lookup, locate_points
+from .sparse import dense_to_sparse, to_sparse
+
+# Boundaries of 1-D clusters: sorted start coordinates and matching end coordinates
+Bounds = Tuple[np.ndarray, np.ndarray]
+
 class TableStructureAnalyzer:
-    def __init__(self):
+    def __init__(self, row_threshold: Optional[float] = None, col_threshold: Optional[float] = None,
+                 sparse: bool = False):
         """
         Initialize the table structure analyzer
+        Args:
+            row_threshold: Pixel gap that separates rows. None derives it from
+                the median word height of each table, so it follows the DPI.
+            col_threshold: Pixel gap that separates columns. None derives it
+                from the median word width.
+            sparse: Return the non-empty cells as a coordinate list under
+                'sparse_cells' instead of the dense 'cells' matrix (see
+                structure.sparse for readers of both forms).
         """
-        self.row_threshold = 10  # pixel threshold for row detection
-        self.col_threshold = 10  # pixel threshold for column detection
-    
+        self.sparse = sparse
+        self.row_threshold = row_threshold  # pixel threshold for row detection
+        self.col_threshold = col_threshold  # pixel threshold for column detection
+        self.row_gap_ratio = 0.5  # auto row threshold, as a fraction of the median word height
+        self.col_gap_ratio = 0.5  # auto column threshold, as a fraction of the median word width
+
     def analyze_structure(self, ocr_results: List[Dict]) -> Dict:
         """
         Analyze the table structure from OCR results
         Args:
             ocr_results: List of dictionaries containing OCR results with bbox, text, and confidence
         Returns:
-            Dict containing table structure with rows, columns, and cells
+            Dict containing table structure with rows, columns, and cells, plus
+            the left edge x of every column as column_boundaries
         """
-        # Extract all bounding boxes
-        bboxes = [result['bbox'] for result in ocr_results]
+        if not ocr_results:
+            empty = {'row': [], 'col': [], 'text': []} if self.sparse else []
+            return {'rows': 0, 'columns': 0, self._cells_key(): empty, 'column_boundaries': []}
+
+        # Extract all bounding boxes as an (n, 4, 2) array of corner points
+        boxes = np.array([result['bbox'] for result in ocr_results],
+                         dtype=np.float64).reshape(-1, 4, 2)
         texts = [result['text'] for result in ocr_results]
-        
+        row_threshold, col_threshold = self._thresholds(boxes)
+
         # Identify rows based on y-coordinates
-        y_coords = [bbox[0][1] for bbox in bboxes]  # Use top-left y-coordinate
-        rows = self._cluster_coordinates(y_coords, self.row_threshold)
-        
+        y_coords = boxes[:, 0, 1]  # Use top-left y-coordinate
+        rows = self._cluster_coordinates(y_coords, row_threshold)
+
         # Identify columns based on x-coordinates
-        x_coords = [bbox[0][0] for bbox in bboxes]  # Use top-left x-coordinate
-        columns = self._cluster_coordinates(x_coords, self.col_threshold)
-        
+        x_coords = boxes[:, 0, 0]  # Use top-left x-coordinate
+        columns = self._cluster_coordinates(x_coords, col_threshold)
+
         # Create table structure
+        if self.sparse:
+            cells = to_sparse(self._find_cluster_indices(y_coords, *rows),
+                              self._find_cluster_indices(x_coords, *columns),
+                              texts, len(columns[0]))
+        else:
+            cells = self._assign_cells(x_coords, y_coords, texts, rows, columns)
         table = {
-            'rows': len(rows),
-            'columns': len(columns),
-            'cells': self._assign_cells(bboxes, texts, rows, columns)
+            'rows': len(rows[0]),
+            'columns': len(columns[0]),
+            self._cells_key(): cells,
+            'column_boundaries': columns[0].tolist()  # left edge of every column
         }
-        
+
         return table
-    
-    def _cluster_coordinates(self, coords: List[float], threshold: int) -> List[List[int]]:
-        """
-        Cluster coordinates that are close together
-        """
-        coords = sorted(coords)
-        clusters = []
-        current_cluster = [coords[0]]
-        
-        for coord in coords[1:]:
-            if coord - current_cluster[-1] <= threshold:
-                current_cluster.append(coord)
-            else:
-                clusters.append(current_cluster)
-                current_cluster = [coord]
-        
-        clusters.append(current_cluster)
-        return clusters
-    
-    def _assign_cells(self, bboxes: List[List[List[int]]], texts: List[str],
-                     rows: List[List[float]], columns: List[List[float]]) -> List[List[str]]:
+
+    def analyze_grid(self, image: np.ndarray, ocr_engine=None,
+                     ocr_results: Optional[List[Dict]] = None, grid: Optional[Dict] = None,
+                     max_workers: int = 4) -> Dict:
+        """
+        Grid-first structure analysis: derive the cells from the ruling lines
+        before any text is read, then fill them with text
+        Args:
+            image: The table image (a crop from TableDetector)
+            ocr_engine: Engine with `process_image`; used to OCR every cell
+                crop in parallel when `ocr_results` is not given
+            ocr_results: Already available OCR words in table image
+                coordinates; each word goes to the cell containing its center
+            grid: Precomputed 'row_boundaries'/'col_boundaries', e.g. one
+                table from TableDetector.detect_tables_with_grid. Boundaries
+                and 'bbox' are in the coordinates of the page the grid was
+                found on, and `image` must be the crop of that 'bbox'; the
+                boundaries are moved by the bbox origin. A grid without
+                'bbox' is taken as already in table image coordinates
+            max_workers: Parallel cell OCR calls
+        Returns:
+            Same keys as analyze_structure, plus 'grid_cells': one dict per
+            cell with 'row', 'col', 'row_span', 'col_span', 'bbox' and 'text'.
+            A spanning cell's text sits in its top-left slot of 'cells'.
+            Tables without ruling lines fall back to analyze_structure.
+        """
+        if grid is not None and grid.get('bbox') is not None:
+            x0, y0 = grid['bbox'][:2]
+            grid = {'row_boundaries': [int(y) - y0 for y in grid.get('row_boundaries', [])],
+                    'col_boundaries': [int(x) - x0 for x in grid.get('col_boundaries', [])]}
+        if grid is None or len(grid.get('row_boundaries', [])) < 2 \
+                or len(grid.get('col_boundaries', [])) < 2:
+            tables = detect_grid_tables(image)
+            grid = max(tables, key=lambda t: (t['bbox'][2] - t['bbox'][0])
+                       * (t['bbox'][3] - t['bbox'][1])) if tables else None
+
+        if grid is None:
+            if ocr_results is None:
+                ocr_results = ocr_engine.process_image(image) if ocr_engine is not None else []
+            return self.analyze_structure([r for r in ocr_results if r.get('text')])
+
+        rows, cols = grid['row_boundaries'], grid['col_boundaries']
+        grid_cells = build_cell_grid(image, rows, cols)
+        n_rows, n_cols = len(rows) - 1, len(cols) - 1
+
+        if ocr_results is not None:
+            texts = self._texts_by_cell(ocr_results, grid_cells, rows, cols)
+        elif ocr_engine is not None:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                texts = list(pool.map(lambda cell: self._ocr_cell(image, cell, ocr_engine),
+                                      grid_cells))
+        else:
+            texts = ['' for _ in grid_cells]
+
+        cells = [['' for _ in range(n_cols)] for _ in range(n_rows)]
+        for cell, text in zip(grid_cells, texts):
+            cell['text'] = text
+            cells[cell['row']][cell['col']] = text
+
+        return {
+            'rows': n_rows,
+            'columns': n_cols,
+            self._cells_key(): dense_to_sparse(cells) if self.sparse else cells,
+            'column_boundaries': [int(x) for x in cols[:-1]],
+            'grid_cells': grid_cells
+        }
+
+    def _cells_key(self) -> str:
+        return 'sparse_cells' if self.sparse else 'cells'
+
+    def _texts_by_cell(self, ocr_results: List[Dict], grid_cells: List[Dict],
+                       rows: List[int], cols: List[int]) -> List[str]:
+        """
+        Assign words to cells by interval lookup of their box centers
+        """
+        words = [r for r in ocr_results if r.get('text')]
+        texts: List[List[Tuple[float, float, str]]] = [[] for _ in grid_cells]
+        if not words:
+            return ['' for _ in grid_cells]
+
+        boxes = np.array([w['bbox'] for w in words], dtype=np.float64).reshape(-1, 4, 2)
+        centers = boxes.mean(axis=1)
+        r, c = locate_points(centers[:, 0], centers[:, 1], rows, cols)
+        lookup = cell_lookup(grid_cells, len(rows) - 1, len(cols) - 1)
+        for i in np.flatnonzero(r >= 0):
+            texts[lookup[r[i], c[i]]].append((boxes[i, 0, 1], boxes[i, 0, 0], words[i]['text']))
+
+        return [self._join_words(parts) for parts in texts]
+
+    def _ocr_cell(self, image: np.ndarray, cell: Dict, ocr_engine) -> str:
+        """
+        OCR one cell crop, trimming the ruling lines around it
+        """
+        x1, y1, x2, y2 = cell['bbox']
+        inset = max(2, int(min(x2 - x1, y2 - y1) * 0.05))
+        crop = image[y1 + inset:y2 - inset, x1 + inset:x2 - inset]
+        if crop.size == 0:
+            return ''
+        results = ocr_engine.process_image(crop)
+        parts = [(r['bbox'][0][1], r['bbox'][0][0], r['text']) for r in results if r.get('text')]
+        return self._join_words(parts)
+
+    def _join_words(self, parts: List[Tuple[float, float, str]]) -> str:
+        """
+        Join words of one cell in reading order (lines top to bottom, then left to right)
+        """
+        if not parts:
+            return ''
+        parts.sort(key=lambda p: (p[0], p[1]))
+        return ' '.join(text for _, _, text in parts)
+
+    def _thresholds(self, boxes: np.ndarray) -> Tuple[float, float]:
+        """
+        Row/column gap thresholds; configured values win, otherwise they
+        are derived from the median word height and width
+        """
+        row_threshold, col_threshold = self.row_threshold, self.col_threshold
+        if row_threshold is None:
+            heights = boxes[:, :, 1].max(axis=1) - boxes[:, :, 1].min(axis=1)
+            row_threshold = max(1.0, self.row_gap_ratio * float(np.median(heights)))
+        if col_threshold is None:
+            widths = boxes[:, :, 0].max(axis=1) - boxes[:, :, 0].min(axis=1)
+            col_threshold = max(1.0, self.col_gap_ratio * float(np.median(widths)))
+        return row_threshold, col_threshold
+
+    @staticmethod
+    def _cluster_coordinates(coords: np.ndarray, threshold: float) -> Bounds:
+        """
+        Cluster coordinates that are close together: after sorting, every gap
+        wider than `threshold` starts a new cluster
+        Returns:
+            (starts, ends) arrays with the first and last coordinate of each cluster
+        """
+        coords = np.sort(np.asarray(coords, dtype=np.float64))
+        if coords.size == 0:
+            return coords, coords
+        breaks = np.flatnonzero(np.diff(coords) > threshold)
+        starts = np.concatenate((coords[:1], coords[breaks + 1]))
+        ends = np.concatenate((coords[breaks], coords[-1:]))
+        return starts, ends
+
+    def _assign_cells(self, x_coords: np.ndarray, y_coords: np.ndarray, texts: List[str],
+                      rows: Bounds, columns: Bounds) -> List[List[str]]:
         """
         Assign text to cells based on their position in rows and columns
         """
         # Initialize empty table
-        table = [['' for _ in range(len(columns))] for _ in range(len(rows))]
-        
-        # Assign text to cells
-        for bbox, text in zip(bboxes, texts):
-            row_idx = self._find_cluster_index(bbox[0][1], rows)
-            col_idx = self._find_cluster_index(bbox[0][0], columns)
-            if row_idx is not None and col_idx is not None:
-                table[row_idx][col_idx] = text
-        
+        table = [['' for _ in range(len(columns[0]))] for _ in range(len(rows[0]))]
+        if not texts:
+            return table
+
+        # Locate every word's row and column in one vectorized pass
+        row_idx = self._find_cluster_indices(y_coords, *rows)
+        col_idx = self._find_cluster_indices(x_coords, *columns)
+
+        # Assign text to cells; later words win, as before
+        for i in np.flatnonzero((row_idx >= 0) & (col_idx >= 0)):
+            table[row_idx[i]][col_idx[i]] = texts[i]
+
         return table
-    
-    def _find_cluster_index(self, value: float, clusters: List[List[float]]) -> Optional[int]:
+
+    @staticmethod
+    def _find_cluster_indices(values: np.ndarray, starts: np.ndarray,
+                              ends: np.ndarray) -> np.ndarray:
         """
-        Find which cluster a value belongs to
+        Find which cluster each value belongs to
         Args:
-            value: The coordinate value to find the cluster for
-            clusters: List of coordinate clusters
+            values: Coordinate values to find the clusters for
+            starts: Sorted start coordinates of the clusters
+            ends: End coordinates of the clusters, in the same order
         Returns:
-            Index of the cluster containing the value, or None if not found
+            Index of the cluster containing each value, or -1 if not found
         """
-        for i, cluster in enumerate(clusters):
-            if min(cluster) <= value <= max(cluster):
-                return i
-        return None
\ No newline at end of file
+        idx = np.searchsorted(starts, values, side='right') - 1
+        inside = idx >= 0
+        inside[inside] = values[inside] <= ends[idx[inside]]
+        return np.where(inside, idx, -1)
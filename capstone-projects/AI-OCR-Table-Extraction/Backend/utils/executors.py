@@ -0,0 +1,134 @@
+"""Executor layer that keeps blocking pipeline work off the event loop.
+
+OpenCV releases the GIL, so image stages run on a thread pool. Stages that
+spend their time in Python (parsing OCR output, structure analysis) run on a
+process pool. Admission is bounded: at most `max_jobs` run at once, at most
+`max_queue` wait for a slot, and callers beyond that are refused at once
+(429) instead of piling up. A job that waits longer than `queue_timeout`
+gives up with 503. Both carry a Retry-After hint.
+
+Settings come from the environment: PIPELINE_THREADS, PIPELINE_PROCESSES
+(0 runs process stages on the thread pool), PIPELINE_MAX_JOBS,
+PIPELINE_MAX_QUEUE, PIPELINE_QUEUE_TIMEOUT and PIPELINE_RETRY_AFTER.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+class Overloaded(Exception):
+    """Raised when a job cannot be admitted; maps to an HTTP error."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class PipelineExecutor:
+    def __init__(self, threads: Optional[int] = None, processes: Optional[int] = None,
+                 max_jobs: Optional[int] = None, max_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = None, retry_after: Optional[int] = None):
+        cpus = os.cpu_count() or 2
+        self.threads = threads if threads is not None else _env_int("PIPELINE_THREADS", cpus)
+        self.processes = processes if processes is not None else \
+            _env_int("PIPELINE_PROCESSES", max(1, cpus // 2))
+        self.max_jobs = max_jobs if max_jobs is not None else _env_int("PIPELINE_MAX_JOBS", cpus)
+        self.max_queue = max_queue if max_queue is not None else \
+            _env_int("PIPELINE_MAX_QUEUE", 4 * self.max_jobs)
+        self.queue_timeout = queue_timeout if queue_timeout is not None else \
+            float(os.getenv("PIPELINE_QUEUE_TIMEOUT", "30"))
+        self.retry_after = retry_after if retry_after is not None else \
+            _env_int("PIPELINE_RETRY_AFTER", 5)
+
+        self._semaphore = asyncio.Semaphore(self.max_jobs)
+        self._waiting = 0
+        self._running = 0
+        self._closed = False
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the `max_jobs` job slots for the duration of the block."""
+        if self._closed:
+            raise Overloaded(503, "Server is shutting down", self.retry_after)
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            raise Overloaded(429, "Too many jobs in progress - retry later", self.retry_after)
+
+        # Not asyncio.wait_for: on 3.11 it can swallow a cancellation that
+        # arrives just as the semaphore is acquired, leaking the slot.
+        self._waiting += 1
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            done, _ = await asyncio.wait({acquire}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(acquire)
+            raise
+        finally:
+            self._waiting -= 1
+        if not done:
+            self._abandon(acquire)
+            raise Overloaded(503, "Timed out waiting for a free worker", self.retry_after)
+
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+    def _abandon(self, acquire: asyncio.Future) -> None:
+        # cancel() fails only if the acquire already went through
+        if not acquire.cancel():
+            self._semaphore.release()
+
+    async def run_thread(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run an OpenCV-style (GIL-releasing) stage on the thread pool."""
+        return await self._run(self._threads(), fn, *args, **kwargs)
+
+    async def run_process(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a Python-heavy stage on the process pool. `fn` and its
+        arguments must be picklable (module-level functions)."""
+        pool = self._processes() if self.processes > 0 else self._threads()
+        return await self._run(pool, fn, *args, **kwargs)
+
+    async def _run(self, pool: Executor, fn: Callable, *args, **kwargs) -> Any:
+        call = functools.partial(fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+    def _threads(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=max(1, self.threads),
+                                                   thread_name_prefix="pipeline")
+        return self._thread_pool
+
+    def _processes(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the app never forks workers
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self._process_pool
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._closed = True
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+        self._thread_pool = self._process_pool = None
@@ -0,0 +1,124 @@
+"""Conditional and partial file responses for stored images.
+
+Files are sent with FileResponse, which streams from disk without loading
+the file (and hands it to the server's sendfile when the server supports
+it). Each response carries a strong ETag: the SHA-256 of the content,
+which callers already have because stored files are addressed by it.
+Clients that send the ETag back in If-None-Match get a bodyless 304. A
+single `Range: bytes=...` is answered with 206 and only those bytes,
+honouring If-Range. Multiple ranges are answered with the whole file.
+`stream_response` gives the same answers for content that is not a local
+file (a remote blob), read in chunks through a callable.
+"""
+import os
+from typing import AsyncIterator, Callable, Optional, Tuple, Union
+
+import aiofiles
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CACHE_CONTROL = os.getenv("DOWNLOAD_CACHE_CONTROL", "private, no-cache")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=start-end` range into inclusive offsets.
+
+    Returns None when the header should be ignored (not bytes, several
+    ranges, malformed) and raises ValueError when it cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, sep, end = spec.strip().partition("-")
+    if not sep or not (start or end) or (start and not start.isdigit()) \
+            or (end and not end.isdigit()):
+        return None
+    if not start:
+        # Suffix range: the last `end` bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - length), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or last < first:
+        raise ValueError("Range not satisfiable")
+    return first, last
+
+
+async def _iter_range(path: str, start: int, end: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _conditional(request: Request, etag: str, size: int,
+                 headers: dict) -> Union[Response, Tuple[int, int], None]:
+    """The 304 or 416 response a request gets, else the byte range to send
+    (None for the whole content). Adds the range headers to `headers`."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if not range_header or (if_range is not None and if_range.strip() != etag):
+        return None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is not None:
+        start, end = byte_range
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}",
+                        "Content-Length": str(end - start + 1)})
+    return byte_range
+
+
+async def file_response(request: Request, path: str, stat: os.stat_result, etag: str,
+                        media_type: Optional[str] = None, filename: Optional[str] = None,
+                        cache_control: str = CACHE_CONTROL) -> Response:
+    """200, 206, 304 or 416 response for `path`, whose `stat` the caller has;
+    `etag` is the quoted content hash."""
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    answer = _conditional(request, etag, stat.st_size, headers)
+    if isinstance(answer, Response):
+        return answer
+    if answer is not None:
+        return StreamingResponse(_iter_range(path, *answer), status_code=206,
+                                 media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, filename=filename, stat_result=stat,
+                        headers=headers)
+
+
+def stream_response(request: Request, size: int,
+                    read_range: Callable[[int, int], AsyncIterator[bytes]], etag: str,
+                    media_type: Optional[str] = None,
+                    cache_control: str = CACHE_CONTROL) -> Response:
+    """`file_response` for content of `size` bytes that is not a local file.
+    `read_range(start, end)` yields the bytes of an inclusive range in
+    chunks."""
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    answer = _conditional(request, etag, size, headers)
+    if isinstance(answer, Response):
+        return answer
+    if answer is not None:
+        return StreamingResponse(read_range(*answer), status_code=206, media_type=media_type,
+                                 headers=headers)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(read_range(0, size - 1), media_type=media_type, headers=headers)
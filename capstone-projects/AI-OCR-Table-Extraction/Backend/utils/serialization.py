@@ -0,0 +1,100 @@
+"""JSON serialization for extraction results.
+
+OCR and structure results are large lists of word dicts and cell matrices,
+often still holding NumPy scalars and arrays from the detection and
+clustering code. `dumps` encodes them with orjson when it is installed (several
+times faster than the stdlib encoder and NumPy-aware) and falls back to
+`json` otherwise, so both paths accept the same values. NDJSON helpers write
+one row or word per line for streaming, and the response classes plug the
+same encoder into FastAPI.
+"""
+import datetime
+import json
+from decimal import Decimal
+from typing import Any, AsyncIterable, AsyncIterator, BinaryIO, Iterable, Iterator, Union
+
+import numpy as np
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+if _HAS_ORJSON:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Encode the values neither encoder handles by itself."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    # bson.ObjectId and similar ids
+    if type(obj).__name__ == 'ObjectId':
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode `obj` as compact UTF-8 JSON."""
+    if _HAS_ORJSON:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+    return json.dumps(obj, default=_default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Any) -> Any:
+    if _HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump(obj: Any, stream: BinaryIO) -> None:
+    stream.write(dumps(obj))
+
+
+def iter_ndjson(items: Iterable[Any]) -> Iterator[bytes]:
+    """Yield one encoded JSON line per item."""
+    for item in items:
+        yield dumps(item) + b'\n'
+
+
+async def aiter_ndjson(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    """Async version of iter_ndjson, for items produced by async code."""
+    async for item in items:
+        yield dumps(item) + b'\n'
+
+
+def write_ndjson(items: Iterable[Any], stream: BinaryIO) -> int:
+    """Write one JSON line per item to a binary stream; returns the line count."""
+    count = 0
+    for line in iter_ndjson(items):
+        stream.write(line)
+        count += 1
+    return count
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`, for endpoints returning large results."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class NDJSONResponse(StreamingResponse):
+    """Streams an iterable or async iterable of items as newline-delimited JSON."""
+
+    media_type = "application/x-ndjson"
+
+    def __init__(self, items: Union[Iterable[Any], AsyncIterable[Any]], **kwargs):
+        lines = aiter_ndjson(items) if hasattr(items, "__aiter__") else iter_ndjson(items)
+        super().__init__(lines, media_type=self.media_type, **kwargs)
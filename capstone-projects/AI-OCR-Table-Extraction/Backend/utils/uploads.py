@@ -0,0 +1,87 @@
+"""Non-blocking upload storage.
+
+Uploaded scans are copied to disk in chunks with aiofiles, so large files
+never block the event loop. The SHA-256 of the content and its size are
+computed while the chunks go by, and the copy stops as soon as the size
+limit is crossed. Data is written to a hidden `.part` file that is only
+renamed to its final name once complete.
+
+The limit only bounds what is kept. Starlette has already read the whole
+multipart body (spooling large files to a temporary file) before the
+endpoint runs, so a body sent without Content-Length is received in full
+and then refused. Only a declared Content-Length over the limit is
+refused before the body is read, by the middleware in main.py.
+"""
+import hashlib
+import os
+import uuid
+from typing import Dict
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(1024 * 1024 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+def safe_filename(filename: str) -> str:
+    """Strip any directory part a client may send, e.g. '../../x.png'."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        raise ValueError("Invalid filename")
+    return name
+
+
+async def save_upload(file: UploadFile, directory: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                      chunk_size: int = CHUNK_SIZE) -> Dict:
+    """Stream `file` into `directory`; returns filename, path, size and sha256.
+
+    Raises UploadTooLarge (and leaves nothing behind) once more than
+    `max_bytes` have been received.
+    """
+    filename = safe_filename(file.filename)
+    path = os.path.join(directory, filename)
+    part_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(part_path, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+        await aiofiles.os.replace(part_path, path)
+    except BaseException:
+        if await aiofiles.os.path.exists(part_path):
+            await aiofiles.os.remove(part_path)
+        raise
+    return {"filename": filename, "path": path, "size": size, "sha256": digest.hexdigest()}
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                      chunk_size: int = CHUNK_SIZE) -> bytes:
+    """Read an upload into memory in chunks, stopping at the size limit."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -17,10 +17,12 @@ class WebSocketManager:
         if not self.active_connections[document_id]:
             del self.active_connections[document_id]
     
-    async def broadcast_status(self, document_id: int, status: str, progress: Optional[float] = None):
+    async def broadcast_status(self, document_id: int, status: str, progress: Optional[float] = None,
+                               stage: Optional[str] = None):
         if document_id in self.active_connections:
             message = json.dumps({
                 "status": status,
+                "stage": stage,
                 "progress": progress,
                 "document_id": document_id
             })
@@ -0,0 +1,98 @@
+"""
+Micro-batching benchmark: p50/p99 latency and throughput at several
+concurrency levels, with and without MicroBatcher.
+
+By default the model is simulated (fixed per-call overhead + per-item cost,
+which is how vectorized CPU inference behaves). Pass --engine ocr to run the
+real OCREngine on synthetic crops instead.
+
+Usage (from AI-OCR-Table-Extraction/):
+    python -m benchmarks.bench_batching
+    python -m benchmarks.bench_batching --engine ocr --requests 64
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Backend.ocr.batching import MicroBatcher  # noqa: E402
+
+
+def simulated_model(call_overhead_ms: float, per_item_ms: float):
+    # A CPU model already uses every core for one call, so calls are serialized
+    lock = threading.Lock()
+
+    def run(items):
+        with lock:
+            time.sleep((call_overhead_ms + per_item_ms * len(items)) / 1000.0)
+        return [None for _ in items]
+    return run
+
+
+def make_crop(i: int) -> np.ndarray:
+    import cv2
+    img = np.ones((48, 320), dtype=np.uint8) * 255
+    cv2.putText(img, f"Item {i} 12,345", (5, 35), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
+    return img
+
+
+def run_level(call, items, concurrency: int):
+    latencies = []
+
+    def one(item):
+        t0 = time.perf_counter()
+        call(item)
+        latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, items))
+    elapsed = time.perf_counter() - start
+
+    lat = np.array(latencies) * 1000.0
+    return np.percentile(lat, 50), np.percentile(lat, 99), len(items) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=["simulated", "ocr"], default="simulated")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.engine == "ocr":
+        from Backend.ocr.ocr_engine import OCREngine
+        engine = OCREngine()
+        batch_fn = engine.process_images
+        items = [make_crop(i) for i in range(args.requests)]
+    else:
+        batch_fn = simulated_model(call_overhead_ms=8.0, per_item_ms=0.5)
+        items = list(range(args.requests))
+
+    def unbatched(item):
+        return batch_fn([item])[0]
+
+    print(f"{'mode':<10}{'conc':>6}{'p50 ms':>10}{'p99 ms':>10}{'items/s':>10}")
+    for concurrency in args.concurrency:
+        p50, p99, tput = run_level(unbatched, items, concurrency)
+        print(f"{'single':<10}{concurrency:>6}{p50:>10.1f}{p99:>10.1f}{tput:>10.1f}")
+
+        batcher = MicroBatcher(batch_fn, args.max_batch_size, args.max_wait_ms)
+        try:
+            p50, p99, tput = run_level(batcher, items, concurrency)
+        finally:
+            batcher.close()
+        print(f"{'batched':<10}{concurrency:>6}{p50:>10.1f}{p99:>10.1f}{tput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Table detector backend comparison: startup time (import + model load, measured
+in a fresh interpreter) and per-page latency for the torch, onnx and fallback
+backends.
+
+Export the models first (needs ultralytics + onnxruntime):
+    python -m benchmarks.bench_detector_backends --export --quantize
+
+Then compare (from AI-OCR-Table-Extraction/):
+    python -m benchmarks.bench_detector_backends
+    python -m benchmarks.bench_detector_backends --onnx-path models/table_detection.int8.onnx
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+STARTUP_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from Backend.detection.table_detector import TableDetector
+d = TableDetector(model_path={model_path!r}, backend={backend!r}, onnx_path={onnx_path!r})
+print(time.perf_counter() - t0, d.backend)
+"""
+
+
+def make_page(width: int = 2480, height: int = 3508) -> np.ndarray:
+    """Synthetic A4 page at 300 dpi with one ruled table."""
+    import cv2
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    x1, y1, x2, y2 = width // 10, height // 5, width * 9 // 10, height * 3 // 5
+    for y in range(y1, y2 + 1, (y2 - y1) // 12):
+        cv2.line(page, (x1, y), (x2, y), (0, 0, 0), 3)
+    for x in range(x1, x2 + 1, (x2 - x1) // 5):
+        cv2.line(page, (x, y1), (x, y2), (0, 0, 0), 3)
+    return page
+
+
+def measure_startup(backend: str, model_path: str, onnx_path: str):
+    code = STARTUP_SNIPPET.format(model_path=model_path, backend=backend, onnx_path=onnx_path)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        return None, None
+    seconds, loaded = out.stdout.strip().splitlines()[-1].split()
+    return float(seconds), loaded
+
+
+def measure_latency(backend: str, model_path: str, onnx_path: str, page: np.ndarray,
+                    iterations: int):
+    from Backend.detection.table_detector import TableDetector
+    detector = TableDetector(model_path=model_path, backend=backend, onnx_path=onnx_path)
+    detector.detect_tables(page)  # warm-up
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        detector.detect_tables(page)
+        timings.append(time.perf_counter() - t0)
+    return detector.backend, np.percentile(np.array(timings) * 1000.0, [50, 99])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default="models/table_detection.pt")
+    parser.add_argument("--onnx-path", default="models/table_detection.onnx")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--export", action="store_true", help="export the .pt model to ONNX first")
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamic INT8 model")
+    args = parser.parse_args()
+
+    if args.export:
+        from Backend.detection.onnx_backend import export_onnx
+        path = export_onnx(args.model_path, args.onnx_path, quantize=args.quantize)
+        print(f"Exported: {path}")
+        return
+
+    page = make_page()
+    print(f"{'backend':<10}{'loaded':>10}{'startup s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for backend in ("torch", "onnx", "none"):
+        startup, _ = measure_startup(backend, args.model_path, args.onnx_path)
+        loaded, (p50, p99) = measure_latency(backend, args.model_path, args.onnx_path, page,
+                                             args.iterations)
+        startup_str = f"{startup:.2f}" if startup is not None else "error"
+        print(f"{backend:<10}{str(loaded):>10}{startup_str:>12}{p50:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
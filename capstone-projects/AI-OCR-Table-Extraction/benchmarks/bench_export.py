@@ -0,0 +1,92 @@
+"""
+Export format benchmark: file size, write time and load time of a synthetic
+Korean bank statement (date, description, withdrawal, deposit, balance, rate)
+exported as CSV, JSON and Parquet. The CSV and JSON files load as text and
+still need parsing; the Parquet file loads with typed columns.
+
+Usage (from AI-OCR-Table-Extraction/):
+    python -m benchmarks.bench_export --rows 100000
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Backend.converter.data_converter import DataConverter  # noqa: E402
+
+HEADER = ['거래일자', '적요', '출금액', '입금액', '잔액', '이율']
+MEMOS = ['급여', '카드대금', '이체', '수수료', '이자', 'ATM 출금']
+
+
+def make_statement(n_rows: int, seed: int = 0) -> Dict:
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(1, 5_000_000, size=n_rows)
+    balance = np.cumsum(amounts) % 100_000_000
+    cells = [HEADER]
+    for i in range(n_rows):
+        out = i % 3 == 0
+        cells.append([
+            f"2024.{i % 12 + 1:02d}.{i % 28 + 1:02d}",
+            MEMOS[i % len(MEMOS)],
+            f"{amounts[i]:,}" if out else '',
+            '' if out else f"{amounts[i]:,}",
+            f"{balance[i]:,}원",
+            f"{rng.random() * 5:.2f}",
+        ])
+    return {'rows': len(cells), 'columns': len(HEADER), 'cells': cells}
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow is not installed; skipping the export benchmark")
+        return
+
+    table_data = make_statement(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "statement")
+
+        def load_csv(path):
+            with open(path, newline='', encoding='utf-8') as f:
+                return list(csv.reader(f))
+
+        def load_json(path):
+            with open(path) as f:
+                return json.load(f)
+
+        cases = [
+            ("csv", DataConverter.to_csv, load_csv),
+            ("json", DataConverter.to_json, load_json),
+            ("parquet", DataConverter.to_parquet, pq.read_table),
+        ]
+        print(f"{args.rows} rows")
+        print(f"{'format':>8}{'size KB':>10}{'write ms':>10}{'load ms':>10}")
+        for name, write, load in cases:
+            path, write_ms = timed(lambda: write(table_data, base))
+            _, load_ms = timed(lambda: load(path))
+            size_kb = os.path.getsize(path) / 1024.0
+            print(f"{name:>8}{size_kb:>10.0f}{write_ms:>10.0f}{load_ms:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Coarse-to-fine table detection benchmark on synthetic A4 pages at 300 and
+600 dpi: detection time and box edge error (pixels, vs. the drawn table) for
+full-resolution detection and for pyramid levels 1-2 with and without edge
+refinement.
+
+Usage (from AI-OCR-Table-Extraction/):
+    python -m benchmarks.bench_multiscale
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Backend.detection.table_detector import TableDetector  # noqa: E402
+
+A4_INCHES = (8.27, 11.69)
+
+
+def make_page(dpi: int):
+    """Grayscale A4 page with one ruled table; returns the page and the
+    exact table box."""
+    w, h = int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi)
+    page = np.full((h, w), 255, dtype=np.uint8)
+    thickness = max(2, dpi // 100)
+    x1, y1, x2, y2 = w // 8, h // 5, w * 7 // 8, h * 3 // 5
+    for y in np.linspace(y1, y2, 15).astype(int):
+        cv2.line(page, (x1, y), (x2, y), 0, thickness)
+    for x in np.linspace(x1, x2, 6).astype(int):
+        cv2.line(page, (x, y1), (x, y2), 0, thickness)
+    for i, y in enumerate(np.linspace(y1, y2, 15).astype(int)[:-1]):
+        cv2.putText(page, f"Row {i} 1,234.56", (x1 + 10, y + (y2 - y1) // 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, dpi / 300, 0, max(1, dpi // 300))
+    # Exact outer extent of the drawn rules (cv2.line grows thickness // 2 each way)
+    half = thickness // 2
+    truth = (x1 - half, y1 - half, x2 + half + 1, y2 + half + 1)
+    return page, truth
+
+
+def edge_error(boxes, truth) -> float:
+    if not boxes:
+        return float("nan")
+    box = max(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]))
+    return float(np.mean(np.abs(np.array(box) - np.array(truth))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, nargs="+", default=[300, 600])
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    modes = [(0, False), (1, False), (1, True), (2, False), (2, True)]
+    print(f"{'dpi':>5}{'levels':>8}{'refine':>8}{'p50 ms':>10}{'edge err px':>13}")
+    for dpi in args.dpi:
+        page, truth = make_page(dpi)
+        for levels, refine in modes:
+            detector = TableDetector(backend="none", pyramid_levels=levels, refine_edges=refine)
+            boxes = detector.detect_tables(page)
+            timings = []
+            for _ in range(args.iterations):
+                t0 = time.perf_counter()
+                detector.detect_tables(page)
+                timings.append(time.perf_counter() - t0)
+            p50 = np.percentile(np.array(timings) * 1000.0, 50)
+            error = edge_error(boxes, truth)
+            print(f"{dpi:>5}{levels:>8}{str(refine):>8}{p50:>10.1f}{error:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+TableStructureAnalyzer scaling benchmark: row clustering and full
+analyze_structure time for synthetic bank-statement tables from 100 to 100k
+words, next to the old list-based clustering and per-word cluster scan (the
+latter only up to --legacy-max words, it is quadratic).
+
+Usage (from AI-OCR-Table-Extraction/):
+    python -m benchmarks.bench_structure
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Backend.structure.table_analyzer import TableStructureAnalyzer  # noqa: E402
+
+COLUMN_X = [40, 160, 420, 560, 700, 840]
+
+
+def make_words(n_words: int, seed: int = 0) -> List[dict]:
+    """Words laid out in 6 columns, one row every 30 px, with a little jitter."""
+    rng = np.random.default_rng(seed)
+    words = []
+    for i in range(n_words):
+        row, col = divmod(i, len(COLUMN_X))
+        x = COLUMN_X[col] + int(rng.integers(-3, 4))
+        y = 30 * row + int(rng.integers(-2, 3))
+        words.append({
+            'bbox': [[x, y], [x + 60, y], [x + 60, y + 14], [x, y + 14]],
+            'text': f"{row}:{col}",
+            'confidence': 0.9
+        })
+    return words
+
+
+def legacy_cluster_coordinates(coords: List[float], threshold: int) -> List[List[float]]:
+    coords = sorted(coords)
+    clusters = []
+    current_cluster = [coords[0]]
+    for coord in coords[1:]:
+        if coord - current_cluster[-1] <= threshold:
+            current_cluster.append(coord)
+        else:
+            clusters.append(current_cluster)
+            current_cluster = [coord]
+    clusters.append(current_cluster)
+    return clusters
+
+
+def legacy_find_cluster_index(value: float, clusters: List[List[float]]) -> Optional[int]:
+    for i, cluster in enumerate(clusters):
+        if min(cluster) <= value <= max(cluster):
+            return i
+    return None
+
+
+def legacy_assign_cells(bboxes, texts, rows, columns):
+    table = [['' for _ in range(len(columns))] for _ in range(len(rows))]
+    for bbox, text in zip(bboxes, texts):
+        row_idx = legacy_find_cluster_index(bbox[0][1], rows)
+        col_idx = legacy_find_cluster_index(bbox[0][0], columns)
+        if row_idx is not None and col_idx is not None:
+            table[row_idx][col_idx] = text
+    return table
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    analyzer = TableStructureAnalyzer()
+    print(f"{'words':>8}{'rows':>8}{'cluster ms':>12}{'legacy cluster ms':>19}"
+          f"{'analyze ms':>12}{'legacy assign ms':>18}")
+    for n in args.sizes:
+        words = make_words(n)
+        table = analyzer.analyze_structure(words)
+        analyze_ms = best_of(lambda: analyzer.analyze_structure(words), args.repeat)
+
+        y_list = [w['bbox'][0][1] for w in words]
+        y_arr = np.array(y_list, dtype=np.float64)
+        cluster_ms = best_of(lambda: analyzer._cluster_coordinates(y_arr, 7.0), args.repeat)
+        legacy_cluster_ms = best_of(lambda: legacy_cluster_coordinates(y_list, 10), args.repeat)
+
+        legacy = "-"
+        if n <= args.legacy_max:
+            bboxes = [w['bbox'] for w in words]
+            texts = [w['text'] for w in words]
+            rows = legacy_cluster_coordinates([b[0][1] for b in bboxes], 10)
+            cols = legacy_cluster_coordinates([b[0][0] for b in bboxes], 10)
+            legacy = f"{best_of(lambda: legacy_assign_cells(bboxes, texts, rows, cols), 1):.1f}"
+        print(f"{n:>8}{table['rows']:>8}{cluster_ms:>12.2f}{legacy_cluster_ms:>19.2f}"
+              f"{analyze_ms:>12.1f}{legacy:>18}")
+
+
+if __name__ == "__main__":
+    main()
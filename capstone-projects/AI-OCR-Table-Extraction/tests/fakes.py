@@ -0,0 +1,81 @@
+"""In-memory stand-ins for the Motor database used by endpoint and job tests."""
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        # Stable sorts from the last key back; None sorts lowest, as in Mongo
+        for key, direction in reversed(keys):
+            self.docs.sort(key=lambda d: (d.get(key) is not None,
+                                          d.get(key) if d.get(key) is not None else 0),
+                           reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return [dict(doc) for doc in self.docs[:length]]
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for endpoint and job tests."""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    def _matches(self, doc, query):
+        for key, condition in query.items():
+            if key == "$or":
+                if not any(self._matches(doc, branch) for branch in condition):
+                    return False
+                continue
+            value = doc.get(key)
+            if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+                for op, operand in condition.items():
+                    if op == "$in" and value not in operand:
+                        return False
+                    if op == "$lt" and not (value is not None and value < operand):
+                        return False
+            elif value != condition:
+                return False
+        return True
+
+    def find(self, query, projection=None):
+        docs = [doc for doc in self.docs if self._matches(doc, query)]
+        if projection:
+            docs = [{k: v for k, v in doc.items() if k == "_id" or projection.get(k)}
+                    for doc in docs]
+        return FakeCursor(docs)
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                return dict(doc)
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                break
+        else:
+            if not upsert:
+                return
+            doc = {**query, **update.get("$setOnInsert", {})}
+            self.docs.append(doc)
+        doc.update(update.get("$set", {}))
+        for key, value in update.get("$addToSet", {}).items():
+            if value not in doc.setdefault(key, []):
+                doc[key].append(value)
+
+
+class FakeDB:
+    def __init__(self, documents=None):
+        self.documents = FakeCollection(documents)
+        self.artifacts = FakeCollection()
@@ -0,0 +1,386 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from Backend.main import app, artifacts
+from tests.fakes import FakeDB
+
+
+@pytest.fixture
+def client():
+    app.mongodb = FakeDB([{
+        '_id': 'doc1',
+        'filename': '거래내역.png',
+        'results': [
+            {'data': {'rows': 2, 'columns': 2, 'cells': [['일자', '금액'], ['2024-01-05', '1,000']]}},
+            {'data': {'rows': 1, 'columns': 1,
+                      'sparse_cells': {'row': [0], 'col': [0], 'text': ['x']}}},
+        ]
+    }])
+    # No context manager: the lifespan (real MongoDB connection) is not run
+    yield TestClient(app)
+    del app.mongodb
+
+
+def test_export_csv_streams_all_tables(client):
+    response = client.get("/export/doc1", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "filename*=UTF-8''%EA%B1%B0%EB%9E%98%EB%82%B4%EC%97%AD.csv" \
+        in response.headers["content-disposition"]
+    assert response.text == "col_0,col_1\n일자,금액\n2024-01-05,\"1,000\"\n\ncol_0\nx\n"
+
+
+def test_export_parquet_single_table(client):
+    pytest.importorskip("pyarrow")
+    import io
+    import pyarrow.parquet as pq
+
+    assert client.get("/export/doc1", params={"format": "parquet"}).status_code == 400
+    response = client.get("/export/doc1", params={"format": "parquet", "table": 0})
+    assert response.status_code == 200
+    assert pq.read_table(io.BytesIO(response.content)).column('금액').to_pylist() == [1000]
+
+
+def test_export_errors(client):
+    assert client.get("/export/doc1", params={"format": "pdf"}).status_code == 400
+    assert client.get("/export/missing").status_code == 404
+    assert client.get("/export/doc1", params={"table": 5}).status_code == 404
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "uploads"))
+    return tmp_path / "data" / "uploads"
+
+
+def test_upload_streams_and_hashes(client, upload_dir):
+    content = os.urandom(3 * 1024 * 1024 + 7)
+    response = client.post("/upload/", files={"file": ("../../scan.png", content, "image/png")})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["filename"] == "scan.png"
+    assert data["size"] == len(content)
+    assert data["sha256"] == hashlib.sha256(content).hexdigest()
+    # Moved into the store; nothing is left in the staging directory
+    with artifacts.local_file(data["sha256"]) as path:
+        with open(path, "rb") as f:
+            assert f.read() == content
+    assert list(upload_dir.iterdir()) == []
+
+    record = [d for d in app.mongodb.documents.docs if str(d["_id"]) == data["document_id"]][0]
+    assert record["status"] == "uploaded" and record["sha256"] == data["sha256"]
+
+
+def store_upload(content, filename, **fields):
+    """Put `content` in the artifact store with a document record, as
+    /upload/ would; returns the record."""
+    blob = asyncio.run(artifacts.put_bytes(app.mongodb, content, name=filename))
+    document = {"_id": ObjectId(), "filename": filename, "status": "uploaded",
+                "sha256": blob["sha256"], "size": blob["size"], **fields}
+    app.mongodb.documents.docs.append(document)
+    return document
+
+
+def test_upload_size_limit(client, upload_dir, monkeypatch):
+    monkeypatch.setattr("Backend.main.MAX_UPLOAD_BYTES", 1024)
+    # Declared size over the limit: refused before the body is parsed
+    response = client.post("/upload/", files={"file": ("big.png", b"x" * 4096, "image/png")})
+    assert response.status_code == 413
+
+    # Chunked body without a length: refused after parsing, nothing kept
+    body = b"x" * 4096
+    boundary = "b0undary"
+    payload = (f"--{boundary}\r\n"
+               f"Content-Disposition: form-data; name=\"file\"; filename=\"big.png\"\r\n"
+               f"Content-Type: image/png\r\n\r\n").encode() \
+        + body + f"\r\n--{boundary}--\r\n".encode()
+    response = client.post("/upload/", content=iter([payload]),
+                           headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 413
+    assert list(upload_dir.iterdir()) == []
+
+
+def test_overloaded_pipeline_returns_retry_after(client, upload_dir, monkeypatch):
+    from Backend.utils.executors import Overloaded
+
+    class Busy:
+        async def submit(self, db, document_id, filename, sha256):
+            raise Overloaded(429, "Processing queue is full - retry later", 3)
+
+    store_upload(b"not an image", "scan.png")
+    monkeypatch.setattr("Backend.main.job_queue", Busy())
+    response = client.post("/process/", params={"filename": "scan.png"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+    assert client.post("/process/", params={"filename": "missing.png"}).status_code == 404
+
+
+def test_process_queues_the_stored_upload(client, upload_dir, monkeypatch):
+    submitted = []
+
+    class Queue:
+        async def submit(self, db, document_id, filename, sha256):
+            submitted.append((document_id, filename, sha256))
+            return {"job_id": str(document_id), "status": "queued"}
+
+    monkeypatch.setattr("Backend.main.job_queue", Queue())
+    old = store_upload(b"old scan", "scan.png", created_at=datetime(2024, 1, 1))
+    new = store_upload(b"new scan", "scan.png", created_at=datetime(2024, 1, 2))
+
+    # By name the latest upload is processed, by document id the one asked for
+    response = client.post("/process/", params={"filename": "scan.png"})
+    assert response.status_code == 202 and response.json()["job_id"] == str(new["_id"])
+    client.post("/process/", params={"filename": "scan.png", "document_id": str(old["_id"])})
+    assert submitted == [(new["_id"], "scan.png", new["sha256"]),
+                         (old["_id"], "scan.png", old["sha256"])]
+
+
+def test_job_status_reads_documents(client):
+    app.mongodb.documents.docs.append({'_id': 'job1', 'filename': 'a.png', 'status': 'processing',
+                                       'stage': 'ocr', 'progress': 0.4})
+    response = client.get("/jobs/job1")
+    assert response.status_code == 200
+    assert response.json()['stage'] == 'ocr' and response.json()['job_id'] == 'job1'
+    assert client.get("/jobs/nope").status_code == 404
+
+
+def test_batch_streams_ndjson_per_file(client, monkeypatch):
+    import io
+    import json
+    import zipfile
+
+    import cv2
+    import numpy as np
+
+    from Backend.utils.executors import PipelineExecutor
+
+    monkeypatch.setattr("Backend.pipeline.stages._HAS_TESSERACT", False)
+    monkeypatch.setattr("Backend.main.pipeline", PipelineExecutor(threads=2, processes=0))
+    ok, png = cv2.imencode(".png", np.full((40, 60), 255, dtype=np.uint8))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("scans/page1.png", png.tobytes())
+        archive.writestr("scans/page2.PNG", png.tobytes())
+        archive.writestr("scans/broken.jpg", b"not an image")
+        archive.writestr("scans/readme.txt", b"skip me")
+        archive.writestr("__MACOSX/scans/._page1.png", b"resource fork")
+
+    response = client.post("/batch",
+                           files={"file": ("scans.zip", buffer.getvalue(), "application/zip")})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    files = {line["filename"]: line for line in lines[:-1]}
+    assert set(files) == {"scans/page1.png", "scans/page2.PNG", "scans/broken.jpg"}
+    assert files["scans/page1.png"]["status"] == "ok"
+    assert files["scans/broken.jpg"]["status"] == "error"
+    assert lines[-1] == {"summary": {"files": 3, "ok": 2, "failed": 1}}
+
+    response = client.post("/batch", files={"file": ("x.zip", b"not a zip", "application/zip")})
+    assert response.status_code == 400
+
+
+def test_batch_releases_archive_and_slot(client, monkeypatch):
+    import io
+    import zipfile
+
+    from fastapi import UploadFile
+
+    from Backend.main import process_batch
+    from Backend.utils.executors import PipelineExecutor
+
+    archives = []
+
+    def open_archive(fileobj):
+        archives.append(zipfile.ZipFile(fileobj))
+        return archives[-1]
+    monkeypatch.setattr("Backend.main.open_archive", open_archive)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("page.png", b"not an image")
+
+    # No free slot: the 429 still closes the archive
+    pipeline = PipelineExecutor(threads=1, processes=0, max_jobs=1, max_queue=0)
+    monkeypatch.setattr("Backend.main.pipeline", pipeline)
+
+    async def busy():
+        async with pipeline.slot():
+            files = {"file": ("x.zip", buffer.getvalue(), "application/zip")}
+            response = await asyncio.to_thread(client.post, "/batch", files=files)
+            assert response.status_code == 429
+    asyncio.run(busy())
+    assert archives[-1].fp is None
+
+    # The client goes away before the body is read: the background task
+    # still releases the slot and the archive
+    async def abandoned():
+        response = await process_batch(UploadFile(io.BytesIO(buffer.getvalue()), filename="x.zip"))
+        assert pipeline.running == 1
+        await response.background()
+        assert pipeline.running == 0
+    asyncio.run(abandoned())
+    assert archives[-1].fp is None
+
+
+def test_extract_runs_in_memory(client, upload_dir, monkeypatch):
+    import cv2
+    import numpy as np
+
+    from Backend.utils.executors import PipelineExecutor
+
+    words = [{'text': text, 'confidence': 90, 'bbox': [x, y, x + 30, y + 12]}
+             for text, x, y in [('Item', 10, 10), ('Qty', 80, 10), ('Pen', 10, 40), ('3', 80, 40)]]
+    monkeypatch.setattr("Backend.pipeline.stages._HAS_TESSERACT", True)
+    monkeypatch.setattr("Backend.pipeline.stages.ocr_image", lambda img: words)
+    monkeypatch.setattr("Backend.main.pipeline", PipelineExecutor(threads=2, processes=0))
+    png = cv2.imencode(".png", np.full((80, 120, 3), 255, dtype=np.uint8))[1].tobytes()
+
+    response = client.post("/extract?detect=false", files={"file": ("scan.png", png, "image/png")})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["word_count"] == 4 and body["document_id"] is None
+    assert body["tables"][0]["data"]["rows"] == 2
+    assert not os.listdir(upload_dir)
+
+    response = client.post("/extract?detect=false&format=csv",
+                           files={"file": ("scan.png", png, "image/png")})
+    assert response.status_code == 200
+    assert response.text.splitlines()[1:] == ["Item,Qty", "Pen,3"]
+
+    response = client.post("/extract?detect=false&persist=true",
+                           files={"file": ("scan.png", png, "image/png")})
+    document_id = response.json()["document_id"]
+    record = app.mongodb.documents.docs[-1]
+    assert str(record["_id"]) == document_id and record["status"] == "completed"
+    assert not os.listdir(upload_dir)
+    stored = client.get(f"/artifacts/{record['sha256']}")
+    assert stored.content == png and stored.headers["etag"] == f'"{record["sha256"]}"'
+    processed = client.get(f"/artifacts/{record['processed_sha256']}")
+    assert processed.status_code == 200 and processed.headers["content-type"] == "image/png"
+
+    assert client.post("/extract",
+                       files={"file": ("x.png", b"nope", "image/png")}).status_code == 400
+    assert client.post("/extract?format=pdf",
+                       files={"file": ("scan.png", png, "image/png")}).status_code == 400
+
+
+def test_download_etag_and_ranges(client, upload_dir):
+    content = bytes(range(256)) * 4
+    processed = asyncio.run(artifacts.put_bytes(app.mongodb, content, content_type="image/png"))
+    store_upload(b"scan", "scan.png", processed_sha256=processed["sha256"])
+
+    response = client.get("/download/scan.png")
+    assert response.status_code == 200 and response.content == content
+    etag = response.headers["etag"]
+    assert etag == f'"{hashlib.sha256(content).hexdigest()}"'
+    assert response.headers["cache-control"] and response.headers["accept-ranges"] == "bytes"
+
+    response = client.get("/download/scan.png", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+
+    response = client.get("/download/scan.png", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206 and response.content == content[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert client.get("/download/scan.png", headers={"Range": "bytes=-4"}).content == content[-4:]
+    assert client.get("/download/scan.png", headers={"Range": "bytes=2000-"}).status_code == 416
+    stale = client.get("/download/scan.png", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200 and stale.content == content
+
+    assert client.get("/download/missing.png").status_code == 404
+    document = client.get("/document/scan.png").json()
+    assert document["size"] == 4 and document["processed_sha256"] == processed["sha256"]
+    assert client.get("/document/missing.png").status_code == 404
+
+
+def test_remote_artifact_streams_ranges(client, tmp_path, monkeypatch):
+    from Backend.storage.artifacts import ArtifactStore
+    from Backend.storage.backends import LocalBackend
+
+    class RemoteBackend(LocalBackend):
+        # Keeps blobs on disk but, like S3, has no local path to send
+        def local_path(self, key):
+            return None
+
+    store = ArtifactStore(RemoteBackend(str(tmp_path)))
+    monkeypatch.setattr("Backend.main.artifacts", store)
+    content = os.urandom(3 * 1024 * 1024)
+    digest = asyncio.run(store.put_bytes(None, content))["sha256"]
+    url = f"/artifacts/{digest}"
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == content
+    assert response.headers["content-length"] == str(len(content))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert client.get(url, headers={"If-None-Match": f'W/"{digest}"'}).status_code == 304
+
+    response = client.get(url, headers={"Range": "bytes=1048570-2097160"})
+    assert response.status_code == 206 and response.content == content[1048570:2097161]
+    assert response.headers["content-range"] == f"bytes 1048570-2097160/{len(content)}"
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200 and len(stale.content) == len(content)
+    assert client.get(url, headers={"Range": "bytes=4000000-"}).status_code == 416
+    assert client.get(f"/artifacts/{'0' * 64}").status_code == 404
+
+
+def test_documents_keyset_pagination(client):
+    from datetime import datetime, timedelta
+
+    from bson import ObjectId
+
+    base = datetime(2024, 1, 1)
+    ids = sorted(ObjectId() for _ in range(6))
+    docs = [{'_id': ids[i], 'filename': f'{i}.png', 'user_id': 'u1', 'status': status,
+             'created_at': base + timedelta(minutes=minute), 'results': [1]}
+            for i, (minute, status) in enumerate([(0, 'completed'), (1, 'failed'), (1, 'completed'),
+                                                  (2, 'queued'), (3, 'completed')])]
+    docs.append({'_id': ids[5], 'filename': 'other.png', 'user_id': 'u2', 'status': 'completed',
+                 'created_at': base})
+    app.mongodb.documents.docs.extend(docs)
+
+    seen, cursor = [], None
+    while True:
+        params = {'user_id': 'u1', 'limit': 2, **({'cursor': cursor} if cursor else {})}
+        page = client.get("/documents/", params=params).json()
+        seen += [d['filename'] for d in page['documents']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == ['4.png', '3.png', '2.png', '1.png', '0.png']
+
+    page = client.get("/documents/", params={'user_id': 'u1', 'status': ['completed', 'failed'],
+                                             'fields': 'filename,status'}).json()
+    assert [d['filename'] for d in page['documents']] == ['4.png', '2.png', '1.png', '0.png']
+    assert set(page['documents'][0]) == {'document_id', 'filename', 'status', 'created_at'}
+
+    assert client.get("/documents/", params={'cursor': 'garbage'}).status_code == 400
+    assert client.get("/documents/", params={'fields': 'password'}).status_code == 400
+    assert client.get("/documents/", params={'limit': 0}).status_code == 400
+
+
+def test_upload_is_deduplicated_in_artifact_store(client, upload_dir):
+    content = b"same scan"
+    first = client.post("/upload/", files={"file": ("a.png", content, "image/png")}).json()
+    client.post("/upload/", files={"file": ("b.png", content, "image/png")})
+
+    digest = first["sha256"]
+    blob = upload_dir.parent / "artifacts" / digest[:2] / digest[2:4] / digest
+    assert blob.read_bytes() == content
+    # The second copy was dropped, and no flat copies were kept
+    assert list(upload_dir.iterdir()) == []
+    assert app.mongodb.artifacts.docs == [{
+        '_id': digest, 'key': f"{digest[:2]}/{digest[2:4]}/{digest}", 'backend': 'local', 'size': 9,
+        'content_type': 'image/png', 'created_at': app.mongodb.artifacts.docs[0]['created_at'],
+        'last_used_at': app.mongodb.artifacts.docs[0]['last_used_at'], 'names': ['a.png', 'b.png']
+    }]
+
+    response = client.get(f"/artifacts/{digest}", headers={"If-None-Match": f'"{digest}"'})
+    assert response.status_code == 304 and "immutable" in response.headers["cache-control"]
+    assert client.get("/artifacts/" + "0" * 64).status_code == 404
+    assert client.get("/artifacts/..%2Fsecret").status_code in (400, 404)
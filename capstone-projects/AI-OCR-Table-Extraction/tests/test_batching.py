@@ -0,0 +1,164 @@
+import threading
+import time
+import pytest
+import numpy as np
+from Backend.ocr.batching import MicroBatcher
+from Backend.ocr.ocr_engine import OCREngine
+
+
+def test_results_scattered_in_order():
+    seen_batches = []
+
+    def batch_fn(items):
+        seen_batches.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(i) for i in range(10)]
+        assert [f.result(timeout=5) for f in futures] == [i * 2 for i in range(10)]
+    finally:
+        batcher.close()
+
+    assert max(seen_batches) <= 4
+    assert sum(seen_batches) == 10
+    assert len(seen_batches) < 10  # items were actually grouped
+
+
+def test_concurrent_callers_share_batches():
+    barrier = threading.Barrier(8)
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=200)
+    results = {}
+
+    def caller(i):
+        barrier.wait()
+        results[i] = batcher(i, timeout=5)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert results == {i: i for i in range(8)}
+    assert len(sizes) < 8
+
+
+def test_batch_failure_propagates():
+    def batch_fn(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            batcher.submit(1).result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_close_waits_for_submit_in_progress():
+    batcher = MicroBatcher(lambda items: items, max_wait_ms=1)
+    put = batcher._queue.put
+
+    def slow_put(entry):
+        # Widen the window between a submit's closed check and its put
+        if isinstance(entry, tuple):
+            time.sleep(0.2)
+        put(entry)
+    batcher._queue.put = slow_put
+
+    futures = []
+    caller = threading.Thread(target=lambda: futures.append(batcher.submit(1)))
+    caller.start()
+    time.sleep(0.05)
+    batcher.close()
+    caller.join()
+
+    # The accepted item is answered, not stranded behind the stop marker
+    assert futures[0].result(timeout=1) == 1
+    with pytest.raises(RuntimeError):
+        batcher.submit(2)
+
+
+@pytest.mark.asyncio
+async def test_submit_async():
+    batcher = MicroBatcher(lambda items: [x + 1 for x in items], max_wait_ms=1)
+    try:
+        assert await batcher.submit_async(41) == 42
+    finally:
+        batcher.close()
+
+
+def test_process_images_matches_single():
+    engine = OCREngine()
+    images = [np.ones((60, 200), dtype=np.uint8) * 255 for _ in range(3)]
+    batched = engine.process_images(images)
+    assert len(batched) == 3
+    for image, results in zip(images, batched):
+        assert len(results) == len(engine.process_image(image))
+
+
+def test_concurrent_requests_share_one_ocr_batch(monkeypatch):
+    import asyncio
+
+    import cv2
+    import httpx
+
+    from Backend.main import app
+    from Backend.pipeline import stages
+    from Backend.utils.executors import PipelineExecutor
+    from tests.fakes import FakeDB
+
+    sizes = []
+
+    class BatchedEngine:
+        batched = True
+
+        def process_images(self, images):
+            sizes.append(len(images))
+            box = [[5, 5], [20, 5], [20, 15], [5, 15]]
+            return [[{'text': 'x', 'confidence': 0.9, 'bbox': box}] for _ in images]
+
+    # Neural OCR is batched even without Tesseract
+    monkeypatch.setattr("Backend.pipeline.stages._HAS_TESSERACT", False)
+    monkeypatch.setattr("Backend.main.pipeline",
+                        PipelineExecutor(threads=4, processes=0, max_jobs=4))
+    app.mongodb = FakeDB()
+    assert stages.start_batchers(max_batch_size=8, max_wait_ms=500, ocr_engine=BatchedEngine())
+    png = cv2.imencode(".png", np.full((40, 60, 3), 255, dtype=np.uint8))[1].tobytes()
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/extract?detect=false", files={"file": (f"{i}.png", png, "image/png")})
+                for i in range(2)])
+
+    try:
+        responses = asyncio.run(main())
+    finally:
+        stages.stop_batchers()
+        del app.mongodb
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert all(r.json()["word_count"] == 1 for r in responses)
+    assert sizes == [2]
+
+
+def test_tesseract_is_not_batched(monkeypatch):
+    from Backend.pipeline import stages
+
+    class TesseractOnly:
+        batched = False
+
+    monkeypatch.setattr("Backend.pipeline.stages._get_detector",
+                        lambda: type("Detector", (), {"use_yolo": False})())
+    assert not stages.start_batchers(ocr_engine=TesseractOnly())
+    assert not stages.batching()
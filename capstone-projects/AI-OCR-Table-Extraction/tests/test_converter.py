@@ -58,4 +58,120 @@ def test_to_json(tmp_path, sample_table_data):
     # Verify content
     with open(json_path, 'r') as f:
         data = json.load(f)
-    assert data == sample_table_data
\ No newline at end of file
+    assert data == sample_table_data
+
+def test_sparse_table_export(tmp_path, sample_table_data):
+    converter = DataConverter()
+    sparse_table = {
+        'rows': 2,
+        'columns': 2,
+        'sparse_cells': {'row': [0, 0, 1, 1], 'col': [0, 1, 0, 1],
+                         'text': ['Header 1', 'Header 2', 'Data 1', 'Data 2']}
+    }
+    csv_path = converter.to_csv(sparse_table, os.path.join(tmp_path, "sparse"))
+    df = pd.read_csv(csv_path)
+    assert df.shape == (2, 2)
+    assert df.iloc[1, 1] == 'Data 2'
+
+    json_path = converter.to_json(sparse_table, os.path.join(tmp_path, "sparse"))
+    with open(json_path, 'r') as f:
+        assert json.load(f) == sparse_table
+
+def test_write_csv_streams_rows():
+    import io
+
+    def rows():
+        for i in range(1000):
+            yield [f"row {i}", f"{i},000"]
+
+    stream = io.StringIO()
+    count = DataConverter.write_csv(rows(), stream, header=['col_0', 'col_1'])
+    assert count == 1000
+    stream.seek(0)
+    df = pd.read_csv(stream)
+    assert df.shape == (1000, 2)
+    assert df.iloc[999, 1] == '999,000'
+
+def test_iter_csv_chunks(sample_table_data):
+    chunks = list(DataConverter.iter_csv(sample_table_data['cells'], header=['col_0', 'col_1'],
+                                         chunk_rows=1))
+    assert len(chunks) == 2
+    assert ''.join(chunks) == "col_0,col_1\nHeader 1,Header 2\nData 1,Data 2\n"
+
+def test_csv_export_does_not_import_pandas(tmp_path):
+    import subprocess
+    import sys
+    code = (
+        "import sys\n"
+        "from Backend.converter.data_converter import DataConverter\n"
+        "DataConverter.to_csv({'rows': 1, 'columns': 1, 'cells': [['x']]},\n"
+        f"                     {str(tmp_path / 'out')!r})\n"
+        "print('pandas' in sys.modules)\n"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+    assert out.stdout.strip() == "False", out.stderr
+
+def test_to_arrow_infers_column_types(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from decimal import Decimal
+    table_data = {'cells': [
+        ['거래일자', '적요', '출금액', '이율', '메모'],
+        ['2024.01.05', '입금', '1,234,000', '1.5', ''],
+        ['2024년 1월 6일', '출금', '(5,000)', '.25', ''],
+        ['2024/1/7', '수수료', '△300원', '-2.125', ''],
+    ]}
+    table = DataConverter.to_arrow(table_data)
+    assert table.schema.types == [pa.date32(), pa.string(), pa.int64(), pa.decimal128(38, 3),
+                                  pa.string()]
+    assert table.column('출금액').to_pylist() == [1234000, -5000, -300]
+    assert table.column('이율').to_pylist()[2] == Decimal('-2.125')
+    assert table.column('메모').null_count == 3
+
+    # Hyphenated text that is neither a date nor a number stays text
+    mixed = DataConverter.to_arrow({'cells': [['a'], ['2024-13-45'], ['x']]})
+    assert mixed.schema.types == [pa.string()]
+
+    path = DataConverter.to_parquet(table_data, str(tmp_path / "out"))
+    assert pq.read_table(path).equals(table)
+
+def test_to_arrow_keeps_misreads_as_text():
+    pa = pytest.importorskip("pyarrow")
+    table = DataConverter.to_arrow({'cells': [
+        ['일자', '윤년', '금액', '코드', '이율'],
+        ['2024-04-31', '2023-02-29', '1234567890123456789012345678901234', '0012', '0.5'],
+        ['2024-05-01', '2024-02-29', '.12345', '0345', '12'],
+    ]})
+    # Impossible days are not rolled forward, 39 digits do not fit a
+    # decimal128 and leading-zero codes are not numbers
+    assert table.schema.types == [pa.string(), pa.string(), pa.string(), pa.string(),
+                                  pa.decimal128(38, 1)]
+    assert table.column('일자').to_pylist() == ['2024-04-31', '2024-05-01']
+    assert table.column('코드').to_pylist() == ['0012', '0345']
+
+def test_excel_workbook_one_sheet_per_table(tmp_path, sample_table_data):
+    from openpyxl import load_workbook
+    sparse = {'rows': 2, 'columns': 2, 'sparse_cells': {'row': [1], 'col': [1], 'text': ['x']}}
+    streamed = ([str(i), f"{i * 10:,}"] for i in range(1000))
+    path = DataConverter.to_excel_workbook(
+        [sample_table_data, sparse, streamed], str(tmp_path / "doc"),
+        sheet_names=['Page 1/2', 'Page 1/2'])
+
+    workbook = load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ['Page 1_2', 'Page 1_2 (2)', 'Table 3']
+    assert list(workbook['Page 1_2 (2)'].values) == [('col_0', 'col_1'), (None, None), (None, 'x')]
+    rows = list(workbook['Table 3'].values)
+    assert len(rows) == 1000 and rows[-1] == ('999', '9,990')
+
+def test_serialization_numpy_and_ndjson(tmp_path):
+    import numpy as np
+    from Backend.utils import serialization
+    words = [{'text': '합계', 'bbox': np.array([[0, 0], [10, 0], [10, 5], [0, 5]]),
+              'confidence': np.float32(0.5), 'row': np.int64(3)}]
+    assert serialization.loads(serialization.dumps(words)) == [
+        {'text': '합계', 'bbox': [[0, 0], [10, 0], [10, 5], [0, 5]], 'confidence': 0.5, 'row': 3}]
+
+    path = DataConverter.to_ndjson({'cells': [['a', 'b'], ['1', '']]}, str(tmp_path / "rows"))
+    with open(path, 'rb') as f:
+        assert [serialization.loads(line) for line in f] == [['a', 'b'], ['1', '']]
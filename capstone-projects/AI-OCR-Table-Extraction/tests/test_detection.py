@@ -0,0 +1,177 @@
+import pytest
+import numpy as np
+import cv2
+from Backend.detection.table_detector import TableDetector
+from Backend.detection.onnx_backend import letterbox, decode_yolo_output
+from Backend.detection.grid_detector import detect_grid_tables
+from Backend.detection.box_ops import nms, contained_mask, dedupe_boxes
+
+
+@pytest.fixture
+def table_page():
+    # White page with a single ruled 3x4 table
+    img = np.ones((600, 800, 3), dtype=np.uint8) * 255
+    for y in (100, 200, 300, 400):
+        cv2.line(img, (100, y), (700, y), (0, 0, 0), 2)
+    for x in (100, 300, 500, 700):
+        cv2.line(img, (x, 100), (x, 400), (0, 0, 0), 2)
+    return img
+
+
+def test_letterbox_fixed_size():
+    img = np.zeros((300, 600, 3), dtype=np.uint8)
+    padded, scale, (pad_x, pad_y) = letterbox(img, 640)
+    assert padded.shape == (640, 640, 3)
+    assert scale == pytest.approx(640 / 600)
+    assert pad_x == 0
+    assert pad_y == (640 - 320) // 2
+
+
+def test_decode_yolo_output_maps_back_to_image():
+    img_shape = (300, 600)
+    _, scale, pad = letterbox(np.zeros(img_shape + (3,), dtype=np.uint8), 640)
+
+    # One anchor covering (60, 30)-(540, 270) in original coordinates, plus
+    # a low-confidence anchor that must be dropped.
+    x1, y1, x2, y2 = np.array([60, 30, 540, 270]) * scale + np.array([pad[0], pad[1]] * 2)
+    output = np.zeros((1, 5, 2), dtype=np.float32)
+    output[0, :, 0] = [(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0.9]
+    output[0, :, 1] = [10, 10, 5, 5, 0.01]
+
+    boxes = decode_yolo_output(output, scale, pad, img_shape)
+    assert len(boxes) == 1
+    assert boxes[0] == pytest.approx((60, 30, 540, 270), abs=1)
+
+
+def test_backend_none_uses_fallback(table_page):
+    detector = TableDetector(backend="none")
+    assert detector.backend is None
+    boxes = detector.detect_tables(table_page)
+    assert len(boxes) >= 1
+    assert all(len(box) == 4 for box in boxes)
+
+
+def test_auto_backend_falls_back_to_torch_on_broken_onnx(tmp_path, monkeypatch):
+    monkeypatch.setattr("Backend.detection.table_detector._HAS_ORT", True)
+    monkeypatch.setattr(TableDetector, "_load_torch", staticmethod(lambda path: "torch-model"))
+    (tmp_path / "model.onnx").write_bytes(b"not a model")
+    detector = TableDetector(model_path=str(tmp_path / "model.pt"), backend="auto")
+    assert detector.backend == "torch" and detector.model == "torch-model"
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        TableDetector(backend="tensorrt")
+
+
+def test_grid_detector_finds_cells(table_page):
+    tables = detect_grid_tables(table_page)
+    assert len(tables) == 1
+    x1, y1, x2, y2 = tables[0]['bbox']
+    assert abs(x1 - 100) <= 3 and abs(y1 - 100) <= 3 and abs(x2 - 700) <= 5 and abs(y2 - 400) <= 5
+    assert tables[0]['row_boundaries'] == pytest.approx([100, 200, 300, 400], abs=2)
+    assert tables[0]['col_boundaries'] == pytest.approx([100, 300, 500, 700], abs=2)
+
+
+def test_grid_detector_borderless_table():
+    # Only the inner rules are drawn; the outer edges come from the line extents
+    img = np.ones((600, 800), dtype=np.uint8) * 255
+    for y in (200, 300):
+        cv2.line(img, (100, y), (700, y), 0, 2)
+    for x in (300, 500):
+        cv2.line(img, (x, 100), (x, 400), 0, 2)
+    tables = detect_grid_tables(img)
+    assert len(tables) == 1
+    assert len(tables[0]['row_boundaries']) == 4
+    assert len(tables[0]['col_boundaries']) == 4
+
+
+def test_grid_detector_ignores_plain_text():
+    img = np.ones((400, 600), dtype=np.uint8) * 255
+    cv2.putText(img, "No table here", (50, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
+    assert detect_grid_tables(img) == []
+
+
+def test_detect_tables_with_grid(table_page):
+    tables = TableDetector(backend="none").detect_tables_with_grid(table_page)
+    assert len(tables) == 1
+    assert len(tables[0]['row_boundaries']) == 4
+
+
+def test_detect_tables_with_grid_searches_unruled_page_once(monkeypatch):
+    import Backend.detection.table_detector as table_detector
+
+    calls = []
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return detect_grid_tables(*args, **kwargs)
+
+    monkeypatch.setattr(table_detector, "detect_grid_tables", counting)
+    img = np.ones((400, 600, 3), dtype=np.uint8) * 255
+    cv2.putText(img, "No table here", (50, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    tables = TableDetector(backend="none").detect_tables_with_grid(img)
+    assert len(calls) == 1
+    assert tables and all(t['row_boundaries'] == [] for t in tables)
+
+
+def test_coarse_to_fine_matches_full_resolution():
+    # 300 dpi A4 page; rules 4 px thick, so the outer table edge is at 298/698
+    img = np.ones((3508, 2480), dtype=np.uint8) * 255
+    for y in range(700, 2301, 200):
+        cv2.line(img, (300, y), (2200, y), 0, 4)
+    for x in (300, 1000, 1600, 2200):
+        cv2.line(img, (x, 700), (x, 2300), 0, 4)
+
+    boxes = TableDetector(backend="none", pyramid_levels=2).detect_tables(img)
+    assert len(boxes) == 1
+    assert boxes[0] == pytest.approx((298, 698, 2203, 2303), abs=1)
+
+
+def test_dedupe_collapses_nested_and_duplicate_boxes():
+    boxes = [
+        (100, 100, 700, 400),   # outer table border
+        (110, 110, 690, 390),   # inner rectangle of the same table
+        (300, 200, 500, 300),   # a cell
+        (100, 100, 700, 400),   # exact duplicate
+        (100, 500, 700, 580),   # a separate table below
+    ]
+    assert contained_mask(boxes).tolist() == [False, True, True, True, False]
+    assert dedupe_boxes(boxes) == [(100, 100, 700, 400), (100, 500, 700, 580)]
+
+
+def test_nms_prefers_higher_scores():
+    boxes = [(0, 0, 100, 100), (5, 5, 105, 105), (200, 200, 300, 300)]
+    keep = nms(boxes, scores=[0.5, 0.9, 0.8], iou_threshold=0.5)
+    assert keep.tolist() == [1, 2]
+
+
+def test_nms_matches_full_matrix_in_linear_memory():
+    import tracemalloc
+    from Backend.detection.box_ops import pairwise_iou
+
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 2000, size=(3000, 2))
+    boxes = np.hstack([xy, xy + rng.uniform(20, 200, size=(3000, 2))])
+    scores = rng.uniform(size=3000)
+
+    tracemalloc.start()
+    keep = nms(boxes, scores, iou_threshold=0.45)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # A 3000 x 3000 float64 IoU matrix alone is 72 MB
+    assert peak < 5 * 1024 * 1024
+
+    order = np.argsort(-scores, kind="stable")
+    iou = pairwise_iou(boxes[order], boxes[order])
+    suppressed = np.zeros(len(order), dtype=bool)
+    expected = []
+    for i in range(len(order)):
+        if not suppressed[i]:
+            expected.append(order[i])
+            suppressed |= iou[i] > 0.45
+    assert keep.tolist() == expected
+
+
+def test_dedupe_empty():
+    assert dedupe_boxes([]) == []
@@ -0,0 +1,88 @@
+import asyncio
+import math
+
+import pytest
+
+from Backend.utils.executors import Overloaded, PipelineExecutor
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_run_thread_and_process():
+    async def main():
+        executor = PipelineExecutor(threads=2, processes=1, max_jobs=2)
+        try:
+            async with executor.slot():
+                assert await executor.run_thread(sum, [1, 2, 3]) == 6
+                assert await executor.run_process(math.factorial, 10) == 3628800
+        finally:
+            executor.shutdown()
+    run(main())
+
+
+def test_queue_full_is_refused_with_429():
+    async def main():
+        executor = PipelineExecutor(threads=1, processes=0, max_jobs=1, max_queue=1, retry_after=7)
+        release = asyncio.Event()
+
+        async def job():
+            async with executor.slot():
+                await release.wait()
+
+        running = asyncio.ensure_future(job())
+        queued = asyncio.ensure_future(job())
+        await settle()
+        assert executor.running == 1 and executor.waiting == 1
+
+        with pytest.raises(Overloaded) as exc:
+            async with executor.slot():
+                pass
+        assert exc.value.status_code == 429 and exc.value.retry_after == 7
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert executor.running == 0 and executor.waiting == 0
+        executor.shutdown()
+    run(main())
+
+
+def test_queue_timeout_is_503():
+    async def main():
+        executor = PipelineExecutor(threads=1, processes=0, max_jobs=1, max_queue=5,
+                                    queue_timeout=0.05)
+        async with executor.slot():
+            with pytest.raises(Overloaded) as exc:
+                async with executor.slot():
+                    pass
+        assert exc.value.status_code == 503
+        assert executor.waiting == 0
+        executor.shutdown()
+    run(main())
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def main():
+        executor = PipelineExecutor(threads=1, processes=0, max_jobs=1, max_queue=4)
+        never = asyncio.Event()
+
+        async def job():
+            async with executor.slot():
+                await never.wait()
+
+        tasks = [asyncio.ensure_future(job()) for _ in range(3)]
+        await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert executor.running == 0 and executor.waiting == 0
+        async with executor.slot():
+            pass
+        executor.shutdown()
+    run(main())
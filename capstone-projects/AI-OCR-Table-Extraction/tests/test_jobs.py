@@ -0,0 +1,125 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from Backend.pipeline.jobs import JobQueue
+from Backend.storage.artifacts import ArtifactStore
+from Backend.storage.backends import LocalBackend
+from Backend.utils.executors import Overloaded, PipelineExecutor
+from tests.fakes import FakeDB
+
+
+class RecordingWS:
+    def __init__(self):
+        self.messages = []
+
+    async def broadcast_status(self, document_id, status, progress=None, stage=None):
+        self.messages.append((document_id, status, stage, progress))
+
+
+def fake_words(path):
+    return [
+        {'text': '일자', 'confidence': 90, 'bbox': [10, 10, 50, 20]},
+        {'text': '금액', 'confidence': 90, 'bbox': [200, 10, 240, 20]},
+        {'text': '1/5', 'confidence': 90, 'bbox': [10, 40, 40, 50]},
+        {'text': '1,000', 'confidence': 90, 'bbox': [200, 40, 250, 50]},
+    ]
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    """An artifact store holding the uploads, and their sha256 by filename."""
+    store = ArtifactStore(LocalBackend(str(tmp_path / "artifacts")))
+    png = cv2.imencode(".png", np.full((60, 300), 255, dtype=np.uint8))[1].tobytes()
+    digests = {}
+    for filename, content in [("scan.png", png), ("broken.png", b"not an image")]:
+        digests[filename] = asyncio.run(store.put_bytes(None, content))["sha256"]
+    return store, digests
+
+
+def make_queue(uploads, **kwargs):
+    executor = PipelineExecutor(threads=2, processes=0)
+    return JobQueue(executor, RecordingWS(), store=uploads[0], **kwargs)
+
+
+def test_job_runs_stages_and_records_results(uploads, monkeypatch):
+    monkeypatch.setattr("Backend.pipeline.stages._HAS_TESSERACT", True)
+    monkeypatch.setattr("Backend.pipeline.jobs.tesseract_words", fake_words)
+    db = FakeDB()
+    queue = make_queue(uploads)
+
+    async def main():
+        job = await queue.submit(db, "doc1", "scan.png", uploads[1]["scan.png"])
+        assert job == {"job_id": "doc1", "status": "queued"}
+        await queue._queue.join()
+        await queue.stop()
+    asyncio.run(main())
+
+    doc = db.documents.docs[0]
+    assert doc["status"] == "completed" and doc["progress"] == 1.0
+    assert doc["results"][0]["data"]["cells"] == [['일자', '금액'], ['1/5', '1,000']]
+    # The processed image went to the store, not next to the upload
+    assert uploads[0].local_path(doc["processed_sha256"]) is not None
+    assert db.artifacts.docs[0]["names"] == ["scan.png.png"]
+    stages = [m[2] for m in queue.ws_manager.messages]
+    assert stages == [None, "preprocess", "ocr", "structure", None]
+    assert queue.ws_manager.messages[-1][1] == "completed"
+
+
+def test_failed_job_records_error(uploads):
+    db = FakeDB()
+    queue = make_queue(uploads)
+
+    async def main():
+        await queue.submit(db, "doc2", "broken.png", uploads[1]["broken.png"])
+        await queue._queue.join()
+        await queue.stop()
+    asyncio.run(main())
+
+    doc = db.documents.docs[0]
+    assert doc["status"] == "failed" and doc["error"] == "Could not read image"
+
+
+def test_full_queue_is_refused(uploads):
+    queue = make_queue(uploads, workers=1, max_pending=1)
+    digest = uploads[1]["scan.png"]
+
+    async def main():
+        queue.start()
+        # Without a running worker, submitted jobs stay queued
+        for task in queue._tasks:
+            task.cancel()
+        await asyncio.gather(*queue._tasks, return_exceptions=True)
+        await queue.submit(None, "a", "scan.png", digest)
+        with pytest.raises(Overloaded) as exc:
+            await queue.submit(None, "b", "scan.png", digest)
+        assert exc.value.status_code == 429
+    asyncio.run(main())
+
+
+def test_concurrent_submits_cannot_overflow_queue(uploads):
+    queue = make_queue(uploads, workers=1, max_pending=1)
+    digest = uploads[1]["scan.png"]
+    db = FakeDB()
+    update_one = db.documents.update_one
+
+    async def slow_update_one(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return await update_one(*args, **kwargs)
+    db.documents.update_one = slow_update_one
+
+    async def main():
+        queue.start()
+        for task in queue._tasks:
+            task.cancel()
+        await asyncio.gather(*queue._tasks, return_exceptions=True)
+        # Both submits are writing their record when the second one checks
+        results = await asyncio.gather(queue.submit(db, "a", "scan.png", digest),
+                                       queue.submit(db, "b", "scan.png", digest),
+                                       return_exceptions=True)
+        assert results[0] == {"job_id": "a", "status": "queued"}
+        assert isinstance(results[1], Overloaded) and results[1].status_code == 429
+        assert queue.pending == 1
+    asyncio.run(main())
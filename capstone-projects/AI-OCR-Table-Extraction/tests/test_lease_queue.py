@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import pytest
+
+from Backend.pipeline.lease_queue import LeaseQueue
+from Backend.storage.artifacts import ArtifactStore
+from Backend.storage.backends import LocalBackend
+
+DIGEST = "0" * 64
+
+
+@pytest.fixture
+def db():
+    """An in-memory stand-in (mongomock) if installed, else a local mongod."""
+    try:
+        import mongomock
+        yield mongomock.MongoClient()["ai_ocr_test_jobs"]
+        return
+    except ImportError:
+        pass
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+    client = MongoClient("mongodb://localhost:27017", serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("needs mongomock or a local mongod")
+    client.drop_database("ai_ocr_test_jobs")
+    yield client["ai_ocr_test_jobs"]
+    client.drop_database("ai_ocr_test_jobs")
+    client.close()
+
+
+def test_claim_is_exclusive_and_in_order(db):
+    queue = LeaseQueue(db.jobs)
+    first = queue.enqueue("doc1", "a.png", DIGEST)
+    queue.enqueue("doc2", "b.png", DIGEST)
+
+    job_a = queue.claim("worker-a")
+    job_b = queue.claim("worker-b")
+    assert job_a["_id"] == first and job_a["lease_owner"] == "worker-a"
+    assert job_b["document_id"] == "doc2"
+    assert queue.claim("worker-c") is None
+
+    assert queue.complete(job_a, "worker-a")
+    assert db.jobs.find_one({"_id": first})["status"] == "done"
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_fenced(db):
+    queue = LeaseQueue(db.jobs, lease_seconds=60)
+    queue.enqueue("doc1", "a.png", DIGEST)
+    job = queue.claim("worker-a")
+    assert queue.heartbeat(job, "worker-a")
+
+    # worker-a stops heartbeating: let its lease run out
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    db.jobs.update_one({"_id": job["_id"]}, {"$set": {"lease_expires": expired}})
+    taken = queue.claim("worker-b")
+    assert taken["_id"] == job["_id"] and taken["attempts"] == 2
+
+    assert not queue.heartbeat(job, "worker-a")
+    assert not queue.complete(job, "worker-a")
+    assert queue.complete(taken, "worker-b")
+
+
+def test_failures_retry_with_backoff_then_fail(db):
+    queue = LeaseQueue(db.jobs, retry_delay=30)
+    queue.enqueue("doc1", "a.png", DIGEST, max_attempts=2)
+
+    job = queue.claim("w")
+    assert queue.fail(job, "w", "boom")
+    stored = db.jobs.find_one({"_id": job["_id"]})
+    assert stored["status"] == "queued"
+    assert stored["available_at"] > datetime.utcnow() + timedelta(seconds=20)
+    assert queue.claim("w") is None  # not due yet
+
+    db.jobs.update_one({"_id": job["_id"]}, {"$set": {"available_at": datetime.utcnow()}})
+    job = queue.claim("w")
+    assert job["attempts"] == 2
+    assert queue.fail(job, "w", "boom again")
+    stored = db.jobs.find_one({"_id": job["_id"]})
+    assert stored["status"] == "failed" and stored["error"] == "boom again"
+
+
+def test_dead_workers_exhaust_attempts(db):
+    from Backend.pipeline.worker import Worker
+    db.documents.insert_one({"_id": "doc1", "filename": "a.png", "status": "processing"})
+    worker = Worker(db, owner="w2")
+    queue = worker.queue
+    queue.enqueue("doc1", "a.png", DIGEST, max_attempts=1)
+    job = queue.claim("w")
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    db.jobs.update_one({"_id": job["_id"]}, {"$set": {"lease_expires": expired}})
+
+    # The claim gives up on the job instead of running it a second time
+    assert worker.run_once()
+    assert db.jobs.find_one({"_id": job["_id"]})["status"] == "failed"
+    document = db.documents.find_one({"_id": "doc1"})
+    assert document["status"] == "failed" and document["error"] == "Lease expired too many times"
+    assert queue.claim("w3") is None
+
+
+def test_worker_processes_job(db, tmp_path, monkeypatch):
+    from Backend.pipeline.worker import Worker
+    monkeypatch.setattr("Backend.pipeline.stages._HAS_TESSERACT", False)
+    store = ArtifactStore(LocalBackend(str(tmp_path / "artifacts")))
+    upload = tmp_path / "scan.png"
+    cv2.imwrite(str(upload), np.full((40, 40), 255, dtype=np.uint8))
+    digest = store.ingest_file(str(upload))["sha256"]
+
+    db.documents.insert_one({"_id": "doc1", "filename": "scan.png", "status": "queued"})
+    worker = Worker(db, owner="w", store=store)
+    worker.queue.enqueue("doc1", "scan.png", digest)
+    assert worker.run_once()
+    assert not worker.run_once()
+
+    document = db.documents.find_one({"_id": "doc1"})
+    assert document["status"] == "completed"
+    assert db.jobs.find_one({"document_id": "doc1"})["status"] == "done"
+    assert store.local_path(document["processed_sha256"]) is not None
+    assert db.artifacts.find_one({"_id": document["processed_sha256"]})["names"] == ["scan.png.png"]
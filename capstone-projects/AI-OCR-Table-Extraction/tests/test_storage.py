@@ -0,0 +1,100 @@
+import asyncio
+import os
+
+import pytest
+
+from Backend.storage.artifacts import ArtifactStore, check_digest
+from Backend.storage.backends import LocalBackend, S3Backend, shard_key
+
+
+def test_shard_key():
+    digest = "ab" + "cd" + "e" * 60
+    assert shard_key(digest) == f"ab/cd/{digest}"
+
+
+def test_local_backend_dedups_and_moves(tmp_path):
+    backend = LocalBackend(str(tmp_path / "store"))
+    assert backend.put_bytes("aa/bb/x", b"one") is True
+    assert backend.put_bytes("aa/bb/x", b"one") is False
+    assert backend.get_bytes("aa/bb/x") == b"one"
+
+    source = tmp_path / "upload.png"
+    source.write_bytes(b"two")
+    assert backend.put_file("cc/dd/y", str(source), keep=False) is True
+    assert not source.exists() and backend.get_bytes("cc/dd/y") == b"two"
+
+    duplicate = tmp_path / "again.png"
+    duplicate.write_bytes(b"two")
+    assert backend.put_file("cc/dd/y", str(duplicate), keep=False) is False
+    assert not duplicate.exists()
+    assert sorted(os.listdir(tmp_path / "store")) == ["aa", "cc"]
+
+
+def test_store_hashes_and_validates(tmp_path):
+    store = ArtifactStore(LocalBackend(str(tmp_path)))
+
+    async def main():
+        meta = await store.put_bytes(None, b"data", content_type="text/plain")
+        again = await store.put_bytes(None, b"data")
+        assert meta["deduplicated"] is False and again["deduplicated"] is True
+        assert await store.get_bytes(meta["sha256"]) == b"data"
+        return meta
+
+    meta = asyncio.run(main())
+    assert store.local_path(meta["sha256"]).endswith(meta["sha256"])
+    with pytest.raises(ValueError):
+        check_digest("../../etc/passwd")
+
+
+@pytest.fixture
+def s3_backend():
+    """An in-memory S3 stand-in (moto) if installed, else a server such as
+    MinIO at ARTIFACT_TEST_S3_ENDPOINT_URL."""
+    boto3 = pytest.importorskip("boto3")
+    try:
+        from moto import mock_s3
+    except ImportError:
+        endpoint = os.getenv("ARTIFACT_TEST_S3_ENDPOINT_URL")
+        if not endpoint:
+            pytest.skip("needs moto or ARTIFACT_TEST_S3_ENDPOINT_URL")
+        client = boto3.client("s3", endpoint_url=endpoint)
+        client.create_bucket(Bucket="ai-ocr-test")
+        yield S3Backend("ai-ocr-test", prefix="artifacts/", client=client)
+        return
+    with mock_s3():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="ai-ocr-test")
+        yield S3Backend("ai-ocr-test", prefix="artifacts/", client=client)
+
+
+def test_s3_backend_dedups(s3_backend, tmp_path):
+    assert s3_backend.exists("aa/bb/x") is False
+    assert s3_backend.put_bytes("aa/bb/x", b"one", content_type="image/png") is True
+    assert s3_backend.put_bytes("aa/bb/x", b"one") is False
+    assert s3_backend.get_bytes("aa/bb/x") == b"one"
+    assert s3_backend.local_path("aa/bb/x") is None
+    assert s3_backend.size("aa/bb/x") == 3 and s3_backend.size("aa/bb/z") is None
+    assert s3_backend.open_range("aa/bb/x", 1, 2).read() == b"ne"
+
+    source = tmp_path / "upload.png"
+    source.write_bytes(b"two")
+    assert s3_backend.put_file("cc/dd/y", str(source)) is True
+    assert source.exists()
+    assert s3_backend.put_file("cc/dd/y", str(source), keep=False) is False
+    assert not source.exists()
+    keys = [o["Key"] for o in s3_backend.client.list_objects_v2(Bucket="ai-ocr-test")["Contents"]]
+    assert sorted(keys) == ["artifacts/aa/bb/x", "artifacts/cc/dd/y"]
+
+
+def test_local_file_of_remote_blob(s3_backend, tmp_path):
+    store = ArtifactStore(s3_backend)
+    source = tmp_path / "processed.png"
+    source.write_bytes(b"pixels")
+    blob = store.ingest_file(str(source), content_type="image/png", keep=False)
+    assert not source.exists()
+
+    with store.local_file(blob["sha256"]) as path:
+        with open(path, "rb") as f:
+            assert f.read() == b"pixels"
+    # The temporary download is gone after the block
+    assert not os.path.exists(path)
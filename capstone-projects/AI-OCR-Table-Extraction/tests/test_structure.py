@@ -0,0 +1,269 @@
+import pytest
+from Backend.structure.table_analyzer import TableStructureAnalyzer
+
+
+def word(text, x, y, w=40, h=12):
+    return {
+        'bbox': [[x, y], [x + w, y], [x + w, y + h], [x, y + h]],
+        'text': text,
+        'confidence': 0.9
+    }
+
+
+@pytest.fixture
+def analyzer():
+    return TableStructureAnalyzer()
+
+
+@pytest.fixture
+def ocr_results():
+    return [
+        word('Name', 100, 50), word('Age', 300, 52),
+        word('John', 102, 100), word('25', 301, 99),
+        word('Jane', 99, 150), word('31', 303, 151),
+    ]
+
+
+def test_analyze_structure(analyzer, ocr_results):
+    table = analyzer.analyze_structure(ocr_results)
+    assert table['rows'] == 3
+    assert table['columns'] == 2
+    assert table['cells'] == [
+        ['Name', 'Age'],
+        ['John', '25'],
+        ['Jane', '31'],
+    ]
+
+
+def test_missing_cells_stay_empty(analyzer):
+    results = [word('A', 100, 50), word('B', 300, 50), word('C', 100, 100)]
+    table = analyzer.analyze_structure(results)
+    assert table['cells'] == [['A', 'B'], ['C', '']]
+
+
+def test_cluster_coordinates_returns_bounds(analyzer):
+    starts, ends = analyzer._cluster_coordinates([58, 10, 100, 12, 50, 55], 5)
+    assert starts.tolist() == [10, 50, 100]
+    assert ends.tolist() == [12, 58, 100]
+
+
+def test_find_cluster_indices(analyzer):
+    import numpy as np
+    starts, ends = analyzer._cluster_coordinates([10, 12, 50, 55, 58, 100], 5)
+    values = np.array([5, 10, 11, 30, 58, 100, 101])
+    assert analyzer._find_cluster_indices(values, starts, ends).tolist() == [-1, 0, 0, -1, 1, 2, -1]
+
+
+def test_thresholds_follow_resolution(analyzer, ocr_results):
+    # The same table scanned at 4x the resolution: jitter grows with the
+    # DPI, so a fixed pixel threshold would split rows and columns
+    def scaled(result, k):
+        return dict(result, bbox=[[x * k, y * k] for x, y in result['bbox']])
+
+    table = analyzer.analyze_structure([scaled(r, 4) for r in ocr_results])
+    assert table['rows'] == 3
+    assert table['columns'] == 2
+    assert table['cells'][1] == ['John', '25']
+
+
+def test_empty_results(analyzer):
+    assert analyzer.analyze_structure([]) == {'rows': 0, 'columns': 0, 'cells': [],
+                                              'column_boundaries': []}
+
+
+@pytest.fixture
+def merged_header_table():
+    # 3 rows x 3 columns; the first header cell spans two columns (no rule
+    # between columns 0 and 1 in row 0)
+    import numpy as np
+    import cv2
+    img = np.ones((400, 700), dtype=np.uint8) * 255
+    for y in (50, 150, 250, 350):
+        cv2.line(img, (50, y), (650, y), 0, 2)
+    for x in (50, 450, 650):
+        cv2.line(img, (x, 50), (x, 350), 0, 2)
+    cv2.line(img, (250, 150), (250, 350), 0, 2)
+    return img
+
+
+def test_analyze_grid_merged_cells(analyzer, merged_header_table):
+    results = [
+        word('Customer', 200, 90), word('Total', 500, 90),
+        word('Kim', 100, 190), word('Seoul', 300, 190), word('1,200', 500, 190),
+        word('Lee', 100, 290), word('Busan', 300, 290), word('800', 500, 290),
+    ]
+    table = analyzer.analyze_grid(merged_header_table, ocr_results=results)
+    assert table['rows'] == 3
+    assert table['columns'] == 3
+    assert table['cells'] == [
+        ['Customer', '', 'Total'],
+        ['Kim', 'Seoul', '1,200'],
+        ['Lee', 'Busan', '800'],
+    ]
+    header = table['grid_cells'][0]
+    assert (header['row'], header['col'], header['row_span'], header['col_span']) == (0, 0, 1, 2)
+    assert len(table['grid_cells']) == 8
+
+
+def test_analyze_grid_ocr_per_cell(analyzer, merged_header_table):
+    class FakeEngine:
+        def process_image(self, image):
+            return [{'bbox': [[0, 0], [1, 0], [1, 1], [0, 1]], 'text': f"{image.shape[1]}",
+                     'confidence': 1.0}]
+
+    table = analyzer.analyze_grid(merged_header_table, ocr_engine=FakeEngine())
+    # Every cell was OCR'd on its own crop; the merged header is the widest
+    widths = [int(c['text']) for c in table['grid_cells']]
+    assert widths[0] == max(widths)
+
+
+def test_analyze_grid_with_page_grid(analyzer):
+    import cv2
+    import numpy as np
+
+    from Backend.detection.table_detector import TableDetector
+
+    # A 2x2 ruled table well away from the page origin
+    page = np.ones((600, 800, 3), dtype=np.uint8) * 255
+    for y in (200, 300, 400):
+        cv2.line(page, (300, y), (700, y), (0, 0, 0), 2)
+    for x in (300, 500, 700):
+        cv2.line(page, (x, 200), (x, 400), (0, 0, 0), 2)
+    grid = TableDetector(backend="none").detect_tables_with_grid(page)[0]
+    x1, y1, x2, y2 = grid['bbox']
+    assert x1 > 100 and y1 > 100
+
+    crop = page[y1:y2, x1:x2]
+    results = [word(text, x - x1, y - y1) for text, x, y in
+               [('Item', 350, 240), ('Qty', 550, 240), ('Pen', 350, 340), ('3', 550, 340)]]
+    table = analyzer.analyze_grid(crop, ocr_results=results, grid=grid)
+    assert table['cells'] == [['Item', 'Qty'], ['Pen', '3']]
+
+
+def test_non_rectangular_merge_is_split():
+    import cv2
+    import numpy as np
+
+    from Backend.structure.grid import build_cell_grid, cell_lookup
+
+    # 3x3 grid whose rules around slot (0, 0) are broken towards the right
+    # and downwards: slots (0, 0), (0, 1) and (1, 0) form an L
+    img = np.ones((400, 400), dtype=np.uint8) * 255
+    for v in (50, 350):
+        cv2.line(img, (50, v), (350, v), 0, 2)
+        cv2.line(img, (v, 50), (v, 350), 0, 2)
+    cv2.line(img, (150, 150), (350, 150), 0, 2)
+    cv2.line(img, (50, 250), (350, 250), 0, 2)
+    cv2.line(img, (250, 50), (250, 350), 0, 2)
+    cv2.line(img, (150, 150), (150, 350), 0, 2)
+
+    cells = build_cell_grid(img, [50, 150, 250, 350], [50, 150, 250, 350])
+    assert sum(c['row_span'] * c['col_span'] for c in cells) == 9
+    assert (cell_lookup(cells, 3, 3) >= 0).all()
+    assert {(c['row'], c['col'], c['row_span'], c['col_span']) for c in cells if c['row'] == 0} == \
+        {(0, 0, 1, 2), (0, 2, 1, 1)}
+
+
+def test_incremental_analyzer_streams_rows():
+    from Backend.structure.incremental import IncrementalTableAnalyzer
+
+    def ledger_words(n_rows):
+        yield [word('Date', 100, 10), word('Memo', 300, 10), word('Amount', 500, 10)]
+        for i in range(n_rows):
+            y = 40 + 30 * i
+            # Bands split rows: the amount of each row arrives with the next band
+            yield [word(f'2024-01-{i % 28 + 1:02d}', 101, y), word(f'item {i}', 302, y + 1)]
+            yield [word(f'{i * 10}', 498, y - 1)]
+
+    analyzer = IncrementalTableAnalyzer(calibration_rows=3)
+    rows = analyzer.iter_rows(ledger_words(2000))
+    assert next(rows) == ['Date', 'Memo', 'Amount']
+    assert next(rows) == ['2024-01-01', 'item 0', '0']
+
+    peak = 0
+    count = 2
+    for row in rows:
+        peak = max(peak, analyzer.buffered_words)
+        count += 1
+        assert len(row) == 3
+    assert count == 2001
+    assert row == [f'2024-01-{1999 % 28 + 1:02d}', 'item 1999', '19990']
+    assert peak <= 6  # only the open row is buffered once columns are frozen
+
+
+def test_incremental_analyzer_short_table():
+    from Backend.structure.incremental import IncrementalTableAnalyzer
+
+    analyzer = IncrementalTableAnalyzer(calibration_rows=10)
+    bands = [[word('A', 100, 10), word('B', 300, 10)], [word('C', 100, 40)]]
+    rows = list(analyzer.iter_rows(bands))
+    assert rows == [['A', 'B'], ['C', '']]
+
+
+def test_incremental_feed_buffers_without_iteration():
+    from Backend.structure.incremental import IncrementalTableAnalyzer
+
+    analyzer = IncrementalTableAnalyzer(calibration_rows=1)
+    analyzer.feed([word('A', 100, 10), word('B', 300, 10)])  # result ignored
+    assert analyzer.feed([word('C', 100, 40), word('D', 300, 40)]) == [['A', 'B']]
+    assert analyzer.close() == [['C', 'D']]
+
+
+def test_stitcher_merges_continued_pages():
+    from Backend.structure.stitching import TableStitcher
+
+    def statement_page(first_row, n_rows, x_shift=0):
+        words = [word('Date', 100 + x_shift, 20), word('Amount', 400 + x_shift, 20)]
+        for i in range(n_rows):
+            words += [word(f'd{first_row + i}', 100 + x_shift, 60 + 30 * i),
+                      word(f'{first_row + i}', 400 + x_shift, 60 + 30 * i)]
+        return words
+
+    def pages():
+        yield statement_page(0, 3)
+        yield statement_page(3, 3, x_shift=12)  # same layout, scanned slightly shifted
+        # A different table: three columns
+        yield [word('Code', 50, 20), word('Name', 250, 20), word('Qty', 500, 20),
+               word('A1', 50, 60), word('Bolt', 250, 60), word('4', 500, 60)]
+
+    rows = list(TableStitcher().stitch(pages()))
+    expected = [['Date', 'Amount']] + [[f'd{i}', f'{i}'] for i in range(6)]
+    assert [r for t, r in rows if t == 0] == expected
+    assert [r for t, r in rows if t == 1] == [['Code', 'Name', 'Qty'], ['A1', 'Bolt', '4']]
+
+
+def test_layout_similarity():
+    from Backend.structure.stitching import layout_similarity
+    assert layout_similarity([100, 300, 500], [100, 300, 500]) == pytest.approx(1.0)
+    assert layout_similarity([100, 300, 500], [110, 310, 510]) > 0.95
+    assert layout_similarity([100, 300, 500], [100, 450, 500]) < 0.95
+    assert layout_similarity([100, 300], [100, 300, 500]) == 0.0
+    # Every 2-column layout normalizes to [0, 1]; width and position must count
+    assert layout_similarity([10, 900], [400, 600]) < 0.5
+    assert layout_similarity([0, 100, 200], [0, 500, 2000]) < 0.95
+    assert layout_similarity([100], [100]) == 0.0
+
+
+def test_stitcher_separates_different_two_column_tables():
+    from Backend.structure.stitching import TableStitcher
+
+    pages = [
+        [word('Date', 100, 20), word('Amount', 900, 20), word('d0', 100, 60), word('5', 900, 60)],
+        [word('Code', 400, 20), word('Qty', 600, 20), word('A1', 400, 60), word('4', 600, 60)],
+    ]
+    rows = list(TableStitcher().stitch(pages))
+    assert [t for t, _ in rows] == [0, 0, 1, 1]
+
+
+def test_sparse_output_matches_dense(ocr_results):
+    from Backend.structure.sparse import dense_cells, iter_table_rows
+
+    results = ocr_results + [word('Note', 600, 400)]  # far-away word: mostly empty row/column
+    dense = TableStructureAnalyzer().analyze_structure(results)
+    sparse = TableStructureAnalyzer(sparse=True).analyze_structure(results)
+
+    assert 'cells' not in sparse
+    assert len(sparse['sparse_cells']['text']) == 7
+    assert sparse['sparse_cells']['row'] == sorted(sparse['sparse_cells']['row'])
+    assert dense_cells(sparse) == dense['cells']
+    assert list(iter_table_rows(sparse)) == dense['cells']